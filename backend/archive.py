@@ -0,0 +1,121 @@
+"""
+Archival of closed orders.
+
+Completed and cancelled orders older than ``ARCHIVE_AFTER_DAYS`` are moved,
+with their items, from ``orders`` / ``order_items`` into ``orders_archive``
+(one row per order, items inline as JSON) by ``scripts/archive_orders.py``.
+Each batch is a single statement in its own transaction: the rows are
+deleted from the live tables and inserted into the archive together, so an
+order is always in exactly one place.
+
+Readers that need an order's whole history use ``order_history()``, the
+live and archived orders as one subquery: customer lifetime stats (CRM
+grades, the customer overview, dashboard totals) stay correct after
+archiving. Period reports and order exports read it (and
+``archived_items()`` for the items) within their period, so they do not
+change either. A customer's archived orders are listed, paged, by
+``GET /orders/my-orders/archived``.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Integer, Numeric, String, column, func, select, text, union_all
+from sqlalchemy.orm import Session
+
+from backend.models import Order, ArchivedOrder
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVED_STATUSES = ["completed", "cancelled"]
+
+# The items' deletes and the orders' deletes run in one statement, so the
+# order_items -> orders foreign key holds when it is checked at the end.
+# Every part of the statement reads the same snapshot, so the item lists are
+# looked up (by index) in order_items although the DELETE removes them: the
+# planner has no row estimates for a DELETE's RETURNING and would join it
+# with a nested loop over the whole batch
+ARCHIVE_BATCH_SQL = text("""
+WITH batch AS (
+    SELECT id, order_date FROM orders
+    WHERE status = ANY(:statuses) AND order_date < :cutoff
+    ORDER BY order_date
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+), moved_items AS (
+    DELETE FROM order_items i USING batch b
+    WHERE i.order_id = b.id AND i.order_date = b.order_date
+), moved AS (
+    DELETE FROM orders o USING batch b
+    WHERE o.id = b.id AND o.order_date = b.order_date
+    RETURNING o.id, o.order_number, o.user_id, o.order_date, o.status, o.total_amount,
+              o.delivery_address, o.notes, o.updated_at
+)
+INSERT INTO orders_archive (
+    id, order_number, user_id, order_date, status, total_amount, delivery_address, notes, updated_at, items
+)
+SELECT m.id, m.order_number, m.user_id, m.order_date, m.status, m.total_amount,
+       m.delivery_address, m.notes, m.updated_at,
+       COALESCE((
+           SELECT json_agg(json_build_object(
+               'id', i.id, 'product_id', i.product_id, 'quantity', i.quantity,
+               'unit_price', i.unit_price, 'subtotal', i.subtotal
+           ) ORDER BY i.id)
+           FROM order_items i WHERE i.order_id = m.id AND i.order_date = m.order_date
+       ), '[]'::json)
+FROM moved m
+""")
+
+def archive_cutoff(older_than_days: int = ARCHIVE_AFTER_DAYS) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+def count_archivable(db: Session, cutoff: datetime) -> int:
+    return db.query(func.count(Order.id)).filter(
+        Order.status.in_(ARCHIVED_STATUSES), Order.order_date < cutoff
+    ).scalar()
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move up to `batch_size` closed orders older than `cutoff`; the number moved."""
+    moved = db.execute(ARCHIVE_BATCH_SQL, {
+        "statuses": ARCHIVED_STATUSES, "cutoff": cutoff, "batch_size": batch_size
+    }).rowcount
+    db.commit()
+    return moved
+
+def order_history(
+    user_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    Live and archived orders as one subquery (user_id, status, total_amount,
+    order_date), optionally of one user and within [start, end).
+    """
+    live = select(Order.user_id, Order.status, Order.total_amount, Order.order_date)
+    archived = select(ArchivedOrder.user_id, ArchivedOrder.status, ArchivedOrder.total_amount, ArchivedOrder.order_date)
+    if user_id is not None:
+        live = live.where(Order.user_id == user_id)
+        archived = archived.where(ArchivedOrder.user_id == user_id)
+    # Bounds on both branches: the live one reads only those months' partitions
+    if start is not None:
+        live = live.where(Order.order_date >= start)
+        archived = archived.where(ArchivedOrder.order_date >= start)
+    if end is not None:
+        live = live.where(Order.order_date < end)
+        archived = archived.where(ArchivedOrder.order_date < end)
+    return union_all(live, archived).subquery("order_history")
+
+def archived_items():
+    """
+    The items of an archived order as rows (id, product_id, quantity,
+    unit_price, subtotal). Select it together with ArchivedOrder: it is
+    joined to the order it expands (implicitly LATERAL).
+    """
+    return func.json_to_recordset(ArchivedOrder.items).table_valued(
+        column("id", String),
+        column("product_id", String),
+        column("quantity", Integer),
+        column("unit_price", Numeric(10, 2)),
+        column("subtotal", Numeric(10, 2)),
+        joins_implicitly=True
+    ).render_derived("archived_item", with_types=True)
@@ -67,6 +67,26 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+class CategoryFacet(BaseModel):
+    category: Optional[str] = None
+    count: int
+
+class ProductSearchResponse(BaseModel):
+    items: List[ProductResponse]
+    facets: List[CategoryFacet]  # Counts per category for the query, ignoring the category filter
+    total: int  # Matches within the selected category (or all, when none)
+    next_cursor: Optional[str] = None
+
+class ProductImportError(BaseModel):
+    line: int
+    reason: str
+
+class ProductImportResponse(BaseModel):
+    inserted: int
+    updated: int
+    rejected: int
+    errors: List[ProductImportError]  # First rejected rows only
+
 class OrderItemCreate(BaseModel):
     product_id: str
     quantity: int
@@ -112,6 +132,75 @@ class StatsResponse(BaseModel):
     total_users: Optional[int] = None
     total_products: Optional[int] = None
 
+class ReportPeriod(BaseModel):
+    kind: str
+    label: str
+    start: datetime
+    end: datetime  # Exclusive
+
+class ReportStatusRow(BaseModel):
+    status: Optional[str] = None
+    orders: int
+    amount: float
+
+class ReportCustomerRow(BaseModel):
+    user_id: str
+    customer_name: Optional[str] = None
+    orders: int
+    amount: float
+
+class ReportProductRow(BaseModel):
+    product_id: str
+    name: str
+    quantity: int
+    amount: float
+
+class OrderReportResponse(BaseModel):
+    period: ReportPeriod
+    total_orders: int
+    revenue_orders: int  # Excluding cancelled orders
+    revenue: float
+    orders_by_status: List[ReportStatusRow]
+    revenue_by_customer: List[ReportCustomerRow]
+    top_products_by_quantity: List[ReportProductRow]
+    top_products_by_amount: List[ReportProductRow]
+    generated_at: datetime
+    finalized: bool  # Finalized periods are served from stored snapshots
+
+# Diagnostics Schemas
+
+class SlowQueryResponse(BaseModel):
+    statement: str  # Normalized: literals and IN lists collapsed
+    route: Optional[str] = None  # None for scripts / jobs
+    calls: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    last_seen: datetime
+    parameter_shapes: List[str]
+    plan: Optional[str] = None  # Latest sampled EXPLAIN (ANALYZE, BUFFERS)
+    plan_captured_at: Optional[datetime] = None
+
+class ProfileSummary(BaseModel):
+    id: str
+    method: str
+    path: str
+    route: Optional[str] = None
+    started_at: datetime
+    duration_ms: float
+    samples: int
+    interval_ms: float
+
+class OutboxConsumerStatus(BaseModel):
+    consumer: str
+    topics: List[str]
+    last_event_id: int
+    pending: int
+    attempts: int
+    next_attempt_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
 # CRM Schemas
 
 class CustomerBase(BaseModel):
@@ -165,6 +254,39 @@ class InteractionResponse(InteractionBase):
     class Config:
         from_attributes = True
 
+class CustomerOrderBrief(BaseModel):
+    id: str
+    order_number: str
+    order_date: datetime
+    status: str
+    total_amount: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class CustomerMonthlySummary(BaseModel):
+    month: str  # YYYY-MM
+    amount: float
+    count: int
+
+class CustomerLifetimeStats(BaseModel):
+    total_orders: int
+    total_amount: float
+    completed_orders: int
+    open_orders: int
+    cancelled_orders: int
+    first_order_date: Optional[datetime] = None
+    last_order_date: Optional[datetime] = None
+
+class CustomerOverviewResponse(BaseModel):
+    # 未在 fields 中選取的區塊不會出現在回應中
+    customer: Optional[CustomerResponse] = None
+    interactions: Optional[List[InteractionResponse]] = None
+    open_actions: Optional[List[InteractionResponse]] = None
+    orders: Optional[List[CustomerOrderBrief]] = None
+    order_summary: Optional[List[CustomerMonthlySummary]] = None
+    stats: Optional[CustomerLifetimeStats] = None
+
 class ReminderResponse(BaseModel):
     customer_id: str
     company_name: str
@@ -0,0 +1,45 @@
+"""
+PostgreSQL ``COPY ... FROM STDIN`` over an iterator of text chunks, for both
+drivers the project supports (psycopg2 and psycopg 3). Memory use stays flat
+however many rows the iterator yields.
+"""
+import io
+from typing import Iterable
+
+COPY_CHUNK_SIZE = 65536
+
+class CopyStream(io.TextIOBase):
+    """Readable text stream over an iterator of lines, consumed by COPY."""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+def copy_from(dbapi_connection, sql: str, lines: Iterable[str]):
+    """Run `sql` (a COPY ... FROM STDIN) on the raw DBAPI connection, fed by `lines`."""
+    stream = CopyStream(lines)
+    cursor = dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(sql, stream, size=COPY_CHUNK_SIZE)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                while chunk := stream.read(COPY_CHUNK_SIZE):
+                    copy.write(chunk)
+    finally:
+        cursor.close()
@@ -0,0 +1,165 @@
+"""
+In-process product catalog cache.
+
+Active products are held in memory, indexed by id and by category, and
+served to the read endpoints without touching the database. Every catalog
+write (product CRUD and stock changes) bumps a shared, monotonically
+increasing version number; each worker re-checks that version at most once
+per ``max_staleness`` seconds and reloads when it has moved, so a write in
+one worker becomes visible in all workers within that bound.
+
+Stock levels served from here may be up to ``max_staleness`` seconds old and
+are for display only: order placement always reads and locks stock in the DB.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.database import engine
+from backend.models import Product, CacheVersion
+from backend.auth import schemas
+
+CATALOG_VERSION_KEY = "catalog"
+
+class InMemoryVersionStore:
+    """Version store shared by caches in one process (tests / single worker)."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def bump(self, name: str) -> int:
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+class DatabaseVersionStore:
+    """Version store backed by the `cache_versions` table, shared by all workers."""
+
+    def __init__(self, bind=None):
+        self.bind = bind or engine
+
+    def get(self, name: str) -> int:
+        with self.bind.connect() as conn:
+            version = conn.execute(
+                select(CacheVersion.version).where(CacheVersion.name == name)
+            ).scalar()
+        return version or 0
+
+    def bump(self, name: str) -> int:
+        # Runs in its own short transaction so the row lock is never held
+        # for the duration of a request transaction
+        for _ in range(2):
+            try:
+                with self.bind.begin() as conn:
+                    version = conn.execute(
+                        update(CacheVersion)
+                        .where(CacheVersion.name == name)
+                        .values(version=CacheVersion.version + 1)
+                        .returning(CacheVersion.version)
+                    ).scalar()
+                    if version is None:
+                        conn.execute(insert(CacheVersion).values(name=name, version=1))
+                        version = 1
+                return version
+            except IntegrityError:
+                # Another worker inserted the row first; retry as an update
+                continue
+        raise RuntimeError(f"Could not bump cache version {name!r}")
+
+class CatalogCache:
+    def __init__(
+        self,
+        version_store,
+        max_staleness: float = 5.0,
+        max_age: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.version_store = version_store
+        self.max_staleness = max_staleness
+        self.max_age = max_age
+        self.clock = clock
+        self.version: Optional[int] = None
+        self._by_id: Dict[str, schemas.ProductResponse] = {}
+        self._by_category: Dict[Optional[str], List[schemas.ProductResponse]] = {}
+        self._ordered: List[schemas.ProductResponse] = []
+        self._loaded_at = float("-inf")
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self, db: Session):
+        now = self.clock()
+        if self.version is not None and now - self._checked_at < self.max_staleness:
+            return
+        with self._lock:
+            now = self.clock()
+            if self.version is not None and now - self._checked_at < self.max_staleness:
+                return
+            current = self.version_store.get(CATALOG_VERSION_KEY)
+            if current != self.version or now - self._loaded_at >= self.max_age:
+                self._load(db, current)
+            self._checked_at = now
+
+    def _load(self, db: Session, version: int):
+        # The version is read before the rows: a write racing with the load
+        # leaves the cache one version behind, and the next check reloads it
+        products = db.query(Product).filter(
+            Product.is_active == True
+        ).order_by(Product.created_at, Product.id).all()
+
+        ordered = [schemas.ProductResponse.model_validate(p) for p in products]
+        by_category: Dict[Optional[str], List[schemas.ProductResponse]] = {}
+        for product in ordered:
+            by_category.setdefault(product.category, []).append(product)
+
+        self._ordered = ordered
+        self._by_id = {p.id: p for p in ordered}
+        self._by_category = by_category
+        self.version = version
+        self._loaded_at = self.clock()
+
+    def current_version(self, db: Session) -> int:
+        """Version of the catalog this worker is currently serving."""
+        self._ensure_fresh(db)
+        return self.version
+
+    def list_products(
+        self,
+        db: Session,
+        category: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[schemas.ProductResponse]:
+        """Active products, optionally for one category."""
+        self._ensure_fresh(db)
+        products = self._by_category.get(category, []) if category else self._ordered
+        return products[skip:skip + limit]
+
+    def get_product(self, db: Session, product_id: str) -> Optional[schemas.ProductResponse]:
+        """An active product by id, or None (inactive or unknown)."""
+        self._ensure_fresh(db)
+        return self._by_id.get(product_id)
+
+    def invalidate(self):
+        """Force this worker to re-check the version on the next read."""
+        self._checked_at = float("-inf")
+
+    def notify_changed(self) -> int:
+        """Call after committing a catalog write: bumps the shared version."""
+        version = self.version_store.bump(CATALOG_VERSION_KEY)
+        self.invalidate()
+        return version
+
+catalog_cache = CatalogCache(
+    DatabaseVersionStore(),
+    max_staleness=float(os.getenv("CATALOG_CACHE_MAX_STALENESS", "5")),
+    max_age=float(os.getenv("CATALOG_CACHE_MAX_AGE", "300"))
+)
@@ -0,0 +1,62 @@
+"""
+Conditional GET (ETag / If-None-Match) helpers.
+
+ETags are derived from cheap version markers (write-version counters, row
+counts, max timestamps) rather than from the response body, so a matching
+request is answered with 304 before the payload is queried or serialized.
+They are weak validators: two responses with the same ETag are
+semantically equivalent, not necessarily byte-identical.
+"""
+import hashlib
+from datetime import datetime
+from typing import Any
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend.models import Order, Product
+
+def make_etag(*parts: Any) -> str:
+    """Build a weak ETag from version markers."""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of the request's If-None-Match against `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    expected = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == expected for tag in header.split(","))
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    # Per-user payloads: only the client may store them, and must revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = "Authorization, Cookie"
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
+
+def order_version_marker(db: Session, user_id: str = None, with_products: bool = False) -> tuple:
+    """
+    (count, max updated_at) of orders, optionally for one user, in one query.
+    `with_products` adds max(products.updated_at), for payloads embedding
+    items[].product: renaming or repricing a product changes no order row.
+    """
+    columns = [func.count(Order.id), func.max(Order.updated_at)]
+    if with_products:
+        columns.append(select(func.max(Product.updated_at)).scalar_subquery())
+    query = select(*columns)
+    if user_id:
+        query = query.where(Order.user_id == user_id)
+    return tuple(value.isoformat() if isinstance(value, datetime) else value for value in db.execute(query).one())
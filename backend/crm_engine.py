@@ -6,8 +6,11 @@ import json
 import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import select, exists, func
+from sqlalchemy.orm import Session, aliased
 from backend.models import Customer, Interaction
+from backend import outbox, archive
+from backend.query_budget import track_queries
 
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "crm_rules.json")
 
@@ -78,6 +81,21 @@ def calculate_customer_grade(customer: Customer, rules: Dict[str, Any] = None) -
     # 若無規則符合，預設為 C
     return "C"
 
+def _completed_order_stats(db: Session, user_ids=None):
+    """每位使用者已完成訂單的筆數、金額與最後下單時間（含已封存的訂單）"""
+    history = archive.order_history()
+    query = db.query(
+        history.c.user_id.label("user_id"),
+        func.count().label("total_orders"),
+        func.coalesce(func.sum(history.c.total_amount), 0).label("total_amount"),
+        func.max(history.c.order_date).label("last_order_date")
+    ).filter(history.c.status == 'completed')
+    if user_ids is not None:
+        query = query.filter(history.c.user_id.in_(user_ids))
+    return query.group_by(history.c.user_id).subquery()
+
+# 4 條固定查詢，加上 commit 時依變更欄位組合分批的 UPDATE；逐筆查詢會被視為 N+1
+@track_queries("crm_engine.recalculate_all_grades", budget=12)
 def recalculate_all_grades(db: Session) -> int:
     """
     重新計算所有客戶的等級
@@ -88,52 +106,62 @@ def recalculate_all_grades(db: Session) -> int:
     Returns:
         更新的客戶數量
     """
-    from backend.models import User, Order  # Avoid circular import if any
+    from backend.models import User, Order, ArchivedOrder  # Avoid circular import if any
     
     rules = load_rules()
     updated_count = 0
     
-    # 0. Sync: Auto-create customers from Users who have completed orders
-    users_with_orders = db.query(User).join(Order).filter(Order.status == 'completed').distinct().all()
-    for user in users_with_orders:
-        if user.email:
-            exists = db.query(Customer).filter(Customer.email == user.email).first()
-            if not exists:
-                new_customer = Customer(
-                    company_name=user.company_name,
-                    contact_person=user.username,
-                    email=user.email,
-                    source="System Auto-Import",
-                    grade="C"
-                )
-                db.add(new_customer)
-                # Count as "updated" since we added a new customer
-                updated_count += 1
-    
-    db.commit() # Commit to make them available for query
-    
-    # 1. Process all customers (including newly created ones)
-    customers = db.query(Customer).all()
+    # 0. Link: 尚未連結的客戶以 email 對應到使用者（單一 UPDATE）
+    linked = aliased(Customer)
+    linked_user_ids = select(linked.user_id).where(linked.user_id.isnot(None))
+    matching_user_id = select(User.id).where(
+        User.email == Customer.email,
+        User.id.notin_(linked_user_ids)
+    ).scalar_subquery()
+    db.query(Customer).filter(
+        Customer.user_id.is_(None),
+        Customer.email.isnot(None)
+    ).update({Customer.user_id: matching_user_id}, synchronize_session=False)
     
-    for customer in customers:
-        # 1. Update stats from Orders if email matches a User
-        if customer.email:
-            user = db.query(User).filter(User.email == customer.email).first()
-            if user:
-                # Get completed orders
-                orders = db.query(Order).filter(
-                    Order.user_id == user.id,
-                    Order.status == 'completed'
-                ).all()
-                
-                if orders:
-                    total_amount = sum((o.total_amount or 0) for o in orders)
-                    total_count = len(orders)
-                    last_order_date = max(o.order_date for o in orders)
-                    
-                    customer.total_amount = total_amount
-                    customer.total_orders = total_count
-                    customer.last_order_date = last_order_date
+    # 1. Sync: Auto-create customers from Users who have completed orders
+    users_without_customer = db.query(User).filter(
+        User.orders.any(Order.status == 'completed') | exists().where(
+            ArchivedOrder.user_id == User.id, ArchivedOrder.status == 'completed'
+        ),
+        ~User.customer.has(),
+        ~exists().where(Customer.email == User.email)
+    ).all()
+    for user in users_without_customer:
+        new_customer = Customer(
+            company_name=user.company_name,
+            contact_person=user.username,
+            email=user.email,
+            user_id=user.id,
+            source="System Auto-Import",
+            grade="C"
+        )
+        db.add(new_customer)
+        # Count as "updated" since we added a new customer
+        updated_count += 1
+    
+    db.flush() # Make them available for the aggregate query
+    
+    # 2. Aggregate completed orders per user and join on customers.user_id
+    order_stats = _completed_order_stats(db)
+    
+    rows = db.query(
+        Customer,
+        order_stats.c.total_orders,
+        order_stats.c.total_amount,
+        order_stats.c.last_order_date
+    ).outerjoin(order_stats, order_stats.c.user_id == Customer.user_id).all()
+    
+    for customer, total_orders, total_amount, last_order_date in rows:
+        # 1. Update stats from completed orders of the linked user
+        if total_orders:
+            customer.total_amount = total_amount
+            customer.total_orders = total_orders
+            customer.last_order_date = last_order_date
         
         # 2. Calculate Grade
         new_grade = calculate_customer_grade(customer, rules)
@@ -146,6 +174,48 @@ def recalculate_all_grades(db: Session) -> int:
     db.commit()
     return updated_count
 
+def refresh_customer_stats(db: Session, user_ids) -> int:
+    """
+    重新計算指定使用者所連結客戶的訂單統計與等級（冪等，可重複執行）
+    
+    Args:
+        db: 資料庫 Session
+        user_ids: 使用者 id
+    
+    Returns:
+        更新的客戶數量
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    rules = load_rules()
+    
+    order_stats = _completed_order_stats(db, user_ids)
+    
+    rows = db.query(
+        Customer,
+        order_stats.c.total_orders,
+        order_stats.c.total_amount,
+        order_stats.c.last_order_date
+    ).outerjoin(order_stats, order_stats.c.user_id == Customer.user_id).filter(Customer.user_id.in_(user_ids)).all()
+    
+    for customer, total_orders, total_amount, last_order_date in rows:
+        # 統計只來自已完成的訂單：最後一筆完成訂單被改為其他狀態時歸零
+        customer.total_orders = total_orders or 0
+        customer.total_amount = total_amount or 0
+        customer.last_order_date = last_order_date
+        customer.grade = calculate_customer_grade(customer, rules)
+    return len(rows)
+
+@outbox.consumer("crm.customer_stats", topics=["order.status_changed"])
+def refresh_stats_on_order_change(db: Session, events) -> None:
+    """訂單進入或離開「已完成」狀態時，更新下單者所連結客戶的統計與等級"""
+    user_ids = {
+        e.payload["user_id"] for e in events
+        if "completed" in (e.payload.get("old_status"), e.payload.get("new_status"))
+    }
+    refresh_customer_stats(db, user_ids)
+
 def get_reminders(db: Session) -> List[Dict[str, Any]]:
     """
     取得需提醒的客戶列表
@@ -180,26 +250,27 @@ def get_reminders(db: Session) -> List[Dict[str, Any]]:
             "last_order_date": customer.last_order_date
         })
     
-    # 2. 找出有未完成「下一步行動」的客戶
-    pending_interactions = db.query(Interaction).filter(
+    # 2. 找出有未完成「下一步行動」的客戶（一次查詢，依客戶分組計數）
+    pending_counts = db.query(
+        Customer.id,
+        Customer.company_name,
+        func.count(Interaction.id)
+    ).join(
+        Interaction, Interaction.customer_id == Customer.id
+    ).filter(
         Interaction.action_completed == False,
         Interaction.next_action.isnot(None),
         Interaction.next_action != ""
-    ).all()
-    
-    # 按客戶分組
-    customer_ids = set([i.customer_id for i in pending_interactions])
-    for customer_id in customer_ids:
-        customer = db.query(Customer).filter(Customer.id == customer_id).first()
-        if customer:
-            pending_actions = [i for i in pending_interactions if i.customer_id == customer_id]
-            reminders.append({
-                "customer_id": customer.id,
-                "company_name": customer.company_name,
-                "reminder_type": "pending_action",
-                "reason": f"有 {len(pending_actions)} 個待處理的行動項目",
-                "days_since_order": None,
-                "last_order_date": None
-            })
+    ).group_by(Customer.id, Customer.company_name).order_by(Customer.company_name, Customer.id).all()
+
+    for customer_id, company_name, pending_count in pending_counts:
+        reminders.append({
+            "customer_id": customer_id,
+            "company_name": company_name,
+            "reminder_type": "pending_action",
+            "reason": f"有 {pending_count} 個待處理的行動項目",
+            "days_since_order": None,
+            "last_order_date": None
+        })
     
     return reminders
@@ -1,4 +1,5 @@
 import os
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
@@ -6,19 +7,39 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional streaming replica for read-only endpoints (see backend/replica.py)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
 
 if not DATABASE_URL:
     # Fallback or error if not set, but for now we just warn or let it fail
     print("Warning: DATABASE_URL not found in environment variables.")
 
-# Supabase uses Postgres, so we use psycopg2 or similar. 
+# Supabase uses Postgres, so we use psycopg2 or similar.
 # Ensure the URL starts with postgresql:// or postgresql+psycopg2://
 # SQLAlchemy 1.4+ deprecated postgres://
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+if DATABASE_REPLICA_URL and DATABASE_REPLICA_URL.startswith("postgres://"):
+    DATABASE_REPLICA_URL = DATABASE_REPLICA_URL.replace("postgres://", "postgresql://", 1)
 
 engine = create_engine(DATABASE_URL)
+# An unreachable replica must fail fast: reads then fall back to the primary
+replica_engine = create_engine(
+    DATABASE_REPLICA_URL, pool_pre_ping=True, connect_args={"connect_timeout": 3}
+) if DATABASE_REPLICA_URL else None
+
+# Opt-in slow query log (SLOW_QUERY_MS), for the API and the scripts alike
+from backend import slow_queries
+if slow_queries.SLOW_QUERY_MS > 0:
+    slow_queries.instrument_engine(engine)
+    if replica_engine is not None:
+        slow_queries.instrument_engine(replica_engine)
+
+from backend import replica
+replica_lag_guard = replica.ReplicaLagGuard(replica_engine) if replica_engine is not None else None
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine is not None else None
 
 Base = declarative_base()
 
@@ -28,3 +49,17 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def read_session():
+    """Session for read-only work: the replica when configured and caught up, else the primary."""
+    if ReplicaSessionLocal is not None and replica_lag_guard.acceptable():
+        return ReplicaSessionLocal()
+    return SessionLocal()
+
+def get_read_db(request: Request):
+    # Clients that wrote moments ago read from the primary (read-your-writes)
+    db = SessionLocal() if replica.pinned_to_primary(request.cookies) else read_session()
+    try:
+        yield db
+    finally:
+        db.close()
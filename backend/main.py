@@ -1,11 +1,29 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 # Load env vars
 load_dotenv()
 
-app = FastAPI(title="OrderFlow API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background delivery of order / CRM events (backend/outbox.py)
+    if outbox.OUTBOX_DISPATCHER_ENABLED:
+        outbox.dispatcher.start()
+    # Order partitions for the coming months (backend/partitions.py)
+    partition_maintenance = asyncio.create_task(partitions.maintain())
+    # Order updates for the open SSE streams (backend/order_stream.py)
+    order_feed = asyncio.create_task(order_stream.feed.run())
+    yield
+    order_feed.cancel()
+    partition_maintenance.cancel()
+    outbox.dispatcher.stop()
+
+app = FastAPI(title="OrderFlow API", version="0.1.0", lifespan=lifespan)
 
 # CORS Configuration
 origins = [
@@ -20,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Report-Cache", "Server-Timing", "X-Profile-Id"],
 )
 
 @app.get("/")
@@ -29,12 +48,46 @@ def read_root():
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from backend.auth import router as auth_router
-from backend.routers import users, products, orders, dashboard, crm
-from backend.database import engine, Base
+from backend.routers import users, products, orders, dashboard, crm, reports, diagnostics
+from backend.database import engine, replica_engine, Base
+from backend import metrics, query_budget, profiling, replica, outbox, partitions, order_stream
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# Request / DB instrumentation, scraped at /metrics
+if metrics.METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    if replica_engine is not None:
+        metrics.instrument_engine(replica_engine)
+    # Event streams stay open for minutes; their latency would skew the histograms
+    app.add_middleware(metrics.MetricsMiddleware, exclude=("/metrics", "/orders/events"))
+
+# Per-route query budgets / N+1 detection (QUERY_BUDGET_MODE=warn|raise|off)
+if query_budget.QUERY_BUDGET_MODE != "off":
+    query_budget.instrument_engine(engine)
+    if replica_engine is not None:
+        query_budget.instrument_engine(replica_engine)
+    app.add_middleware(query_budget.QueryBudgetMiddleware)
+
+# On-demand profiling of single requests by super admins (X-Profile: 1)
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Read endpoints use DATABASE_REPLICA_URL; pin a client to the primary after it writes
+if replica_engine is not None:
+    app.add_middleware(replica.ReadYourWritesMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics(request: Request):
+    # Optional shared secret for the scraper (Authorization: Bearer <METRICS_TOKEN>)
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Include routers
 app.include_router(auth_router.router)
 app.include_router(users.router)
@@ -42,6 +95,8 @@ app.include_router(products.router)
 app.include_router(orders.router)
 app.include_router(dashboard.router)
 app.include_router(crm.router)
+app.include_router(reports.router)
+app.include_router(diagnostics.router)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
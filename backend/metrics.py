@@ -0,0 +1,208 @@
+"""
+Request and database instrumentation.
+
+``MetricsMiddleware`` (pure ASGI, so streaming responses are untouched)
+records per-route latency histograms, status counts and in-flight requests.
+SQLAlchemy cursor events on the engine count statements and DB time for the
+request that issued them; the per-request figures are added to the route's
+histograms and sent back as a ``Server-Timing`` header::
+
+    Server-Timing: app;dur=12.4, db;dur=3.1;desc="4 queries"
+
+Metrics are exposed in the Prometheus text format by ``render_metrics()``
+(served at ``/metrics``). Routes are labelled by their path template
+(``/orders/{order_id}``), never by the raw path, so label cardinality stays
+bounded. Disable everything with ``METRICS_ENABLED=false``.
+
+The per-request state lives in a context variable; FastAPI copies the
+context into the threadpool that runs sync endpoints, so statements issued
+there are attributed to the right request.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+class RequestStats:
+    """Database activity of one request (or job)."""
+
+    __slots__ = ("route", "queries", "db_time", "scope")
+
+    def __init__(self, route: Optional[str] = None, scope: Optional[dict] = None):
+        self.route = route
+        self.queries = 0
+        self.db_time = 0.0
+        self.scope = scope  # Routing fills in scope["route"] before the endpoint runs
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], Histogram] = {}
+        self.db_queries: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = {}
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.db_time[key] = Histogram(LATENCY_BUCKETS)
+                self.db_queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.latency[key].observe(duration)
+            self.db_time[key].observe(stats.db_time)
+            self.db_queries[key].observe(stats.queries)
+            status_key = (method, route, str(status))
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.db_time.clear()
+            self.db_queries.clear()
+            self.responses.clear()
+
+registry = MetricsRegistry()
+
+def _labels(**labels: str) -> str:
+    escaped = (
+        f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else repr(bound)
+
+def _histogram_lines(name: str, histograms: Dict[Tuple[str, str], Histogram]) -> List[str]:
+    lines = []
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=_format_bound(bound))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+    return lines
+
+def render_metrics(metrics: MetricsRegistry = registry) -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    with metrics._lock:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {metrics.in_flight}",
+            "# HELP http_responses_total Responses by route and status code.",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(metrics.responses.items()):
+            lines.append(f"http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+        for name, help_text, histograms in (
+            ("http_request_duration_seconds", "Request latency until the response is complete.", metrics.latency),
+            ("http_request_db_seconds", "Time spent in database statements per request.", metrics.db_time),
+            ("http_request_db_queries", "Database statements per request.", metrics.db_queries),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            lines.extend(_histogram_lines(name, histograms))
+    return "\n".join(lines) + "\n"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - context._metrics_started
+
+def instrument_engine(engine):
+    """Count statements and DB time per request on `engine` (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def current_route() -> Optional[str]:
+    """``METHOD /route/template`` of the request being served, or the job's name."""
+    stats = current_request.get()
+    if stats is None:
+        return None
+    if stats.scope is not None:
+        return f"{stats.scope['method']} {route_template(stats.scope)}"
+    return stats.route
+
+def server_timing(duration: float, stats: RequestStats) -> str:
+    return (
+        f"app;dur={duration * 1000:.1f}, "
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+    )
+
+class MetricsMiddleware:
+    def __init__(self, app, metrics: MetricsRegistry = registry, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.metrics = metrics
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope=scope)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        self.metrics.request_started()
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                stats.route = route_template(scope)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(time.perf_counter() - started, stats).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            self.metrics.request_finished(
+                scope["method"], stats.route or route_template(scope), status_code,
+                time.perf_counter() - started, stats
+            )
@@ -1,7 +1,10 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime, Numeric, Integer, ForeignKey, Text, func, Enum
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Boolean, DateTime, Numeric, Integer, ForeignKey, Text, func, Enum, Index, BigInteger, JSON, text, event, DDL
+from sqlalchemy import ForeignKeyConstraint, UniqueConstraint
 from sqlalchemy.orm import relationship
 from backend.database import Base
+from backend import partitions
 
 # Enum definitions can be strings or python Enums. 
 # Using string constraints is often simpler for portability unless strict typing is needed.
@@ -26,9 +29,19 @@ class User(Base):
 
     # Relationships
     orders = relationship("Order", back_populates="user")
+    customer = relationship("Customer", back_populates="user", uselist=False)
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Trigram indexes back the ILIKE '%q%' search (also works for CJK text)
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_products_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}),
+        # Keyset pagination / facets over the active catalog
+        Index("ix_products_active_name", "name", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_price", "price", "id", postgresql_where=text("is_active")),
+        Index("ix_products_active_category", "category", postgresql_where=text("is_active")),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
@@ -38,31 +51,63 @@ class Product(Base):
     category = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
 
     # Relationships
     order_items = relationship("OrderItem", back_populates="product")
 
+# gin_trgm_ops comes from pg_trgm, which must exist before the indexes above
+event.listen(Product.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Unique keys of a partitioned table must include the partition key, so
+        # this does not make order numbers unique by itself: see OrderNumber
+        UniqueConstraint("order_number", "order_date"),
+        # Monthly partitions, see backend/partitions.py
+        {"postgresql_partition_by": "RANGE (order_date)"},
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    order_number = Column(String, unique=True, nullable=False)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    order_date = Column(DateTime(timezone=True), server_default=func.now())
+    order_number = Column(String, nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    # Partition key: part of the primary key, set client-side so items can copy it
+    order_date = Column(DateTime(timezone=True), primary_key=True, default=_utcnow, server_default=func.now())
     status = Column(String, default="pending") # pending, processing, shipped, completed, cancelled
     total_amount = Column(Numeric(10, 2), nullable=True) # Can be calculated
     delivery_address = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+class OrderNumber(Base):
+    __tablename__ = "order_numbers"
+
+    # Every order number ever issued, inserted in the order's transaction: the
+    # global uniqueness the partitioned orders table cannot enforce. Rows are
+    # kept when orders are archived, so numbers are never reused
+    order_number = Column(String, primary_key=True)
+
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        # Items follow their order if its date (and so its partition) changes
+        ForeignKeyConstraint(["order_id", "order_date"], ["orders.id", "orders.order_date"], onupdate="CASCADE"),
+        Index("ix_order_items_order_id", "order_id"),
+        {"postgresql_partition_by": "RANGE (order_date)"},
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    order_id = Column(String, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(String, nullable=False)
+    # Copy of the order's date: the partition key, same month as the order
+    order_date = Column(DateTime(timezone=True), primary_key=True)
     product_id = Column(String, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Numeric(10, 2), nullable=True) # Snapshotted price
@@ -72,6 +117,32 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
 
+# Partitions for the current month onwards as soon as the tables exist
+event.listen(OrderItem.__table__, "after_create", partitions.create_initial_partitions)
+
+class ArchivedOrder(Base):
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        # GET /orders/my-orders/archived and lifetime stats per user
+        Index("ix_orders_archive_user_date", "user_id", "order_date"),
+        # Period reports and order exports
+        Index("ix_orders_archive_order_date", "order_date"),
+    )
+
+    # Closed orders moved out of orders / order_items by backend/archive.py.
+    # Items are kept inline as JSON: one compact (TOAST-compressed) row per order
+    id = Column(String, primary_key=True)
+    order_number = Column(String, nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    order_date = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String, nullable=False)
+    total_amount = Column(Numeric(10, 2), nullable=True)
+    delivery_address = Column(Text, nullable=True)
+    notes = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    items = Column(JSON, nullable=False)  # [{id, product_id, quantity, unit_price, subtotal}]
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Customer(Base):
     __tablename__ = "customers"
 
@@ -80,6 +151,8 @@ class Customer(Base):
     contact_person = Column(String, nullable=True)
     phone = Column(String, nullable=True)
     email = Column(String, unique=True, nullable=True, index=True)
+    # Direct link to the ordering account; CRM aggregates join on this instead of email
+    user_id = Column(String, ForeignKey("users.id"), unique=True, nullable=True, index=True)
     address = Column(Text, nullable=True)
     grade = Column(String, default="C")  # A/B/C
     industry = Column(String, nullable=True)
@@ -88,13 +161,18 @@ class Customer(Base):
     total_amount = Column(Numeric(10, 2), default=0)
     last_order_date = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
 
     # Relationships
+    user = relationship("User", back_populates="customer")
     interactions = relationship("Interaction", back_populates="customer", cascade="all, delete-orphan")
 
 class Interaction(Base):
     __tablename__ = "interactions"
+    __table_args__ = (
+        # Backs the (created_at, id) keyset pagination of a customer's history
+        Index("ix_interactions_customer_created", "customer_id", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     customer_id = Column(String, ForeignKey("customers.id"), nullable=False)
@@ -107,3 +185,47 @@ class Interaction(Base):
 
     # Relationships
     customer = relationship("Customer", back_populates="interactions")
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    # Monotonic write counters shared by all API workers (e.g. "catalog")
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+class ReportSnapshot(Base):
+    __tablename__ = "report_snapshots"
+
+    # Results of finalized report periods, keyed by report / period / parameters
+    key = Column(String, primary_key=True)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Dispatch order / consumer checkpoints (see backend/outbox.py)
+        Index("ix_outbox_events_txid_id", "txid", "id"),
+    )
+
+    # Written in the same transaction as the state change it describes
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    txid = Column(BigInteger, nullable=False, server_default=text("pg_current_xact_id()::text::bigint"))
+    topic = Column(String, nullable=False)  # e.g. order.created, order.status_changed
+    aggregate_id = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class OutboxCheckpoint(Base):
+    __tablename__ = "outbox_checkpoints"
+
+    # Last event handled by each outbox consumer, and its retry state
+    consumer = Column(String, primary_key=True)
+    last_txid = Column(BigInteger, nullable=False, default=0)
+    last_event_id = Column(BigInteger, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
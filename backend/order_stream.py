@@ -0,0 +1,219 @@
+"""
+Live order updates over Server-Sent Events (``GET /orders/events``).
+
+Order pages used to poll ``/orders/my-orders`` / ``/orders/`` to notice
+status changes; they now keep one event stream open and refetch only when
+an order of theirs changes. Customers receive their own orders' events,
+staff every order's.
+
+- ``OrderEventFeed`` tails the ``order.created`` / ``order.status_changed``
+  events of the transactional outbox (backend/outbox.py) in (txid, id) order
+  with an in-memory cursor. Every API worker runs its own feed, so a client
+  sees changes made through any worker; the feed only queries while this
+  worker has clients, and is woken right away by commits in this process.
+- ``OrderEventHub`` fans each event out to the matching clients. A client's
+  queue holds at most ``ORDER_STREAM_QUEUE_SIZE`` events: when a slow client
+  falls that far behind, its queue is replaced by a single ``resync`` event
+  (reload the list) instead of growing without bound.
+- Idle streams get a comment line every ``ORDER_STREAM_HEARTBEAT_SECONDS``,
+  so proxies keep them open and disconnected clients are noticed.
+
+Delivery is best effort: events committed while a client is disconnected
+are not replayed, so clients load the list when they (re)connect.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import desc, tuple_
+from starlette.concurrency import run_in_threadpool
+
+from backend import outbox
+from backend.database import SessionLocal
+from backend.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+ORDER_STREAM_QUEUE_SIZE = int(os.getenv("ORDER_STREAM_QUEUE_SIZE", "100"))
+ORDER_STREAM_MAX_CLIENTS = int(os.getenv("ORDER_STREAM_MAX_CLIENTS", "1000"))
+ORDER_STREAM_HEARTBEAT_SECONDS = float(os.getenv("ORDER_STREAM_HEARTBEAT_SECONDS", "15"))
+ORDER_STREAM_POLL_SECONDS = float(os.getenv("ORDER_STREAM_POLL_SECONDS", str(outbox.OUTBOX_POLL_SECONDS)))
+ORDER_STREAM_BATCH_SIZE = 500
+# Browsers reconnect after this many milliseconds when the stream drops
+RECONNECT_MILLISECONDS = 5000
+
+TOPICS = ("order.created", "order.status_changed")
+RESYNC = {"event": "resync"}
+
+def to_message(outbox_event: OutboxEvent) -> Dict[str, Any]:
+    """The client-facing event for an outbox row."""
+    payload = outbox_event.payload
+    if outbox_event.topic == "order.created":
+        return {
+            "event": "order.created",
+            "order_id": payload["order_id"],
+            "order_number": payload["order_number"],
+            "user_id": payload["user_id"],
+            "status": payload["status"],
+            "previous_status": None,
+            "at": outbox_event.created_at.isoformat()
+        }
+    return {
+        "event": "order.status_changed",
+        "order_id": payload["order_id"],
+        "order_number": payload["order_number"],
+        "user_id": payload["user_id"],
+        "status": payload["new_status"],
+        "previous_status": payload["old_status"],
+        "at": outbox_event.created_at.isoformat()
+    }
+
+def format_sse(message: Dict[str, Any]) -> str:
+    data = {key: value for key, value in message.items() if key != "event"}
+    return f"event: {message['event']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class Subscription:
+    def __init__(self, user_id: Optional[str], queue_size: int):
+        # None: every order (staff)
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = 0
+
+    def wants(self, message: Dict[str, Any]) -> bool:
+        return self.user_id is None or message["user_id"] == self.user_id
+
+    def offer(self, message: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind to catch up event by event: have it reload instead
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+class HubFull(Exception):
+    pass
+
+class OrderEventHub:
+    """Fan-out of order events to the streams of this process (event loop only)."""
+
+    def __init__(self, queue_size: int = ORDER_STREAM_QUEUE_SIZE, max_clients: int = ORDER_STREAM_MAX_CLIENTS):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self._subscriptions: Set[Subscription] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def full(self) -> bool:
+        return len(self._subscriptions) >= self.max_clients
+
+    def subscribe(self, user_id: Optional[str]) -> Subscription:
+        if self.full():
+            raise HubFull()
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, messages: List[Dict[str, Any]]):
+        for message in messages:
+            for subscription in self._subscriptions:
+                if subscription.wants(message):
+                    subscription.offer(message)
+
+class OrderEventFeed:
+    """Background task moving new outbox order events into the hub."""
+
+    def __init__(
+        self,
+        hub: OrderEventHub,
+        session_factory=SessionLocal,
+        poll_interval: float = ORDER_STREAM_POLL_SECONDS,
+        batch_size: int = ORDER_STREAM_BATCH_SIZE
+    ):
+        self.hub = hub
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._cursor: Optional[Tuple[int, int]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def wake(self):
+        """Poll now; safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while True:
+            busy = False
+            try:
+                if len(self.hub):
+                    messages = await run_in_threadpool(self.fetch)
+                    self.hub.publish(messages)
+                    busy = len(messages) >= self.batch_size
+                else:
+                    # Nobody listening: start from the newest event when someone connects
+                    self._cursor = None
+            except Exception:
+                logger.exception("Order event feed failed")
+            if busy:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        """Order events committed since the last call."""
+        db = self.session_factory()
+        try:
+            final = OutboxEvent.txid < outbox.VISIBLE_HORIZON
+            if self._cursor is None:
+                newest = db.query(OutboxEvent.txid, OutboxEvent.id).filter(final).order_by(
+                    desc(OutboxEvent.txid), desc(OutboxEvent.id)
+                ).first()
+                self._cursor = tuple(newest) if newest else (0, 0)
+                return []
+            events = db.query(OutboxEvent).filter(
+                OutboxEvent.topic.in_(TOPICS),
+                tuple_(OutboxEvent.txid, OutboxEvent.id) > tuple_(*self._cursor),
+                final
+            ).order_by(OutboxEvent.txid, OutboxEvent.id).limit(self.batch_size).all()
+            if events:
+                self._cursor = (events[-1].txid, events[-1].id)
+            return [to_message(outbox_event) for outbox_event in events]
+        finally:
+            db.close()
+
+async def stream(user_id: Optional[str], is_disconnected, heartbeat: float = ORDER_STREAM_HEARTBEAT_SECONDS):
+    """SSE body for one client (`user_id` None: all orders), subscribed while it is sent."""
+    # Subscribing here rather than in the route: a response that is never
+    # sent must not leave a subscription behind
+    subscription = hub.subscribe(user_id)
+    try:
+        yield f"retry: {RECONNECT_MILLISECONDS}\n: connected\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(message)
+    finally:
+        hub.unsubscribe(subscription)
+
+hub = OrderEventHub()
+feed = OrderEventFeed(hub)
+outbox.on_commit(feed.wake)
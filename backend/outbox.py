@@ -0,0 +1,264 @@
+"""
+Transactional outbox for order and CRM events.
+
+Routes that change state other parts of the system react to call
+``record(db, topic, aggregate_id, payload)`` before committing, so the event
+row commits (or rolls back) together with the change it describes. Work
+triggered by those changes runs in consumers registered with
+``@consumer(name, topics)``, outside the request:
+
+- an in-process dispatcher thread (``OUTBOX_DISPATCHER_ENABLED``) hands each
+  consumer its next batch of up to ``OUTBOX_BATCH_SIZE`` events, polling every
+  ``OUTBOX_POLL_SECONDS`` and woken right away by commits in this process;
+- every consumer has a checkpoint row, locked while its batch runs, so API
+  workers that each run a dispatcher never handle the same batch twice;
+- delivery is at least once: the checkpoint only moves after the handler
+  returned, in the same transaction as anything the handler wrote through
+  the session it is given (so database-only consumers apply each event once).
+  Handlers with external side effects must tolerate redelivery;
+- a failing batch is retried after ``OUTBOX_RETRY_BASE_SECONDS``, doubling up
+  to ``OUTBOX_RETRY_MAX_SECONDS``; the error is kept on the checkpoint and
+  shown by ``GET /diagnostics/outbox``.
+
+Events are dispatched in (txid, id) order, and only once every transaction
+with a lower txid has finished: ids are assigned before commit, so ordering
+by id alone would let a checkpoint move past an event that a slower
+transaction commits later. Events every subscribed consumer has handled are
+purged after ``OUTBOX_RETENTION_HOURS``.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, delete, event, func, literal_column, not_, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.models import OutboxEvent, OutboxCheckpoint
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DISPATCHER_ENABLED = os.getenv("OUTBOX_DISPATCHER_ENABLED", "true").lower() in ("1", "true", "yes")
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "1"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "72"))
+PURGE_INTERVAL_SECONDS = 600
+PENDING_KEY = "outbox_pending"
+
+# Oldest transaction still running: every event with a lower txid is final
+VISIBLE_HORIZON = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+Handler = Callable[[Session, List[OutboxEvent]], None]
+
+class Consumer:
+    def __init__(self, name: str, topics: Sequence[str], handler: Handler):
+        self.name = name
+        self.topics = tuple(topics)
+        self.handler = handler
+
+_consumers: Dict[str, Consumer] = {}
+_commit_callbacks: List[Callable[[], None]] = []
+
+def consumer(name: str, topics: Sequence[str]):
+    """Register `handler(db, events)` for the given topics under a stable name."""
+    def decorator(handler: Handler):
+        _consumers[name] = Consumer(name, topics, handler)
+        return handler
+    return decorator
+
+def registered_consumers() -> List[Consumer]:
+    return list(_consumers.values())
+
+def on_commit(callback: Callable[[], None]):
+    """Call `callback()` after each commit in this process that recorded events."""
+    _commit_callbacks.append(callback)
+
+def record(db: Session, topic: str, aggregate_id: str, payload: Dict[str, Any]) -> OutboxEvent:
+    """Add an event to the session; it is written by the caller's commit."""
+    outbox_event = OutboxEvent(topic=topic, aggregate_id=str(aggregate_id), payload=payload)
+    db.add(outbox_event)
+    db.info[PENDING_KEY] = True
+    return outbox_event
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next try after `attempts` consecutive failures."""
+    return min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+
+def _after_checkpoint(consumer: Consumer, checkpoint: Optional[OutboxCheckpoint]):
+    """Condition for the consumer's events that are not handled yet."""
+    condition = OutboxEvent.topic.in_(consumer.topics)
+    if checkpoint is not None:
+        condition = and_(condition, tuple_(OutboxEvent.txid, OutboxEvent.id) > tuple_(
+            checkpoint.last_txid, checkpoint.last_event_id
+        ))
+    return condition
+
+class OutboxDispatcher:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        consumers: Optional[List[Consumer]] = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_SECONDS
+    ):
+        self.session_factory = session_factory
+        self._consumers = consumers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._known: set = set()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._purged_at = time.monotonic()
+
+    @property
+    def consumers(self) -> List[Consumer]:
+        return self._consumers if self._consumers is not None else registered_consumers()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                busy = False
+            if not busy:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self) -> bool:
+        """One batch per consumer; whether any consumer may have more waiting."""
+        busy = False
+        for outbox_consumer in self.consumers:
+            busy = self.dispatch(outbox_consumer) >= self.batch_size or busy
+        if time.monotonic() - self._purged_at >= PURGE_INTERVAL_SECONDS:
+            self.purge()
+        return busy
+
+    def dispatch(self, outbox_consumer: Consumer) -> int:
+        """Hand the consumer its next batch; the number of events it handled."""
+        db = self.session_factory()
+        try:
+            checkpoint = self._lock_checkpoint(db, outbox_consumer.name)
+            if checkpoint is None:
+                # Held by another worker, or backing off after a failure
+                return 0
+            events = db.query(OutboxEvent).filter(
+                _after_checkpoint(outbox_consumer, checkpoint),
+                OutboxEvent.txid < VISIBLE_HORIZON
+            ).order_by(OutboxEvent.txid, OutboxEvent.id).limit(self.batch_size).all()
+            if not events:
+                db.rollback()
+                return 0
+            try:
+                outbox_consumer.handler(db, events)
+                db.flush()
+            except Exception as e:
+                db.rollback()
+                self._record_failure(db, outbox_consumer.name, e)
+                return 0
+            checkpoint.last_txid = events[-1].txid
+            checkpoint.last_event_id = events[-1].id
+            checkpoint.attempts = 0
+            checkpoint.next_attempt_at = None
+            checkpoint.last_error = None
+            db.commit()
+            return len(events)
+        finally:
+            db.close()
+
+    def _lock_checkpoint(self, db: Session, name: str) -> Optional[OutboxCheckpoint]:
+        if name not in self._known:
+            db.execute(insert(OutboxCheckpoint).values(
+                consumer=name, last_txid=0, last_event_id=0, attempts=0
+            ).on_conflict_do_nothing(index_elements=[OutboxCheckpoint.consumer]))
+            db.commit()
+            self._known.add(name)
+        return db.query(OutboxCheckpoint).filter(
+            OutboxCheckpoint.consumer == name,
+            or_(OutboxCheckpoint.next_attempt_at.is_(None), OutboxCheckpoint.next_attempt_at <= func.now())
+        ).with_for_update(skip_locked=True).first()
+
+    def _record_failure(self, db: Session, name: str, error: Exception):
+        checkpoint = db.get(OutboxCheckpoint, name, with_for_update=True)
+        checkpoint.attempts += 1
+        delay = retry_delay(checkpoint.attempts)
+        checkpoint.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        checkpoint.last_error = f"{type(error).__name__}: {error}"[:2000]
+        db.commit()
+        logger.warning(
+            "Outbox consumer %s failed (attempt %d), retrying in %.0fs",
+            name, checkpoint.attempts, delay, exc_info=error
+        )
+
+    def purge(self, retention_hours: float = OUTBOX_RETENTION_HOURS) -> int:
+        """Delete old events that every consumer subscribed to their topic has handled."""
+        self._purged_at = time.monotonic()
+        db = self.session_factory()
+        try:
+            checkpoints = {cp.consumer: cp for cp in db.query(OutboxCheckpoint).all()}
+            pending = [_after_checkpoint(c, checkpoints.get(c.name)) for c in self.consumers]
+            statement = delete(OutboxEvent).where(
+                OutboxEvent.created_at < func.now() - timedelta(hours=retention_hours)
+            )
+            if pending:
+                statement = statement.where(not_(or_(*pending)))
+            deleted = db.execute(statement).rowcount
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def status(self, db: Session) -> List[Dict[str, Any]]:
+        """Checkpoint, backlog and retry state of every consumer."""
+        checkpoints = {cp.consumer: cp for cp in db.query(OutboxCheckpoint).all()}
+        result = []
+        for outbox_consumer in self.consumers:
+            checkpoint = checkpoints.get(outbox_consumer.name)
+            pending = db.query(func.count(OutboxEvent.id)).filter(
+                _after_checkpoint(outbox_consumer, checkpoint)
+            ).scalar()
+            result.append({
+                "consumer": outbox_consumer.name,
+                "topics": list(outbox_consumer.topics),
+                "last_event_id": checkpoint.last_event_id if checkpoint else 0,
+                "pending": pending,
+                "attempts": checkpoint.attempts if checkpoint else 0,
+                "next_attempt_at": checkpoint.next_attempt_at if checkpoint else None,
+                "last_error": checkpoint.last_error if checkpoint else None,
+                "updated_at": checkpoint.updated_at if checkpoint else None
+            })
+        return result
+
+dispatcher = OutboxDispatcher()
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_dispatcher(session):
+    # Deliver this process's events without waiting for the next poll
+    if session.info.pop(PENDING_KEY, False):
+        dispatcher.wake()
+        for callback in _commit_callbacks:
+            callback()
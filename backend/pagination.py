@@ -0,0 +1,48 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token holding the sort key of the last row
+of a page, e.g. ``(created_at, id)``. The next page continues strictly after
+that key, so paging cost stays constant no matter how deep the client goes.
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row into an opaque cursor."""
+    payload = []
+    for value in values:
+        if isinstance(value, datetime):
+            payload.append({"dt": value.isoformat()})
+        elif isinstance(value, Decimal):
+            payload.append({"dec": str(value)})
+        else:
+            payload.append(value)
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[Tuple[Any, ...]]:
+    """Decode a cursor produced by `encode_cursor`; raises 400 on malformed input."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError("cursor size mismatch")
+        values = []
+        for value in payload:
+            if isinstance(value, dict) and "dt" in value:
+                values.append(datetime.fromisoformat(value["dt"]))
+            elif isinstance(value, dict) and "dec" in value:
+                values.append(Decimal(value["dec"]))
+            else:
+                values.append(value)
+        return tuple(values)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,132 @@
+"""
+Monthly range partitions of ``orders`` and ``order_items``.
+
+Both tables are partitioned by ``order_date`` (order_items carries a copy of
+its order's date), one partition per calendar month in UTC, named
+``orders_pYYYYMM`` / ``order_items_pYYYYMM``. There is no default partition,
+so a month's partitions must exist before its orders are inserted:
+
+- ``create_all`` creates them from the current month through
+  ``PARTITION_MONTHS_AHEAD`` months ahead;
+- the API re-checks that horizon at start-up and every
+  ``PARTITION_CHECK_HOURS`` (``maintain``);
+- loaders of historical data call ``ensure_partitions`` for their range.
+
+Queries are pruned to the months they touch when ``order_date`` is bounded
+with plain comparisons (``>=`` / ``<``, not ``extract()``). The planner does
+not carry range conditions across a join, so queries joining order_items
+bound ``OrderItem.order_date`` as well.
+
+Old months are removed with ``detach_before``: detaching (and dropping) a
+partition is a catalog operation, not a DELETE of every row.
+Existing unpartitioned tables are converted by ``scripts/partition_orders.py``.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from backend.database import engine
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_CHECK_HOURS = float(os.getenv("PARTITION_CHECK_HOURS", "6"))
+# Parents before children: order_items references orders
+PARTITIONED_TABLES = ("orders", "order_items")
+
+def month_start(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+def is_partitioned(conn, table: str = "orders") -> bool:
+    return bool(conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    ).scalar())
+
+def list_partitions(conn, table: str) -> List[Tuple[str, datetime]]:
+    """(name, month) of the table's monthly partitions, oldest first."""
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": table}).scalars()
+    prefix = f"{table}_p"
+    partitions = []
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((name, datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=timezone.utc)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def ensure_partitions(conn, start: datetime, end: datetime) -> List[str]:
+    """Create the missing monthly partitions for start..end (inclusive); their names."""
+    existing = {name for table in PARTITIONED_TABLES for name, _ in list_partitions(conn, table)}
+    created = []
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        upper = add_months(month, 1)
+        for table in PARTITIONED_TABLES:
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            ))
+            created.append(name)
+        month = upper
+    return created
+
+def create_initial_partitions(target, connection, **kw):
+    """`after_create` hook: partitions for the current month and the horizon."""
+    now = datetime.now(timezone.utc)
+    ensure_partitions(connection, now, add_months(month_start(now), PARTITION_MONTHS_AHEAD))
+
+def ensure_future_partitions(bind=None, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Keep partitions available through `months_ahead` months from now."""
+    with (bind or engine).begin() as conn:
+        # Tables not converted yet (scripts/partition_orders.py) need nothing
+        if not is_partitioned(conn):
+            return []
+        now = datetime.now(timezone.utc)
+        created = ensure_partitions(conn, now, add_months(month_start(now), months_ahead))
+    if created:
+        logger.info("Created order partitions: %s", ", ".join(created))
+    return created
+
+def detach_before(conn, before: datetime, drop: bool = False) -> List[str]:
+    """Detach (or drop) the partitions of months entirely before `before`; their names."""
+    cutoff = month_start(before)
+    removed = []
+    # Children first: an orders partition cannot be detached while items reference it
+    for table in reversed(PARTITIONED_TABLES):
+        for name, month in list_partitions(conn, table):
+            if add_months(month, 1) > cutoff:
+                continue
+            conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if drop:
+                conn.execute(text(f'DROP TABLE "{name}"'))
+            removed.append(name)
+    return removed
+
+async def maintain(interval_hours: float = PARTITION_CHECK_HOURS):
+    """Background task: keep future partitions created while the API runs."""
+    while True:
+        try:
+            await run_in_threadpool(ensure_future_partitions)
+        except Exception:
+            logger.exception("Order partition maintenance failed")
+        await asyncio.sleep(interval_hours * 3600)
@@ -0,0 +1,225 @@
+"""
+Bulk product import / upsert.
+
+Rows (CSV or NDJSON) are validated while streaming, written into a temporary
+staging table with PostgreSQL ``COPY`` and merged into ``products`` with one
+``UPDATE`` for existing products and one ``INSERT`` for new ones. Memory use
+stays flat regardless of file size.
+
+Rows are keyed by ``id``: a row with an existing id updates that product,
+any other row inserts a new one (a new id is generated when it is blank).
+Empty fields leave the stored value unchanged, so a warehouse stock feed
+only needs ``id`` and ``stock`` columns.
+"""
+import csv
+import io
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.bulk_copy import copy_from
+
+IMPORT_COLUMNS = ["id", "name", "description", "price", "stock", "category", "is_active"]
+MAX_REPORTED_ERRORS = 100
+# Column ranges: products.price is NUMERIC(10, 2), products.stock INTEGER
+PRICE_CENT = Decimal("0.01")
+PRICE_LIMIT = Decimal(10) ** 8
+STOCK_MAX = 2147483647
+
+STAGING_DDL = """
+CREATE TEMP TABLE product_import_staging (
+    line_no INTEGER NOT NULL,
+    id VARCHAR NOT NULL,
+    name VARCHAR,
+    description TEXT,
+    price NUMERIC(10, 2),
+    stock INTEGER,
+    category VARCHAR,
+    is_active BOOLEAN
+) ON COMMIT DROP
+"""
+
+# New products need at least a name and a price
+REJECT_INCOMPLETE_SQL = """
+DELETE FROM product_import_staging AS s
+WHERE (s.name IS NULL OR s.price IS NULL)
+  AND NOT EXISTS (SELECT 1 FROM products p WHERE p.id = s.id)
+RETURNING s.line_no
+"""
+
+# Only the last row per id is applied
+REJECT_SUPERSEDED_SQL = """
+DELETE FROM product_import_staging AS s
+USING product_import_staging AS later
+WHERE later.id = s.id AND later.line_no > s.line_no
+RETURNING s.line_no
+"""
+
+# Blank fields keep the stored value. The SET expressions read the row being
+# updated, re-read after waiting for its lock, so an order committed meanwhile
+# (a stock decrement) is not overwritten with an older value
+UPDATE_SQL = """
+UPDATE products AS p SET
+    name = COALESCE(s.name, p.name),
+    description = COALESCE(s.description, p.description),
+    price = COALESCE(s.price, p.price),
+    stock = COALESCE(s.stock, p.stock),
+    category = COALESCE(s.category, p.category),
+    is_active = COALESCE(s.is_active, p.is_active),
+    updated_at = now()
+FROM product_import_staging AS s
+WHERE p.id = s.id
+"""
+
+# The remaining rows are new products (complete, see REJECT_INCOMPLETE_SQL);
+# one created concurrently under the same id is left as it is
+INSERT_SQL = """
+INSERT INTO products (id, name, description, price, stock, category, is_active, created_at)
+SELECT s.id, s.name, s.description, s.price, COALESCE(s.stock, 0), s.category, COALESCE(s.is_active, TRUE), now()
+FROM product_import_staging AS s
+WHERE s.name IS NOT NULL AND s.price IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM products p WHERE p.id = s.id)
+ON CONFLICT (id) DO NOTHING
+"""
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def reject(self, line_no: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "reason": reason})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "rejected": self.rejected,
+            "errors": self.errors
+        }
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() == "")
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    lowered = str(value).strip().lower()
+    if lowered in ("1", "true", "t", "yes", "y"):
+        return True
+    if lowered in ("0", "false", "f", "no", "n"):
+        return False
+    raise ValueError(f"invalid boolean {value!r}")
+
+def normalize_row(raw: Dict[str, Any]) -> List[Optional[str]]:
+    """Validate one input row and return it in IMPORT_COLUMNS order (None = keep)."""
+    row: Dict[str, Optional[str]] = {}
+    for column in IMPORT_COLUMNS:
+        value = raw.get(column)
+        row[column] = None if _blank(value) else value
+
+    if row["id"] is None:
+        row["id"] = str(uuid.uuid4())
+
+    if row["price"] is not None:
+        try:
+            price = Decimal(str(row["price"]))
+        except InvalidOperation:
+            raise ValueError(f"invalid price {row['price']!r}")
+        if not price.is_finite():
+            raise ValueError(f"invalid price {row['price']!r}")
+        if price < 0:
+            raise ValueError("price must not be negative")
+        # Values out of the column's range would fail the whole COPY
+        if price.quantize(PRICE_CENT) >= PRICE_LIMIT:
+            raise ValueError(f"price must be less than {PRICE_LIMIT}")
+        row["price"] = str(price)
+
+    if row["stock"] is not None:
+        try:
+            stock = int(str(row["stock"]))
+        except ValueError:
+            raise ValueError(f"invalid stock {row['stock']!r}")
+        if stock < 0:
+            raise ValueError("stock must not be negative")
+        if stock > STOCK_MAX:
+            raise ValueError(f"stock must not exceed {STOCK_MAX}")
+        row["stock"] = str(stock)
+
+    if row["is_active"] is not None:
+        row["is_active"] = "true" if _parse_bool(row["is_active"]) else "false"
+
+    return [None if row[c] is None else str(row[c]) for c in IMPORT_COLUMNS]
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line_no, record) from a CSV (with header) or NDJSON stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, ValueError(f"invalid JSON: {e.msg}")
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+def detect_format(filename: Optional[str], fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt.lower()
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+def _copy_lines(records: Iterator[Tuple[int, Any]], result: ImportResult) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for line_no, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("row must be an object")
+            values = normalize_row(record)
+        except ValueError as e:
+            result.reject(line_no, str(e))
+            continue
+        # csv.writer renders None as an unquoted empty field, which COPY reads as NULL
+        writer.writerow([line_no] + values)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+
+def import_products(db: Session, stream: TextIO, fmt: str = "csv") -> ImportResult:
+    """
+    Stream rows into the staging table and merge them into products.
+    The caller commits (and should then bump the catalog version).
+    """
+    result = ImportResult()
+    db.execute(text(STAGING_DDL))
+
+    columns = ", ".join(["line_no"] + IMPORT_COLUMNS)
+    copy_sql = f"COPY product_import_staging ({columns}) FROM STDIN WITH (FORMAT csv)"
+    dbapi_connection = db.connection().connection.dbapi_connection
+    copy_from(dbapi_connection, copy_sql, _copy_lines(iter_records(stream, fmt), result))
+
+    for (line_no,) in db.execute(text(REJECT_INCOMPLETE_SQL)):
+        result.reject(line_no, "new product requires name and price")
+    for (line_no,) in db.execute(text(REJECT_SUPERSEDED_SQL)):
+        result.reject(line_no, "duplicate id, superseded by a later row")
+
+    result.updated = db.execute(text(UPDATE_SQL)).rowcount
+    result.inserted = db.execute(text(INSERT_SQL)).rowcount
+    return result
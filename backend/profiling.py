@@ -0,0 +1,246 @@
+"""
+On-demand request profiling.
+
+With ``PROFILING_ENABLED=true`` a super admin can profile a single request
+by sending ``X-Profile: 1`` (or adding ``?_profile=1``). The request runs
+normally while a sampling thread records the stacks of every thread that is
+inside the route's endpoint, every ``PROFILING_INTERVAL_MS``. The result is
+kept in memory (the last ``PROFILING_KEEP`` profiles of this process) and
+its id is returned in the ``X-Profile-Id`` response header; download it
+from ``GET /diagnostics/profiles/{id}`` in the folded-stack format read by
+flamegraph.pl, inferno and speedscope::
+
+    GET /orders/;read_all_orders (backend/routers/orders.py:166);... 42
+
+Samples are wall-clock, so time blocked on the database shows up as
+driver frames. Stacks start at the endpoint function: dependencies and
+middlewares are not included, and concurrent requests to the same endpoint
+are sampled too (profile on a quiet instance, or accept the noise).
+
+Profiling is rate limited (``PROFILING_MAX_PER_MINUTE``, one at a time per
+process). When disabled the middleware is not installed, so requests pay
+nothing; when enabled, unflagged requests pay one header scan.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from backend.database import SessionLocal
+from backend.auth import dependencies
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "2"))
+PROFILING_MAX_PER_MINUTE = int(os.getenv("PROFILING_MAX_PER_MINUTE", "6"))
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", "20"))
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAM = "_profile"
+MAX_STACK_DEPTH = 256
+
+_project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..")) + os.sep
+_labels: Dict[object, str] = {}
+
+def frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(_project_root):
+            filename = filename[len(_project_root):]
+        else:
+            # Site-packages and stdlib: keep the package-relative part
+            parts = filename.replace("\\", "/").split("/")
+            filename = "/".join(parts[-2:])
+        # ";" separates frames in the folded format
+        label = f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+class Profile:
+    def __init__(self, method: str, path: str, interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def folded(self) -> str:
+        """Stacks in the folded format: `frame;frame;... count` per line."""
+        root = f"{self.method} {self.route or self.path}".replace(";", ":")
+        lines = [
+            ";".join([root] + [frame_label(code) for code in stack]) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000
+        }
+
+class Sampler(threading.Thread):
+    """Samples the threads running the request's endpoint until stopped."""
+
+    def __init__(self, profile: Profile, scope: dict):
+        super().__init__(name=f"profiler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.scope = scope
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stopped.wait(self.profile.interval):
+            # Routing fills in scope["route"]; nothing to match before that
+            endpoint = getattr(self.scope.get("route"), "endpoint", None)
+            target = getattr(endpoint, "__code__", None)
+            if target is None:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(frame.f_code)
+                    if frame.f_code is target:
+                        self.profile.stacks[tuple(reversed(stack))] += 1
+                        break
+                    frame = frame.f_back
+
+class ProfileStore:
+    def __init__(self, keep: int = PROFILING_KEEP):
+        self._profiles: "deque[Profile]" = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def list(self) -> List[Profile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+profile_store = ProfileStore()
+
+class ProfileRateLimiter:
+    """At most `per_minute` profiles per sliding minute, one at a time."""
+
+    def __init__(self, per_minute: int = PROFILING_MAX_PER_MINUTE):
+        self.per_minute = per_minute
+        self._started: "deque[float]" = deque()
+        self._running = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[int]:
+        """Start a profile; returns None, or the seconds to wait before retrying."""
+        now = time.monotonic()
+        with self._lock:
+            while self._started and self._started[0] <= now - 60:
+                self._started.popleft()
+            if self._running:
+                return 1
+            if len(self._started) >= self.per_minute:
+                return int(self._started[0] + 60 - now) + 1
+            self._started.append(now)
+            self._running = True
+            return None
+
+    def release(self):
+        with self._lock:
+            self._running = False
+
+def profiling_requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value not in (b"", b"0", b"false")
+    query_string = scope.get("query_string", b"")
+    if PROFILE_QUERY_PARAM.encode() in query_string:
+        params = dict(parse_qsl(query_string.decode("latin-1")))
+        return params.get(PROFILE_QUERY_PARAM, "0") not in ("", "0", "false")
+    return False
+
+async def authorize(scope) -> Optional[HTTPException]:
+    """Run the require_super_admin chain outside of a route; the error, if any."""
+    db = SessionLocal()
+    try:
+        user = await dependencies.get_current_user(Request(scope), db)
+        user = await dependencies.get_current_active_user(user)
+        await dependencies.require_super_admin(user)
+    except HTTPException as e:
+        return e
+    finally:
+        db.close()
+    return None
+
+class ProfilingMiddleware:
+    def __init__(self, app, store: ProfileStore = profile_store, limiter: Optional[ProfileRateLimiter] = None):
+        self.app = app
+        self.store = store
+        self.limiter = limiter or ProfileRateLimiter()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiling_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        error = await authorize(scope)
+        if error is not None:
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers=error.headers)
+            await response(scope, receive, send)
+            return
+        retry_after = self.limiter.acquire()
+        if retry_after is not None:
+            response = JSONResponse(
+                {"detail": "Profiling rate limit reached"}, status_code=429,
+                headers={"Retry-After": str(retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], PROFILING_INTERVAL_MS / 1000)
+        sampler = Sampler(profile, scope)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            self.limiter.release()
+            profile.duration = time.perf_counter() - started
+            profile.route = getattr(scope.get("route"), "path", None)
+            self.store.add(profile)
@@ -0,0 +1,151 @@
+"""
+Query budgets and N+1 detection.
+
+Every statement executed on an instrumented engine is recorded in the
+current ``QueryLog`` (a context variable), grouped by statement shape:
+the SQL with literals and expanded ``IN (...)`` lists collapsed, so the
+same lazy load issued once per row shows up as one shape with a high count.
+
+Routes declare a budget with the ``query_budget`` decorator::
+
+    @router.get("/orders/my-orders")
+    @query_budget(5)
+    def read_my_orders(...):
+
+``QueryBudgetMiddleware`` checks the request's log against the route's
+budget, and any shape repeated ``N_PLUS_ONE_THRESHOLD`` times or more is
+reported as a likely N+1. Jobs and tests use ``track_queries`` the same way
+(as a ``with`` block or a decorator); a tracked job run by a request also
+counts toward the request's budget.
+
+What happens on a violation is set by ``QUERY_BUDGET_MODE``:
+
+- ``warn`` (default): log a warning with the offending shapes.
+- ``raise``: raise ``QueryBudgetExceeded`` (an AssertionError), so tests
+  that exercise the route fail. Set it in the test / CI environment.
+- ``off``: nothing is recorded (the middleware is not installed).
+"""
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "warn").lower()
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+_PARAM = r"(?:%\(\w+\)s|%s|\?|\$\d+|:\w+)"
+_IN_LIST = re.compile(r"\(\s*" + _PARAM + r"(?:\s*,\s*" + _PARAM + r")+\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4096)
+def statement_shape(statement: str) -> str:
+    """Normalize SQL so repeated executions of one query share a shape."""
+    shape = _SPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("(...)", shape)
+
+class QueryLog:
+    def __init__(self, name: str = "", budget: Optional[int] = None, parent: Optional["QueryLog"] = None):
+        self.name = name
+        self.budget = budget
+        self.count = 0
+        self.shapes: Counter = Counter()
+        # Enclosing scope (e.g. the request running a tracked job), which counts the statements too
+        self.parent = parent
+
+    def record(self, statement: str):
+        self.count += 1
+        self.shapes[statement_shape(statement)] += 1
+        if self.parent is not None:
+            self.parent.record(statement)
+
+    def repeated(self, threshold: int = None) -> List[Tuple[str, int]]:
+        """Shapes executed at least `threshold` times (likely N+1 loads)."""
+        threshold = threshold or N_PLUS_ONE_THRESHOLD
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def problems(self) -> List[str]:
+        problems = []
+        if self.budget is not None and self.count > self.budget:
+            problems.append(f"{self.count} queries, budget {self.budget}")
+        for shape, count in self.repeated():
+            problems.append(f"{count}x {shape[:300]}")
+        return problems
+
+    def check(self, mode: Optional[str] = None):
+        mode = mode or QUERY_BUDGET_MODE
+        problems = self.problems()
+        if not problems or mode == "off":
+            return
+        message = f"Query budget exceeded in {self.name or 'unnamed scope'}: " + "; ".join(problems)
+        if mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+current_log: ContextVar[Optional[QueryLog]] = ContextVar("current_query_log", default=None)
+
+def query_budget(max_queries: int):
+    """Declare the maximum number of statements a route may execute."""
+    def decorator(endpoint):
+        endpoint.__query_budget__ = max_queries
+        return endpoint
+    return decorator
+
+@contextmanager
+def track_queries(name: str, budget: Optional[int] = None, mode: Optional[str] = None) -> Iterator[QueryLog]:
+    """Record statements in the block (e.g. a job) and check them on exit."""
+    log = QueryLog(name, budget, parent=current_log.get())
+    token = current_log.set(log)
+    try:
+        yield log
+    finally:
+        current_log.reset(token)
+    log.check(mode)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = current_log.get()
+    if log is not None:
+        log.record(statement)
+
+def instrument_engine(engine):
+    """Record statements on `engine` into the current query log (idempotent)."""
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class QueryBudgetMiddleware:
+    def __init__(self, app, mode: Optional[str] = None):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog()
+        token = current_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_log.reset(token)
+
+        route = scope.get("route")
+        if route is None:
+            return
+        log.name = f"{scope['method']} {getattr(route, 'path', '')}"
+        log.budget = getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+        log.check(self.mode)
@@ -0,0 +1,115 @@
+"""
+Read replica routing helpers.
+
+With ``DATABASE_REPLICA_URL`` set, read-only endpoints take their session from
+``database.get_read_db``, which uses the replica unless:
+
+- the replica is more than ``REPLICA_MAX_LAG_SECONDS`` behind the primary,
+  is not streaming from it, or cannot be reached. ``ReplicaLagGuard`` checks this at most once per
+  ``REPLICA_LAG_CHECK_SECONDS`` and reads fall back to the primary meanwhile;
+- the client wrote recently. After a successful non-GET request,
+  ``ReadYourWritesMiddleware`` sets a short-lived cookie, and that client's
+  reads stay on the primary for ``REPLICA_STICKY_SECONDS``, so a customer
+  always sees the order they just placed.
+
+Writes, and reads inside write requests (such as the reload at the end of
+``create_order``), always use the primary through ``get_db``.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "1"))
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# 0 on a primary or a caught-up standby; NULL when the lag is unknown.
+# Equal receive and replay positions only mean the standby replayed what it
+# received: with its WAL receiver down it falls behind unseen, so it must also
+# be streaming. Reading pg_stat_wal_receiver.status needs pg_read_all_stats
+# (or pg_monitor); without it the status is NULL and reads stay on the primary
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+class ReplicaLagGuard:
+    def __init__(self, engine, max_lag: float = REPLICA_MAX_LAG_SECONDS, check_interval: float = REPLICA_LAG_CHECK_SECONDS):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def measure(self) -> Optional[float]:
+        """Current replication lag in seconds; None when unknown or unreachable."""
+        # Raw DBAPI connection: the check is not one of the request's queries
+        # (metrics, query budgets)
+        try:
+            connection = self.engine.raw_connection()
+            try:
+                cursor = connection.cursor()
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+                cursor.close()
+                connection.rollback()
+            finally:
+                connection.close()
+        except Exception:
+            logger.warning("Replica lag check failed; reading from the primary", exc_info=True)
+            return None
+        return None if lag is None else float(lag)
+
+    def acceptable(self) -> bool:
+        """Whether reads may go to the replica (re-checked at most once per interval)."""
+        now = time.monotonic()
+        # One thread re-checks; the others use the last result meanwhile
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                previous = self.lag
+                self.lag = self.measure()
+                self._checked_at = time.monotonic()
+                if self.lag is not None and self.lag > self.max_lag and (previous is None or previous <= self.max_lag):
+                    logger.warning("Replica lag %.1fs exceeds %.1fs; reading from the primary", self.lag, self.max_lag)
+            finally:
+                self._lock.release()
+        return self.lag is not None and self.lag <= self.max_lag
+
+def pinned_to_primary(cookies) -> bool:
+    """Whether the client wrote within the last REPLICA_STICKY_SECONDS."""
+    try:
+        return float(cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a while after each successful write."""
+
+    def __init__(self, app, sticky_seconds: int = REPLICA_STICKY_SECONDS):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = int(time.time()) + self.sticky_seconds
+                cookie = f"{PRIMARY_COOKIE}={until}; Max-Age={self.sticky_seconds}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
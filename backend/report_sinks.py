@@ -0,0 +1,316 @@
+"""
+Report sinks: where report tables (a header row plus data rows) are written.
+
+Report queries hand their tables to a sink instead of talking to gspread
+directly, so the same pipeline can target:
+
+- ``GoogleSheetsSink``: a spreadsheet. Writes are buffered and sent on
+  ``flush()`` as one ``values_batch_clear`` plus one ``values_batch_update``
+  call, whatever the number of tables and rows.
+- ``LocalFileSink``: one CSV (or Parquet, when pyarrow is installed) file per
+  table in a directory, for bulk archives.
+- ``GoogleSheetsSink`` over ``FakeSpreadsheet``: an in-memory stand-in for
+  the Sheets API that records every call and the number of rows written, for
+  tests where no credentials are available.
+
+Tables are either replaced wholesale (``replace``) or merged by a key column
+(``upsert``): rows whose key already exists are overwritten in place, new
+keys are appended.
+"""
+import csv
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import gspread
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional, Parquet output only
+    pyarrow = None
+
+Row = Sequence[Any]
+
+class ReportSink(ABC):
+    """Interface shared by all sinks."""
+
+    @abstractmethod
+    def replace(self, table: str, headers: Row, rows: Sequence[Row]):
+        """Replace the whole table with `headers` and `rows`."""
+
+    @abstractmethod
+    def upsert(self, table: str, headers: Row, rows: Sequence[Row], key_index: int = 0):
+        """Overwrite rows whose key column matches, append the others."""
+
+    def flush(self):
+        """Send buffered writes (no-op for unbuffered sinks)."""
+
+    @property
+    @abstractmethod
+    def target(self) -> str:
+        """Identifies where the sink writes (used to key export watermarks)."""
+
+def a1_range(title: str, cell_range: str) -> str:
+    return "'{}'!{}".format(title.replace("'", "''"), cell_range)
+
+def column_letter(index: int) -> str:
+    """1 -> A, 27 -> AA."""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+class GoogleSheetsSink(ReportSink):
+    """
+    Writes tables to worksheets (one per table) of a gspread ``Spreadsheet``
+    or anything exposing the same subset (see ``FakeSpreadsheet``).
+    """
+
+    def __init__(self, spreadsheet, empty_placeholder: Optional[str] = None, min_rows: int = 100):
+        self.spreadsheet = spreadsheet
+        self.empty_placeholder = empty_placeholder
+        self.min_rows = min_rows
+        self._clears: List[str] = []
+        self._updates: List[Dict[str, Any]] = []
+
+    @property
+    def target(self) -> str:
+        return f"gsheet:{self.spreadsheet.id}"
+
+    def _worksheet(self, title: str, cols: int):
+        try:
+            return self.spreadsheet.worksheet(title)
+        except gspread.WorksheetNotFound:
+            return self.spreadsheet.add_worksheet(title=title, rows=self.min_rows, cols=max(cols, 1))
+
+    def _ensure_rows(self, worksheet, last_row: int):
+        if last_row > worksheet.row_count:
+            worksheet.add_rows(last_row - worksheet.row_count)
+
+    def replace(self, table: str, headers: Row, rows: Sequence[Row]):
+        worksheet = self._worksheet(table, len(headers))
+        values = [list(headers)] + [list(row) for row in rows]
+        if not rows and self.empty_placeholder:
+            values.append([self.empty_placeholder])
+        self._ensure_rows(worksheet, len(values))
+        self._clears.append(a1_range(worksheet.title, f"A1:{column_letter(worksheet.col_count)}"))
+        self._updates.append({"range": a1_range(worksheet.title, "A1"), "values": values})
+
+    def upsert(self, table: str, headers: Row, rows: Sequence[Row], key_index: int = 0):
+        worksheet = self._worksheet(table, len(headers))
+        # One read of the key column maps keys to sheet rows
+        existing = worksheet.col_values(key_index + 1)
+        if not existing:
+            self._updates.append({"range": a1_range(worksheet.title, "A1"), "values": [list(headers)]})
+            existing = [headers[key_index]]
+        row_of = {str(value): index + 1 for index, value in enumerate(existing) if index > 0 and value}
+        next_row = len(existing) + 1
+        if len(existing) == 2 and existing[1] == self.empty_placeholder:
+            next_row = 2
+
+        last_column = column_letter(len(headers))
+        appended = []
+        for row in rows:
+            index = row_of.get(str(row[key_index]))
+            if index:
+                self._updates.append({
+                    "range": a1_range(worksheet.title, f"A{index}:{last_column}{index}"),
+                    "values": [list(row)]
+                })
+            else:
+                appended.append(list(row))
+
+        if appended:
+            last_row = next_row + len(appended) - 1
+            self._ensure_rows(worksheet, last_row)
+            self._updates.append({
+                "range": a1_range(worksheet.title, f"A{next_row}:{last_column}{last_row}"),
+                "values": appended
+            })
+
+    def flush(self):
+        if self._clears:
+            self.spreadsheet.values_batch_clear(body={"ranges": self._clears})
+        if self._updates:
+            self.spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": self._updates})
+        self._clears = []
+        self._updates = []
+
+def open_google_sheet(spreadsheet_id: str, credentials_path: str):
+    """Open a spreadsheet with service account credentials."""
+    from google.oauth2.service_account import Credentials
+
+    if not os.path.exists(credentials_path):
+        raise FileNotFoundError(f"Credentials file not found at: {credentials_path}")
+    scope = [
+        "https://spreadsheets.google.com/feeds",
+        "https://www.googleapis.com/auth/drive",
+    ]
+    creds = Credentials.from_service_account_file(credentials_path, scopes=scope)
+    return gspread.authorize(creds).open_by_key(spreadsheet_id)
+
+class LocalFileSink(ReportSink):
+    """One file per table in `directory`: ``<table>.csv`` or ``<table>.parquet``."""
+
+    def __init__(self, directory: str, fmt: str = "csv"):
+        if fmt not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        if fmt == "parquet" and pyarrow is None:
+            raise RuntimeError("Parquet output requires pyarrow")
+        self.directory = directory
+        self.fmt = fmt
+
+    @property
+    def target(self) -> str:
+        return f"{self.fmt}:{os.path.abspath(self.directory)}"
+
+    def path(self, table: str) -> str:
+        return os.path.join(self.directory, f"{table}.{self.fmt}")
+
+    def read(self, table: str) -> Tuple[List[Any], List[List[Any]]]:
+        """(headers, rows) of a table; empty when it was never written."""
+        path = self.path(table)
+        if not os.path.exists(path):
+            return [], []
+        if self.fmt == "parquet":
+            data = pyarrow.parquet.read_table(path)
+            return data.column_names, [list(row.values()) for row in data.to_pylist()]
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            lines = list(csv.reader(f))
+        return (lines[0], lines[1:]) if lines else ([], [])
+
+    def _write(self, table: str, headers: Row, rows: Sequence[Row]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(table)
+        tmp_path = path + ".tmp"
+        if self.fmt == "parquet":
+            columns = {}
+            for i, name in enumerate(headers):
+                values = [row[i] if i < len(row) else None for row in rows]
+                try:
+                    columns[str(name)] = pyarrow.array(values)
+                except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                    # Mixed types (e.g. a label row in a numeric column): store as text
+                    columns[str(name)] = pyarrow.array([None if v is None else str(v) for v in values])
+            pyarrow.parquet.write_table(pyarrow.table(columns), tmp_path)
+        else:
+            # BOM so Excel opens the Chinese headers correctly
+            with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f)
+                writer.writerow(headers)
+                writer.writerows(rows)
+        os.replace(tmp_path, path)
+
+    def replace(self, table: str, headers: Row, rows: Sequence[Row]):
+        self._write(table, headers, rows)
+
+    def upsert(self, table: str, headers: Row, rows: Sequence[Row], key_index: int = 0):
+        _, existing = self.read(table)
+        merged: Dict[str, List[Any]] = {str(row[key_index]): row for row in existing if row}
+        for row in rows:
+            merged[str(row[key_index])] = list(row)
+        self._write(table, headers, list(merged.values()))
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: "FakeSpreadsheet", title: str, rows: int, cols: int):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells: Dict[int, List[Any]] = {}
+
+    def col_values(self, col: int) -> List[Any]:
+        self.spreadsheet._record("col_values", self.title, col)
+        if not self.cells:
+            return []
+        values = [
+            (self.cells[r][col - 1] if r in self.cells and col - 1 < len(self.cells[r]) else "")
+            for r in range(1, max(self.cells) + 1)
+        ]
+        while values and values[-1] in ("", None):
+            values.pop()
+        return values
+
+    def add_rows(self, rows: int):
+        self.spreadsheet._record("add_rows", self.title, rows)
+        self.row_count += rows
+
+    def get_all_values(self) -> List[List[Any]]:
+        self.spreadsheet._record("get_all_values", self.title)
+        if not self.cells:
+            return []
+        return [list(self.cells.get(r, [])) for r in range(1, max(self.cells) + 1)]
+
+class FakeSpreadsheet:
+    """
+    In-memory spreadsheet implementing the gspread subset used by the sinks.
+    Every API call is appended to ``calls`` as (method, *args); ``rows_written``
+    counts rows sent through ``values_batch_update``.
+    """
+
+    def __init__(self, spreadsheet_id: str = "fake"):
+        self.id = spreadsheet_id
+        self.sheets: Dict[str, FakeWorksheet] = {}
+        self.calls: List[Tuple[Any, ...]] = []
+        self.rows_written = 0
+
+    def _record(self, method: str, *args):
+        self.calls.append((method,) + args)
+
+    def call_count(self, method: Optional[str] = None) -> int:
+        return sum(1 for call in self.calls if method is None or call[0] == method)
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self._record("worksheets")
+        return list(self.sheets.values())
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._record("worksheet", title)
+        if title not in self.sheets:
+            raise gspread.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> FakeWorksheet:
+        self._record("add_worksheet", title)
+        self.sheets[title] = FakeWorksheet(self, title, rows, cols)
+        return self.sheets[title]
+
+    def _parse_range(self, a1: str) -> Tuple[FakeWorksheet, int, Optional[int]]:
+        title, cells = a1.rsplit("!", 1)
+        title = title.strip("'").replace("''", "'")
+        match = re.fullmatch(r"[A-Z]+(\d*)(?::[A-Z]+(\d*))?", cells)
+        start = int(match.group(1) or 1)
+        end = int(match.group(2)) if match.group(2) else None
+        return self.sheets[title], start, end
+
+    def values_batch_get(self, ranges: List[str], params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._record("values_batch_get", len(ranges))
+        value_ranges = []
+        for a1 in ranges:
+            worksheet, start, end = self._parse_range(a1)
+            last = max(worksheet.cells) if worksheet.cells else 0
+            if end is not None:
+                last = min(last, end)
+            values = [list(worksheet.cells.get(r, [])) for r in range(start, last + 1)]
+            value_ranges.append({"range": a1, "values": values} if values else {"range": a1})
+        return {"valueRanges": value_ranges}
+
+    def values_batch_clear(self, body: Dict[str, Any]):
+        self._record("values_batch_clear", len(body["ranges"]))
+        for a1 in body["ranges"]:
+            worksheet, start, end = self._parse_range(a1)
+            for row in [r for r in worksheet.cells if r >= start and (end is None or r <= end)]:
+                del worksheet.cells[row]
+
+    def values_batch_update(self, body: Dict[str, Any]):
+        self._record("values_batch_update", len(body["data"]))
+        for value_range in body["data"]:
+            worksheet, start, _ = self._parse_range(value_range["range"])
+            for offset, values in enumerate(value_range["values"]):
+                if start + offset > worksheet.row_count:
+                    raise ValueError(f"Range exceeds grid limits of {worksheet.title!r}")
+                worksheet.cells[start + offset] = list(values)
+            self.rows_written += len(value_range["values"])
@@ -0,0 +1,288 @@
+"""
+Order reports for arbitrary periods.
+
+A period is a calendar week / month / quarter / year or a custom date range,
+resolved in ``REPORT_TIMEZONE`` into a half-open ``[start, end)`` interval
+on ``orders.order_date``. Every figure is an aggregate query pushed down to
+the database; no order rows are loaded.
+
+Reports on finalized periods are stored in ``report_snapshots`` and served
+from there (and from a small in-process cache) instead of being recomputed.
+A period is finalized ``REPORT_FINALIZE_DAYS`` after it ends, which leaves
+time for late status changes (cancellations, completions); pass
+``refresh=True`` to recompute and replace a stored snapshot.
+
+Revenue figures (per customer, per product, totals) exclude cancelled
+orders; the status breakdown includes every status. Archived orders
+(backend/archive.py) are counted with the live ones, so archiving does not
+change a period's figures.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select, true, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.archive import archived_items, order_history
+from backend.models import ArchivedOrder, Order, OrderItem, Product, User, ReportSnapshot
+
+REPORT_TIMEZONE = ZoneInfo(os.getenv("REPORT_TIMEZONE", "Asia/Taipei"))
+REPORT_FINALIZE_DAYS = int(os.getenv("REPORT_FINALIZE_DAYS", "30"))
+PERIOD_KINDS = ("week", "month", "quarter", "year", "custom")
+REVENUE_EXCLUDED_STATUSES = ("cancelled",)
+MAX_MEMORY_SNAPSHOTS = 256
+
+class Period:
+    def __init__(self, kind: str, label: str, start: datetime, end: datetime):
+        self.kind = kind
+        self.label = label
+        self.start = start
+        self.end = end
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.label}"
+
+    def is_finalized(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now(timezone.utc)
+        return self.end + timedelta(days=REPORT_FINALIZE_DAYS) <= now
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "label": self.label,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat()
+        }
+
+def _local(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=REPORT_TIMEZONE)
+
+def resolve_period(
+    kind: str,
+    value: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    today: Optional[date] = None
+) -> Period:
+    """
+    Resolve a period. `value` selects a calendar period (2026-W42, 2026-10,
+    2026-Q4, 2026) and defaults to the current one; `custom` takes the
+    inclusive dates `date_from` .. `date_to`. Raises ValueError when invalid.
+    """
+    today = today or datetime.now(REPORT_TIMEZONE).date()
+    if kind == "custom":
+        if not date_from or not date_to:
+            raise ValueError("custom periods require date_from and date_to")
+        if date_from > date_to:
+            raise ValueError("date_from must not be after date_to")
+        label = f"{date_from.isoformat()}..{date_to.isoformat()}"
+        return Period(kind, label, _local(date_from), _local(date_to + timedelta(days=1)))
+
+    if kind == "week":
+        if value:
+            match = re.fullmatch(r"(\d{4})-W(\d{1,2})", value)
+            if not match:
+                raise ValueError("week must look like 2026-W42")
+            try:
+                first = date.fromisocalendar(int(match.group(1)), int(match.group(2)), 1)
+            except ValueError:
+                raise ValueError(f"invalid week {value}")
+        else:
+            first = today - timedelta(days=today.weekday())
+        year, week, _ = first.isocalendar()
+        return Period(kind, f"{year}-W{week:02d}", _local(first), _local(first + timedelta(days=7)))
+
+    if kind == "month":
+        if value:
+            match = re.fullmatch(r"(\d{4})-(\d{1,2})", value)
+            if not match or not 1 <= int(match.group(2)) <= 12:
+                raise ValueError("month must look like 2026-10")
+            year, month = int(match.group(1)), int(match.group(2))
+        else:
+            year, month = today.year, today.month
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return Period(kind, f"{year}-{month:02d}", _local(date(year, month, 1)), _local(date(next_year, next_month, 1)))
+
+    if kind == "quarter":
+        if value:
+            match = re.fullmatch(r"(\d{4})-Q([1-4])", value)
+            if not match:
+                raise ValueError("quarter must look like 2026-Q4")
+            year, quarter = int(match.group(1)), int(match.group(2))
+        else:
+            year, quarter = today.year, (today.month - 1) // 3 + 1
+        first_month = 3 * (quarter - 1) + 1
+        start = date(year, first_month, 1)
+        end = date(year + 1, 1, 1) if quarter == 4 else date(year, first_month + 3, 1)
+        return Period(kind, f"{year}-Q{quarter}", _local(start), _local(end))
+
+    if kind == "year":
+        if value:
+            if not re.fullmatch(r"\d{4}", value):
+                raise ValueError("year must look like 2026")
+            year = int(value)
+        else:
+            year = today.year
+        return Period(kind, str(year), _local(date(year, 1, 1)), _local(date(year + 1, 1, 1)))
+
+    raise ValueError(f"Unknown period kind: {kind}")
+
+def _orders_in_period(period: Period):
+    """Live and archived orders placed in the period."""
+    return order_history(start=period.start, end=period.end)
+
+def _items_in_period(period: Period):
+    """Items (product_id, quantity, subtotal) of the period's revenue orders, live and archived."""
+    # order_items is bounded as well: the planner does not carry it across the join
+    live = select(OrderItem.product_id, OrderItem.quantity, OrderItem.subtotal).join(
+        Order, (Order.id == OrderItem.order_id) & (Order.order_date == OrderItem.order_date)
+    ).where(
+        Order.order_date >= period.start, Order.order_date < period.end,
+        OrderItem.order_date >= period.start, OrderItem.order_date < period.end,
+        Order.status.notin_(REVENUE_EXCLUDED_STATUSES)
+    )
+    item = archived_items()
+    archived = select(item.c.product_id, item.c.quantity, item.c.subtotal).select_from(ArchivedOrder).join(
+        item, true()
+    ).where(
+        ArchivedOrder.order_date >= period.start, ArchivedOrder.order_date < period.end,
+        ArchivedOrder.status.notin_(REVENUE_EXCLUDED_STATUSES)
+    )
+    return union_all(live, archived).subquery("period_items")
+
+def _amount(value) -> float:
+    return float(value or 0)
+
+def orders_by_status(db: Session, period: Period) -> List[Dict[str, Any]]:
+    orders = _orders_in_period(period)
+    rows = db.execute(
+        select(orders.c.status, func.count(), func.sum(orders.c.total_amount))
+        .group_by(orders.c.status)
+        .order_by(func.count().desc(), orders.c.status)
+    )
+    return [{"status": status, "orders": count, "amount": _amount(amount)} for status, count, amount in rows]
+
+def revenue_by_customer(db: Session, period: Period, top: int) -> List[Dict[str, Any]]:
+    orders = _orders_in_period(period)
+    amount = func.sum(orders.c.total_amount)
+    rows = db.execute(
+        select(
+            orders.c.user_id,
+            func.coalesce(func.nullif(User.company_name, ""), User.username),
+            func.count(),
+            amount
+        )
+        .join(User, User.id == orders.c.user_id)
+        .where(orders.c.status.notin_(REVENUE_EXCLUDED_STATUSES))
+        .group_by(orders.c.user_id, User.company_name, User.username)
+        .order_by(amount.desc().nulls_last(), orders.c.user_id)
+        .limit(top)
+    )
+    return [
+        {"user_id": user_id, "customer_name": name, "orders": count, "amount": _amount(total)}
+        for user_id, name, count, total in rows
+    ]
+
+def top_products(db: Session, period: Period, top: int, by: str) -> List[Dict[str, Any]]:
+    items = _items_in_period(period)
+    quantity = func.sum(items.c.quantity)
+    amount = func.sum(items.c.subtotal)
+    ranking = quantity if by == "quantity" else amount
+    rows = db.execute(
+        select(items.c.product_id, Product.name, quantity, amount)
+        .join(Product, Product.id == items.c.product_id)
+        .group_by(items.c.product_id, Product.name)
+        .order_by(ranking.desc().nulls_last(), items.c.product_id)
+        .limit(top)
+    )
+    return [
+        {"product_id": product_id, "name": name, "quantity": int(qty or 0), "amount": _amount(total)}
+        for product_id, name, qty, total in rows
+    ]
+
+def build_order_report(db: Session, period: Period, top: int = 10) -> Dict[str, Any]:
+    """Compute the report for `period` (no caching)."""
+    by_status = orders_by_status(db, period)
+    revenue = [row for row in by_status if row["status"] not in REVENUE_EXCLUDED_STATUSES]
+    return {
+        "period": period.to_dict(),
+        "total_orders": sum(row["orders"] for row in by_status),
+        "revenue_orders": sum(row["orders"] for row in revenue),
+        "revenue": sum(row["amount"] for row in revenue),
+        "orders_by_status": by_status,
+        "revenue_by_customer": revenue_by_customer(db, period, top),
+        "top_products_by_quantity": top_products(db, period, top, "quantity"),
+        "top_products_by_amount": top_products(db, period, top, "amount"),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "finalized": period.is_finalized()
+    }
+
+class ReportCache:
+    """Finalized reports: in-process LRU in front of the `report_snapshots` table."""
+
+    def __init__(self, max_entries: int = MAX_MEMORY_SNAPSHOTS):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        payload = db.execute(select(ReportSnapshot.payload).where(ReportSnapshot.key == key)).scalar()
+        if payload is not None:
+            self._remember(key, payload)
+        return payload
+
+    def put(self, db: Session, key: str, period: Period, payload: Dict[str, Any]):
+        statement = insert(ReportSnapshot).values(
+            key=key, period_start=period.start, period_end=period.end, payload=payload
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[ReportSnapshot.key],
+            set_={"payload": statement.excluded.payload, "created_at": func.now()}
+        ))
+        db.commit()
+        self._remember(key, payload)
+
+    def _remember(self, key: str, payload: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+report_cache = ReportCache()
+
+def get_order_report(
+    db: Session,
+    period: Period,
+    top: int = 10,
+    refresh: bool = False,
+    snapshot_db: Optional[Session] = None
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    The order report for `period`, served from the snapshot store when the
+    period is finalized. Returns (report, served from cache).
+    New snapshots are written through `snapshot_db` (default: `db`), so the
+    report itself can be computed on a read replica.
+    """
+    key = f"orders:{period.key}:top={top}"
+    finalized = period.is_finalized()
+    if finalized and not refresh:
+        cached = report_cache.get(db, key)
+        if cached is not None:
+            return cached, True
+
+    report = build_order_report(db, period, top)
+    if finalized:
+        report_cache.put(snapshot_db or db, key, period, report)
+    return report, False
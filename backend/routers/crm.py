@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, and_, tuple_, func, extract
 from typing import List, Optional
 from datetime import datetime
 import uuid
-from backend.database import get_db
-from backend.models import Customer, Interaction
+from backend.database import get_db, get_read_db
+from backend.query_budget import query_budget
+from backend import outbox
+from backend.pagination import encode_cursor, decode_cursor
+from backend.serialization import FastJSONResponse, serialize_rows, parse_fieldset, select_fields, CUSTOMER_FIELDS
+from backend.models import Customer, Interaction, User, Order
 from backend.auth import schemas, dependencies
-from backend import crm_engine
+from backend import crm_engine, archive
 
 router = APIRouter(prefix="/crm", tags=["crm"])
 
 # ==================== 客戶管理 API ====================
 
 @router.post("/customers", response_model=schemas.CustomerResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(7)
 def create_customer(
     customer_data: schemas.CustomerCreate,
     db: Session = Depends(get_db),
@@ -27,6 +32,14 @@ def create_customer(
         if existing:
             raise HTTPException(status_code=400, detail="Email already registered")
     
+    # 連結同 email 的使用者帳號（尚未連結其他客戶時）
+    linked_user = None
+    if customer_data.email:
+        linked_user = db.query(User).filter(
+            User.email == customer_data.email,
+            ~User.customer.has()
+        ).first()
+    
     new_customer = Customer(
         id=str(uuid.uuid4()),
         company_name=customer_data.company_name,
@@ -36,22 +49,30 @@ def create_customer(
         address=customer_data.address,
         industry=customer_data.industry,
         source=customer_data.source,
+        user_id=linked_user.id if linked_user else None,
         grade="C"  # 預設等級
     )
     
     db.add(new_customer)
+    outbox.record(db, "customer.created", new_customer.id, {
+        "customer_id": new_customer.id,
+        "company_name": new_customer.company_name,
+        "user_id": new_customer.user_id
+    })
     db.commit()
     db.refresh(new_customer)
     return new_customer
 
 @router.get("/customers", response_model=List[schemas.CustomerResponse])
+@query_budget(4)
 def list_customers(
     grade: Optional[str] = None,
     industry: Optional[str] = None,
     sort_by: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. id,company_name,grade"),
+    db: Session = Depends(get_read_db),
     current_user = Depends(dependencies.require_staff)
 ):
     """
@@ -59,7 +80,9 @@ def list_customers(
     - 依 grade 篩選
     - 依 industry 篩選
     - 支援排序：sort_by=last_order_date
+    - fields：只查詢並回傳指定欄位
     """
+    customer_fields, _ = select_fields(CUSTOMER_FIELDS, parse_fieldset(fields))
     query = db.query(Customer)
     
     # 篩選條件
@@ -74,10 +97,10 @@ def list_customers(
     else:
         query = query.order_by(desc(Customer.created_at))
     
-    customers = query.offset(skip).limit(limit).all()
-    return customers
+    return FastJSONResponse(serialize_rows(query.offset(skip).limit(limit), customer_fields))
 
 @router.get("/customers/{customer_id}", response_model=schemas.CustomerResponse)
+@query_budget(4)
 def get_customer(
     customer_id: str,
     db: Session = Depends(get_db),
@@ -89,6 +112,145 @@ def get_customer(
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
+OVERVIEW_SECTIONS = ["customer", "interactions", "open_actions", "orders", "order_summary", "stats"]
+OPEN_ORDER_STATUSES = ["pending", "processing", "shipped"]
+
+@router.get(
+    "/customers/{customer_id}/overview",
+    response_model=schemas.CustomerOverviewResponse,
+    # Leaves out the unselected sections; null fields inside a section are kept
+    response_model_exclude_unset=True
+)
+@query_budget(10)
+def get_customer_overview(
+    customer_id: str,
+    fields: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    summary_months: int = Query(6, ge=1, le=24),
+    db: Session = Depends(get_db),
+    current_user = Depends(dependencies.require_staff)
+):
+    """
+    客戶 360 概覽（單次請求取得客戶詳情頁所需資料）
+    - fields：以逗號分隔的區塊，預設全部
+      customer, interactions, open_actions, orders, order_summary, stats
+    - 每個區塊最多一個查詢，未選取的區塊不查詢
+    """
+    if fields:
+        sections = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = sections - set(OVERVIEW_SECTIONS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        sections = set(OVERVIEW_SECTIONS)
+    
+    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    overview = {}
+    if "customer" in sections:
+        overview["customer"] = customer
+    
+    # 互動紀錄
+    if "interactions" in sections:
+        overview["interactions"] = db.query(Interaction).filter(
+            Interaction.customer_id == customer_id
+        ).order_by(desc(Interaction.created_at), desc(Interaction.id)).limit(limit).all()
+    
+    if "open_actions" in sections:
+        overview["open_actions"] = db.query(Interaction).filter(
+            Interaction.customer_id == customer_id,
+            Interaction.action_completed == False,
+            Interaction.next_action.isnot(None),
+            Interaction.next_action != ""
+        ).order_by(desc(Interaction.created_at), desc(Interaction.id)).all()
+    
+    # 訂單資料透過 customers.user_id 連結；未連結帳號的客戶沒有訂單
+    if "orders" in sections:
+        overview["orders"] = []
+        if customer.user_id:
+            overview["orders"] = db.query(Order).filter(
+                Order.user_id == customer.user_id
+            ).order_by(desc(Order.order_date)).limit(limit).all()
+    
+    if "order_summary" in sections:
+        overview["order_summary"] = _monthly_order_summary(db, customer.user_id, summary_months)
+    
+    if "stats" in sections:
+        overview["stats"] = _lifetime_order_stats(db, customer.user_id)
+    
+    return schemas.CustomerOverviewResponse(**overview)
+
+def _monthly_order_summary(db: Session, user_id: Optional[str], months: int) -> List[dict]:
+    """最近 N 個月（含本月）的每月訂單金額與筆數，未取消的訂單才計入"""
+    now = datetime.utcnow()
+    month_keys = []
+    year, month = now.year, now.month
+    for _ in range(months):
+        month_keys.append((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    month_keys.reverse()
+    
+    totals = {}
+    if user_id:
+        start = datetime(month_keys[0][0], month_keys[0][1], 1)
+        # 含已封存的訂單（封存期限可能短於統計的月數）
+        history = archive.order_history(user_id)
+        year_col = extract("year", history.c.order_date)
+        month_col = extract("month", history.c.order_date)
+        rows = db.query(
+            year_col,
+            month_col,
+            func.coalesce(func.sum(history.c.total_amount), 0),
+            func.count()
+        ).filter(
+            history.c.status != "cancelled",
+            history.c.order_date >= start
+        ).group_by(year_col, month_col).all()
+        totals = {(int(y), int(m)): (amount, count) for y, m, amount, count in rows}
+    
+    return [
+        {
+            "month": f"{y}-{m:02d}",
+            "amount": float(totals.get((y, m), (0, 0))[0]),
+            "count": totals.get((y, m), (0, 0))[1]
+        }
+        for y, m in month_keys
+    ]
+
+def _lifetime_order_stats(db: Session, user_id: Optional[str]) -> dict:
+    """客戶所有訂單的累計統計（單一聚合查詢）"""
+    stats = {
+        "total_orders": 0,
+        "total_amount": 0.0,
+        "completed_orders": 0,
+        "open_orders": 0,
+        "cancelled_orders": 0,
+        "first_order_date": None,
+        "last_order_date": None
+    }
+    if not user_id:
+        return stats
+    
+    # 含已封存的訂單
+    history = archive.order_history(user_id)
+    not_cancelled = history.c.status != "cancelled"
+    row = db.query(
+        func.count().filter(not_cancelled),
+        func.coalesce(func.sum(history.c.total_amount).filter(not_cancelled), 0),
+        func.count().filter(history.c.status == "completed"),
+        func.count().filter(history.c.status.in_(OPEN_ORDER_STATUSES)),
+        func.count().filter(history.c.status == "cancelled"),
+        func.min(history.c.order_date),
+        func.max(history.c.order_date)
+    ).one()
+    
+    (stats["total_orders"], total_amount, stats["completed_orders"], stats["open_orders"],
+     stats["cancelled_orders"], stats["first_order_date"], stats["last_order_date"]) = row
+    stats["total_amount"] = float(total_amount)
+    return stats
+
 @router.put("/customers/{customer_id}", response_model=schemas.CustomerResponse)
 def update_customer(
     customer_id: str,
@@ -107,6 +269,10 @@ def update_customer(
         setattr(customer, field, value)
     
     customer.updated_at = datetime.now()
+    outbox.record(db, "customer.updated", customer.id, {
+        "customer_id": customer.id,
+        "fields": sorted(update_data)
+    })
     db.commit()
     db.refresh(customer)
     return customer
@@ -123,12 +289,14 @@ def delete_customer(
         raise HTTPException(status_code=404, detail="Customer not found")
     
     db.delete(customer)
+    outbox.record(db, "customer.deleted", customer_id, {"customer_id": customer_id, "user_id": customer.user_id})
     db.commit()
     return None
 
 # ==================== 互動紀錄 API ====================
 
 @router.post("/customers/{customer_id}/interactions", response_model=schemas.InteractionResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(6)
 def create_interaction(
     customer_id: str,
     interaction_data: schemas.InteractionCreate,
@@ -151,25 +319,63 @@ def create_interaction(
     )
     
     db.add(new_interaction)
+    outbox.record(db, "interaction.created", new_interaction.id, {
+        "interaction_id": new_interaction.id,
+        "customer_id": customer_id,
+        "interaction_type": new_interaction.interaction_type,
+        "next_action": new_interaction.next_action
+    })
     db.commit()
     db.refresh(new_interaction)
     return new_interaction
 
 @router.get("/customers/{customer_id}/interactions", response_model=List[schemas.InteractionResponse])
+@query_budget(4)
 def list_interactions(
     customer_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    open_actions_only: bool = False,
+    db: Session = Depends(get_read_db),
     current_user = Depends(dependencies.require_staff)
 ):
-    """查詢互動歷史（時間倒序）"""
+    """
+    查詢互動歷史（時間倒序，cursor 分頁）
+    - 下一頁的 cursor 由回應標頭 X-Next-Cursor 提供
+    - open_actions_only=true：只回傳未完成的「下一步行動」
+    """
+    # 互動條件放在 outer join 上，客戶存在與否在同一個查詢中判斷
+    join_conditions = [Interaction.customer_id == Customer.id]
+    if open_actions_only:
+        join_conditions += [
+            Interaction.action_completed == False,
+            Interaction.next_action.isnot(None),
+            Interaction.next_action != ""
+        ]
+    after = decode_cursor(cursor, 2)
+    if after:
+        join_conditions.append(
+            tuple_(Interaction.created_at, Interaction.id) < tuple_(*after)
+        )
+    
+    rows = db.query(Customer.id, Interaction).outerjoin(
+        Interaction, and_(*join_conditions)
+    ).filter(
+        Customer.id == customer_id
+    ).order_by(
+        desc(Interaction.created_at), desc(Interaction.id)
+    ).limit(limit + 1).all()
+    
     # 確認客戶存在
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not customer:
+    if not rows:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    interactions = db.query(Interaction).filter(
-        Interaction.customer_id == customer_id
-    ).order_by(desc(Interaction.created_at)).all()
+    interactions = [interaction for _, interaction in rows if interaction is not None]
+    if len(interactions) > limit:
+        interactions = interactions[:limit]
+        last = interactions[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     
     return interactions
 
@@ -185,6 +391,10 @@ def complete_action(
         raise HTTPException(status_code=404, detail="Interaction not found")
     
     interaction.action_completed = True
+    outbox.record(db, "interaction.action_completed", interaction.id, {
+        "interaction_id": interaction.id,
+        "customer_id": interaction.customer_id
+    })
     db.commit()
     db.refresh(interaction)
     return interaction
@@ -192,8 +402,9 @@ def complete_action(
 # ==================== 待辦提醒 API ====================
 
 @router.get("/reminders", response_model=List[schemas.ReminderResponse])
+@query_budget(6)
 def get_reminders(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(dependencies.require_staff)
 ):
     """取得需提醒事項列表"""
@@ -203,6 +414,7 @@ def get_reminders(
 # ==================== 規則引擎 API ====================
 
 @router.post("/recalculate-grades", response_model=schemas.GradeRecalculateResponse)
+@query_budget(8)
 def recalculate_grades(
     db: Session = Depends(get_db),
     current_user = Depends(dependencies.require_admin)
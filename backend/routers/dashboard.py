@@ -1,21 +1,39 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from datetime import datetime
-from backend.database import get_db
+from sqlalchemy import func
+from datetime import datetime, timezone
+from backend.database import get_db, get_read_db
+from backend.query_budget import query_budget
+from backend.catalog_cache import catalog_cache
+from backend import partitions, archive
+from backend.conditional import make_etag, etag_matches, set_etag, not_modified, order_version_marker
 from backend.models import Order, User, Product
 from backend.auth import schemas, dependencies
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 @router.get("/stats", response_model=schemas.StatsResponse)
+@query_budget(14)
 def get_stats(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(dependencies.get_current_active_user)
 ):
     current_month = datetime.utcnow().month
     current_year = datetime.utcnow().year
     
+    # Stats only change with orders (and users / products for admins) or when the month rolls over
+    is_customer = current_user.role == "customer"
+    marker = [current_user.role, current_year, current_month]
+    marker += order_version_marker(db, current_user.id if is_customer else None)
+    if current_user.role in ["super_admin", "admin"]:
+        marker += [db.query(func.count(User.id)).scalar(), catalog_cache.current_version(db)]
+    etag = make_etag("dashboard-stats", current_user.id, *marker)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     # Base query for orders
     query = db.query(Order)
     
@@ -23,26 +41,19 @@ def get_stats(
     if current_user.role == "customer":
         query = query.filter(Order.user_id == current_user.id)
     
-    # Total Stats
-    total_orders = query.count()
-    total_amount = db.query(func.sum(Order.total_amount)).select_from(Order)
-    
-    if current_user.role == "customer":
-         total_amount = total_amount.filter(Order.user_id == current_user.id)
-         
-    total_amount_val = total_amount.scalar() or 0.0
+    # Total Stats: lifetime, archived orders included
+    history = archive.order_history(current_user.id if is_customer else None)
+    total_orders, total_amount_val = db.query(
+        func.count(), func.coalesce(func.sum(history.c.total_amount), 0.0)
+    ).one()
     
-    # Monthly Stats
-    month_query = query.filter(
-        extract('month', Order.order_date) == current_month,
-        extract('year', Order.order_date) == current_year
-    )
+    # Monthly Stats: a plain range on order_date, so only this month's partition is read
+    month_start = datetime(current_year, current_month, 1, tzinfo=timezone.utc)
+    this_month = (Order.order_date >= month_start) & (Order.order_date < partitions.add_months(month_start, 1))
+    month_query = query.filter(this_month)
     this_month_orders = month_query.count()
     
-    month_amount_query = db.query(func.sum(Order.total_amount)).select_from(Order).filter(
-        extract('month', Order.order_date) == current_month,
-        extract('year', Order.order_date) == current_year
-    )
+    month_amount_query = db.query(func.sum(Order.total_amount)).select_from(Order).filter(this_month)
     
     if current_user.role == "customer":
         month_amount_query = month_amount_query.filter(Order.user_id == current_user.id)
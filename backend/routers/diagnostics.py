@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from typing import List
+from backend.database import get_db
+from backend.outbox import dispatcher
+from backend.slow_queries import slow_query_log
+from backend.profiling import profile_store
+from backend.models import User
+from backend.auth import schemas, dependencies
+
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"])
+
+@router.get("/slow-queries", response_model=List[schemas.SlowQueryResponse])
+def list_slow_queries(
+    limit: int = Query(20, ge=1, le=500),
+    current_user: User = Depends(dependencies.require_admin)
+):
+    """
+    Statements slower than SLOW_QUERY_MS since start-up (or the last reset),
+    by route, ordered by total time. Empty when the slow query log is off.
+    """
+    return slow_query_log.top(limit)
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def reset_slow_queries(current_user: User = Depends(dependencies.require_admin)):
+    slow_query_log.reset()
+
+@router.get("/profiles", response_model=List[schemas.ProfileSummary])
+def list_profiles(current_user: User = Depends(dependencies.require_super_admin)):
+    """Request profiles kept by this process, newest first (see backend/profiling.py)."""
+    return [profile.summary() for profile in profile_store.list()]
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, current_user: User = Depends(dependencies.require_super_admin)):
+    """The profile as folded stacks, for flamegraph.pl / inferno / speedscope."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        profile.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'}
+    )
+
+@router.get("/outbox", response_model=List[schemas.OutboxConsumerStatus])
+def outbox_status(db: Session = Depends(get_db), current_user: User = Depends(dependencies.require_admin)):
+    """Checkpoint, backlog and retry state of each outbox consumer (see backend/outbox.py)."""
+    return dispatcher.status(db)
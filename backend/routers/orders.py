@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, select, true, tuple_, union_all
 from typing import List, Optional
 from datetime import datetime
+import csv
+import io
 import uuid
-from backend.database import get_db
-from backend.models import Order, OrderItem, Product, User
+from backend.database import get_db, get_read_db, read_session
+from backend.query_budget import query_budget
+from backend.pagination import encode_cursor, decode_cursor
+from backend import archive, outbox, order_stream
+from backend.catalog_cache import catalog_cache
+from backend.conditional import make_etag, etag_matches, set_etag, not_modified, order_version_marker
+from backend.serialization import FastJSONResponse, serialize_orders, serialize_archived_orders, serialize_object, parse_fieldset, dumps, USER_FIELDS
+from backend.models import ArchivedOrder, Order, OrderItem, OrderNumber, Product, User
 from backend.auth import schemas, dependencies
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 @router.post("/", response_model=schemas.OrderResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(15)
 def create_order(
     order_data: schemas.OrderCreate,
     db: Session = Depends(get_db),
@@ -24,8 +34,17 @@ def create_order(
     if not order_data.items:
         raise HTTPException(status_code=400, detail="Order must contain at least one item")
 
+    # Stock is authoritative in the DB (not the catalog cache): load and lock
+    # every ordered product in one query, in a stable order to avoid deadlocks
+    product_ids = {item.product_id for item in order_data.items}
+    products = {
+        p.id: p for p in db.query(Product).filter(
+            Product.id.in_(product_ids)
+        ).order_by(Product.id).with_for_update().all()
+    }
+
     for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = products.get(item.product_id)
         if not product:
             raise HTTPException(status_code=400, detail=f"Product {item.product_id} not found")
         
@@ -53,6 +72,9 @@ def create_order(
     
     # 2. Create Order
     order_number = f"ORD-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{str(uuid.uuid4())[:4].upper()}"
+    # A number already issued fails here (IntegrityError), like a unique column
+    db.add(OrderNumber(order_number=order_number))
+    db.flush()
     new_order = Order(
         order_number=order_number,
         user_id=current_user.id,
@@ -63,15 +85,24 @@ def create_order(
     )
     
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    db.flush()
     
     # 3. Associate items
     for item in db_items:
         item.order_id = new_order.id
+        item.order_date = new_order.order_date
         db.add(item)
-        
+    
+    # Order, items, stock and the event commit together
+    outbox.record(db, "order.created", new_order.id, {
+        "order_id": new_order.id,
+        "order_number": new_order.order_number,
+        "user_id": new_order.user_id,
+        "status": new_order.status,
+        "total_amount": str(new_order.total_amount)
+    })
     db.commit()
+    catalog_cache.notify_changed()
     # Eager load the product data for the response
     db.refresh(new_order)
     order_with_products = db.query(Order).options(
@@ -80,22 +111,123 @@ def create_order(
     return order_with_products
 
 @router.get("/my-orders", response_model=List[schemas.OrderResponse])
+@query_budget(6)
 def read_my_orders(
+    request: Request,
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. id,status,items.product.name"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(dependencies.get_current_active_user)
+):
+    # Archived orders are paged separately: GET /orders/my-orders/archived
+    # Creating, cancelling, updating or archiving an order changes the count or max(updated_at);
+    # the embedded products and user change with products.updated_at and the user row
+    fieldset = parse_fieldset(fields)
+    me = serialize_object(current_user, USER_FIELDS)
+    etag = make_etag(
+        "my-orders", current_user.id, fields, *me.values(),
+        *order_version_marker(db, current_user.id, with_products=True)
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    query = db.query(Order).filter(
+        Order.user_id == current_user.id
+    ).order_by(desc(Order.order_date))
+    # The current user is already loaded: no user lookup needed
+    orders = serialize_orders(db, query, users={current_user.id: me}, fields=fieldset)
+    response = FastJSONResponse(orders)
+    set_etag(response, etag)
+    return response
+
+@router.get("/my-orders/archived", response_model=List[schemas.OrderResponse])
+@query_budget(4)
+def read_my_archived_orders(
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. id,status,items.product.name"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(dependencies.get_current_active_user)
+):
+    """
+    The current user's archived (closed, older) orders, newest first, with
+    keyset pagination on (order_date, id): the next page's cursor is in the
+    X-Next-Cursor header.
+    """
+    query = db.query(ArchivedOrder).filter(ArchivedOrder.user_id == current_user.id)
+    after = decode_cursor(cursor, 2)
+    if after:
+        query = query.filter(tuple_(ArchivedOrder.order_date, ArchivedOrder.id) < tuple_(*after))
+    query = query.order_by(desc(ArchivedOrder.order_date), desc(ArchivedOrder.id))
+
+    # The page's keys decide the cursor; a sparse fieldset may leave them out of the payload
+    keys = query.with_entities(ArchivedOrder.order_date, ArchivedOrder.id).limit(limit + 1).all()
+    me = serialize_object(current_user, USER_FIELDS)
+    orders = serialize_archived_orders(
+        db, query.limit(limit), users={current_user.id: me}, fields=parse_fieldset(fields)
+    )
+    response = FastJSONResponse(orders)
+    if len(keys) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(*keys[limit - 1])
+    return response
+
+STREAM_ROLES = ("super_admin", "admin", "account_manager")
+
+@router.get("/events")
+async def stream_order_events(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(dependencies.get_current_active_user)
 ):
-    orders = db.query(Order).options(
-        joinedload(Order.items).joinedload(OrderItem.product)
-    ).filter(Order.user_id == current_user.id).order_by(desc(Order.order_date)).all()
-    return orders
+    """
+    Server-Sent Events: `order.created` / `order.status_changed` for the
+    current user's orders (staff: all orders), `resync` when the client fell
+    behind and should reload. Replaces polling the order lists.
+    """
+    user_id = None if current_user.role in STREAM_ROLES else current_user.id
+    # The stream stays open for minutes: don't hold a pooled connection for it
+    db.close()
+    if order_stream.hub.full():
+        raise HTTPException(status_code=503, detail="Too many open order streams", headers={"Retry-After": "30"})
+    return StreamingResponse(
+        order_stream.stream(user_id, request.is_disconnected),
+        media_type="text/event-stream",
+        # No proxy buffering (nginx) or caching of the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _restore_stock(db: Session, order: Order):
+    """Return an order's quantities to stock: one query for the items, one to lock the products."""
+    quantities = {}
+    for item in order.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        return
+    # Same lock order as create_order
+    products = db.query(Product).filter(
+        Product.id.in_(list(quantities))
+    ).order_by(Product.id).with_for_update().all()
+    for product in products:
+        product.stock += quantities[product.id]
+
+def _record_status_change(db: Session, order: Order, previous_status: str, changed_by: User):
+    outbox.record(db, "order.status_changed", order.id, {
+        "order_id": order.id,
+        "order_number": order.order_number,
+        "user_id": order.user_id,
+        "old_status": previous_status,
+        "new_status": order.status,
+        "changed_by": changed_by.id
+    })
 
 @router.post("/{order_id}/cancel", response_model=schemas.OrderResponse)
+@query_budget(12)
 def cancel_my_order(
     order_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(dependencies.get_current_active_user)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Locked so concurrent cancels cannot restore the stock twice
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
         
@@ -107,15 +239,10 @@ def cancel_my_order(
         raise HTTPException(status_code=400, detail="Cannot cancel order that is not pending")
         
     order.status = "cancelled"
-    
-    # Restore stock? (Optional, simplifies logic if we don't, but better if we do)
-    # Ideally should restore stock here.
-    for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.stock += item.quantity
-            
+    _restore_stock(db, order)
+    _record_status_change(db, order, "pending", current_user)
     db.commit()
+    catalog_cache.notify_changed()
     # Eager load the product data for the response
     order_with_products = db.query(Order).options(
         joinedload(Order.items).joinedload(OrderItem.product)
@@ -125,14 +252,17 @@ def cancel_my_order(
 # Staff Routes (Admin + Account Manager)
 
 @router.get("/", response_model=List[schemas.OrderResponse])
+@query_budget(6)
 def read_all_orders(
     status: Optional[str] = None,
     user_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Sparse fieldset, e.g. id,status,items.product.name"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(dependencies.require_staff)
 ):
+    fieldset = parse_fieldset(fields)
     query = db.query(Order).order_by(desc(Order.order_date))
     
     if status:
@@ -141,22 +271,138 @@ def read_all_orders(
     if user_id:
         query = query.filter(Order.user_id == user_id)
         
-    orders = query.options(
-        joinedload(Order.items).joinedload(OrderItem.product),
-        joinedload(Order.user)
-    ).offset(skip).limit(limit).all()
-    return orders
+    return FastJSONResponse(serialize_orders(db, query.offset(skip).limit(limit), fields=fieldset))
+
+EXPORT_COLUMNS = [
+    ("order_number", Order.order_number),
+    ("order_date", Order.order_date),
+    ("status", Order.status),
+    ("total_amount", Order.total_amount),
+    ("delivery_address", Order.delivery_address),
+    ("company_name", User.company_name),
+    ("username", User.username),
+    ("email", User.email),
+    ("product_id", OrderItem.product_id),
+    ("product_name", Product.name),
+    ("quantity", OrderItem.quantity),
+    ("unit_price", OrderItem.unit_price),
+    ("subtotal", OrderItem.subtotal),
+]
+EXPORT_BATCH_SIZE = 2000
+
+def _order_items_of(date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Join condition to order_items, pruned to the exported months."""
+    condition = and_(OrderItem.order_id == Order.id, OrderItem.order_date == Order.order_date)
+    if date_from:
+        condition = and_(condition, OrderItem.order_date >= date_from)
+    if date_to:
+        condition = and_(condition, OrderItem.order_date < date_to)
+    return condition
+
+def _export_statement(date_from: Optional[datetime], date_to: Optional[datetime], status: Optional[str]):
+    """Export rows of the live orders and of the archived ones, in order date order."""
+    live = select(*[column for _, column in EXPORT_COLUMNS]).select_from(Order).join(
+        User, User.id == Order.user_id
+    ).outerjoin(
+        OrderItem, _order_items_of(date_from, date_to)
+    ).outerjoin(
+        Product, Product.id == OrderItem.product_id
+    )
+    # Archived items are kept inline; the columns match EXPORT_COLUMNS
+    item = archive.archived_items()
+    archived = select(
+        ArchivedOrder.order_number, ArchivedOrder.order_date, ArchivedOrder.status,
+        ArchivedOrder.total_amount, ArchivedOrder.delivery_address,
+        User.company_name, User.username, User.email,
+        item.c.product_id, Product.name, item.c.quantity, item.c.unit_price, item.c.subtotal
+    ).select_from(ArchivedOrder).join(
+        User, User.id == ArchivedOrder.user_id
+    ).outerjoin(
+        item, true()
+    ).outerjoin(
+        Product, Product.id == item.c.product_id
+    )
+
+    # Bounds on order_date limit the scan to those months' partitions
+    if date_from:
+        live = live.where(Order.order_date >= date_from)
+        archived = archived.where(ArchivedOrder.order_date >= date_from)
+    if date_to:
+        live = live.where(Order.order_date < date_to)
+        archived = archived.where(ArchivedOrder.order_date < date_to)
+    if status:
+        live = live.where(Order.status == status)
+        archived = archived.where(ArchivedOrder.status == status)
+
+    rows = union_all(live, archived)
+    return rows.order_by(rows.selected_columns.order_date, rows.selected_columns.order_number)
+
+def _export_rows(statement):
+    """Stream flat rows through a server-side cursor on a dedicated session."""
+    # The request session may be closed before the body is fully streamed
+    db = read_session()
+    try:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+def _export_csv(statement):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # BOM so spreadsheet apps detect UTF-8
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for partition in _export_rows(statement):
+        for row in partition:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _export_ndjson(statement):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for partition in _export_rows(statement):
+        yield b"".join(dumps(dict(zip(names, row))) + b"\n" for row in partition)
+
+@router.get("/export")
+@query_budget(4)
+def export_orders(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(dependencies.require_staff)
+):
+    """
+    Export orders, live and archived, as one flat row per order item (CSV or
+    NDJSON). date_from is inclusive, date_to exclusive. Memory use is constant:
+    rows are streamed from a server-side cursor in batches.
+    """
+    statement = _export_statement(date_from, date_to, status)
+    
+    filename = f"orders-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "csv":
+        return StreamingResponse(_export_csv(statement), media_type="text/csv; charset=utf-8", headers=headers)
+    return StreamingResponse(_export_ndjson(statement), media_type="application/x-ndjson", headers=headers)
 
 # Admin Routes
 
 @router.put("/{order_id}/status", response_model=schemas.OrderResponse)
+@query_budget(12)
 def update_order_status(
     order_id: str,
     status_data: schemas.OrderStatusUpdate,
     db: Session = Depends(get_db),
     current_user: User = Depends(dependencies.require_admin)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
         
@@ -164,15 +410,18 @@ def update_order_status(
     if status_data.status not in valid_statuses:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    # If cancelling by admin, restore stock?
-    if status_data.status == "cancelled" and order.status != "cancelled":
-         for item in order.items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            if product:
-                product.stock += item.quantity
+    # Cancelling by admin restores stock
+    restocked = status_data.status == "cancelled" and order.status != "cancelled"
+    if restocked:
+        _restore_stock(db, order)
 
+    previous_status = order.status
     order.status = status_data.status
+    if previous_status != order.status:
+        _record_status_change(db, order, previous_status, current_user)
     db.commit()
+    if restocked:
+        catalog_cache.notify_changed()
     # Eager load the product data for the response
     order_with_products = db.query(Order).options(
         joinedload(Order.items).joinedload(OrderItem.product)
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, status
 from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, tuple_
 from typing import List, Optional
+import io
 from backend.database import get_db
+from backend.query_budget import query_budget
+from backend.catalog_cache import catalog_cache
+from backend.conditional import make_etag, etag_matches, set_etag, not_modified
+from backend.pagination import encode_cursor, decode_cursor
+from backend import product_import
 from backend.models import Product, User
 from backend.auth import schemas, dependencies
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 @router.get("/", response_model=List[schemas.ProductResponse])
+@query_budget(5)
 def read_products(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     category: Optional[str] = None,
@@ -16,22 +26,102 @@ def read_products(
     db: Session = Depends(get_db),
     current_user: User = Depends(dependencies.get_current_active_user)
 ):
-    query = db.query(Product)
+    # Any catalog write bumps the catalog version, so it fully identifies the payload
+    etag = make_etag("products", catalog_cache.current_version(db), skip, limit, category, include_inactive)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    # Active catalog is served from the in-process cache
     if not include_inactive:
-        query = query.filter(Product.is_active == True)
-        
+        return catalog_cache.list_products(db, category=category, skip=skip, limit=limit)
+    
+    query = db.query(Product)
     if category:
         query = query.filter(Product.category == category)
         
     products = query.offset(skip).limit(limit).all()
     return products
 
+SEARCH_SORT_COLUMNS = {"name": Product.name, "price": Product.price}
+
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+@router.get("/search", response_model=schemas.ProductSearchResponse)
+@query_budget(5)
+def search_products(
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    sort: str = Query("name", pattern="^(name|price)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.get_current_active_user)
+):
+    """
+    Search active products by name / description (trigram-indexed ILIKE),
+    with category facet counts and keyset pagination on (sort column, id).
+    """
+    matches = [Product.is_active == True]
+    if q and q.strip():
+        pattern = _like_pattern(q.strip())
+        matches.append(or_(
+            Product.name.ilike(pattern, escape="\\"),
+            Product.description.ilike(pattern, escape="\\")
+        ))
+    
+    facet_rows = db.query(Product.category, func.count(Product.id)).filter(
+        *matches
+    ).group_by(Product.category).order_by(Product.category).all()
+    facets = [{"category": c, "count": n} for c, n in facet_rows]
+    if category:
+        total = sum(f["count"] for f in facets if f["category"] == category)
+    else:
+        total = sum(f["count"] for f in facets)
+    
+    sort_column = SEARCH_SORT_COLUMNS[sort]
+    query = db.query(Product).filter(*matches)
+    if category:
+        query = query.filter(Product.category == category)
+    
+    # The cursor carries its sort so it cannot be replayed against another ordering
+    after = decode_cursor(cursor, 4)
+    if after:
+        cursor_sort, cursor_order, last_value, last_id = after
+        if (cursor_sort, cursor_order) != (sort, order):
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        key, last = tuple_(sort_column, Product.id), tuple_(last_value, last_id)
+        query = query.filter(key > last if order == "asc" else key < last)
+    
+    if order == "asc":
+        query = query.order_by(sort_column.asc(), Product.id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Product.id.desc())
+    
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last_item = items[-1]
+        next_cursor = encode_cursor(sort, order, getattr(last_item, sort), last_item.id)
+    
+    return {"items": items, "facets": facets, "total": total, "next_cursor": next_cursor}
+
 @router.get("/{product_id}", response_model=schemas.ProductResponse)
+@query_budget(3)
 def read_product(
     product_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(dependencies.get_current_active_user)
 ):
+    product = catalog_cache.get_product(db, product_id)
+    if product:
+        return product
+    
+    # Inactive products are not cached
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -48,9 +138,34 @@ def create_product(
     db_product = Product(**product.dict())
     db.add(db_product)
     db.commit()
+    catalog_cache.notify_changed()
     db.refresh(db_product)
     return db_product
 
+@router.post("/import", response_model=schemas.ProductImportResponse)
+def import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.require_admin)
+):
+    """
+    Bulk insert / update products from a CSV (with header) or NDJSON file.
+    Columns: id, name, description, price, stock, category, is_active.
+    Rows with an existing id update it (empty fields are kept), so a stock
+    feed only needs id and stock.
+    """
+    fmt = product_import.detect_format(file.filename, format)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    result = product_import.import_products(db, stream, fmt)
+    db.commit()
+    if result.inserted or result.updated:
+        catalog_cache.notify_changed()
+    return result.to_dict()
+
 @router.put("/{product_id}", response_model=schemas.ProductResponse)
 def update_product(
     product_id: str,
@@ -67,6 +182,7 @@ def update_product(
         setattr(db_product, key, value)
         
     db.commit()
+    catalog_cache.notify_changed()
     db.refresh(db_product)
     return db_product
 
@@ -83,4 +199,5 @@ def delete_product(
         
     db_product.is_active = False
     db.commit()
+    catalog_cache.notify_changed()
     return None
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date
+from backend.database import get_db, get_read_db
+from backend.query_budget import query_budget
+from backend import reports
+from backend.models import User
+from backend.auth import schemas, dependencies
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+@router.get("/orders", response_model=schemas.OrderReportResponse)
+@query_budget(8)
+def get_order_report(
+    response: Response,
+    period: str = Query("month", pattern="^(week|month|quarter|year|custom)$"),
+    value: Optional[str] = Query(None, description="2026-W42 / 2026-10 / 2026-Q4 / 2026; default: current period"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    top: int = Query(10, ge=1, le=100),
+    refresh: bool = False,
+    db: Session = Depends(get_read_db),
+    primary_db: Session = Depends(get_db),
+    current_user: User = Depends(dependencies.require_admin)
+):
+    """
+    Orders by status, revenue by customer and top products for a period.
+    Finalized periods are served from stored snapshots; `refresh` recomputes.
+    """
+    try:
+        resolved = reports.resolve_period(period, value, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    report, cached = reports.get_order_report(db, resolved, top=top, refresh=refresh, snapshot_db=primary_db)
+    response.headers["X-Report-Cache"] = "hit" if cached else "miss"
+    return report
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_
 from typing import List
-from backend.database import get_db
-from backend.models import User
+from backend.database import get_db, get_read_db
+from backend.query_budget import query_budget
+from backend.serialization import FastJSONResponse, serialize_rows, USER_FIELDS
+from backend.models import User, Customer
 from backend.auth import schemas, utils, dependencies
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -21,6 +24,19 @@ def update_user_me(
         # Check uniqueness
         if db.query(User).filter(User.email == user_update.email).first():
             raise HTTPException(status_code=400, detail="Email already registered")
+        
+        # Keep the CRM link: attach by the old email if not linked yet, and
+        # carry the email over when the customer record mirrored it
+        customer = db.query(Customer).filter(or_(
+            Customer.user_id == current_user.id,
+            and_(Customer.user_id.is_(None), Customer.email == current_user.email)
+        )).first()
+        if customer:
+            customer.user_id = current_user.id
+            email_taken = db.query(Customer).filter(Customer.email == user_update.email).first()
+            if customer.email == current_user.email and not email_taken:
+                customer.email = user_update.email
+        
         current_user.email = user_update.email
     
     if user_update.company_name:
@@ -46,14 +62,14 @@ def change_password(
 # Super Admin Routes
 
 @router.get("/", response_model=List[schemas.UserResponse])
+@query_budget(4)
 def read_users(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(dependencies.require_super_admin)
 ):
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    return FastJSONResponse(serialize_rows(db.query(User).offset(skip).limit(limit), USER_FIELDS))
 
 @router.put("/{user_id}/role", response_model=schemas.UserResponse)
 def update_user_role(
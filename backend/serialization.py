@@ -0,0 +1,320 @@
+"""
+Fast serialization path for large list responses.
+
+List endpoints normally return ORM objects that FastAPI validates through the
+`from_attributes` response models and then encodes. For trusted DB output
+that validation is pure overhead, so the helpers here build plain dicts from
+column-level queries (no ORM identity map, no lazy loads) shaped exactly
+like the response models in `backend.auth.schemas`, and encode them with
+orjson when it is installed (stdlib json otherwise).
+
+Routes keep their `response_model` for the OpenAPI schema; returning a
+`FastJSONResponse` bypasses the model validation at runtime.
+
+Sparse fieldsets (`fields=id,status,items.product.name`) narrow both the SQL
+projection and the payload: unselected columns are not queried and
+unselected relations (items, product, user) are not joined or fetched. A
+bare relation name (`items`) selects all of its fields.
+"""
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Query, Session
+
+from backend.models import ArchivedOrder, Customer, Order, OrderItem, Product, User
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+def _isoformat(value: datetime) -> str:
+    # Match pydantic: UTC offsets are rendered as "Z"
+    text = value.isoformat()
+    if value.utcoffset() == timedelta(0):
+        text = text[:-6] + "Z"
+    return text
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        return _isoformat(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def _float(value: Optional[Decimal]) -> Optional[float]:
+    return None if value is None else float(value)
+
+# (response field, column, is float) in response model field order
+PRODUCT_FIELDS = [
+    ("name", Product.name, False),
+    ("description", Product.description, False),
+    ("price", Product.price, True),
+    ("stock", Product.stock, False),
+    ("category", Product.category, False),
+    ("is_active", Product.is_active, False),
+    ("id", Product.id, False),
+    ("created_at", Product.created_at, False),
+]
+
+USER_FIELDS = [
+    ("username", User.username, False),
+    ("email", User.email, False),
+    ("company_name", User.company_name, False),
+    ("id", User.id, False),
+    ("role", User.role, False),
+    ("is_active", User.is_active, False),
+    ("created_at", User.created_at, False),
+]
+
+CUSTOMER_FIELDS = [
+    ("company_name", Customer.company_name, False),
+    ("contact_person", Customer.contact_person, False),
+    ("phone", Customer.phone, False),
+    ("email", Customer.email, False),
+    ("address", Customer.address, False),
+    ("industry", Customer.industry, False),
+    ("source", Customer.source, False),
+    ("id", Customer.id, False),
+    ("grade", Customer.grade, False),
+    ("total_orders", Customer.total_orders, False),
+    ("total_amount", Customer.total_amount, True),
+    ("last_order_date", Customer.last_order_date, False),
+    ("created_at", Customer.created_at, False),
+    ("updated_at", Customer.updated_at, False),
+]
+
+ORDER_FIELDS = [
+    ("id", Order.id, False),
+    ("order_number", Order.order_number, False),
+    ("order_date", Order.order_date, False),
+    ("status", Order.status, False),
+    ("total_amount", Order.total_amount, True),
+    ("delivery_address", Order.delivery_address, False),
+    ("notes", Order.notes, False),
+]
+
+# Archived orders have the same columns (backend/archive.py)
+ARCHIVED_ORDER_FIELDS = [
+    (name, getattr(ArchivedOrder, column.key), is_float) for name, column, is_float in ORDER_FIELDS
+]
+
+ORDER_ITEM_FIELDS = [
+    ("product_id", OrderItem.product_id, False),
+    ("quantity", OrderItem.quantity, False),
+    ("unit_price", OrderItem.unit_price, True),
+    ("subtotal", OrderItem.subtotal, True),
+]
+
+Fields = Sequence[Tuple[str, Any, bool]]
+
+def _columns(fields: Fields) -> List[Any]:
+    return [column for _, column, _ in fields]
+
+def _row_dict(fields: Fields, row: Sequence[Any], offset: int = 0) -> Dict[str, Any]:
+    return {
+        name: _float(row[offset + i]) if is_float else row[offset + i]
+        for i, (name, _, is_float) in enumerate(fields)
+    }
+
+FieldTree = Dict[str, dict]
+
+def parse_fieldset(spec: Optional[str]) -> Optional[FieldTree]:
+    """Parse `a,b,c.d` into {"a": {}, "b": {}, "c": {"d": {}}}; None selects everything."""
+    if not spec or not spec.strip():
+        return None
+    tree: FieldTree = {}
+    for path in spec.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part.strip(), {})
+    return tree
+
+def select_fields(
+    fields: Fields,
+    tree: Optional[FieldTree],
+    relations: Sequence[str] = ()
+) -> Tuple[Fields, Dict[str, Optional[FieldTree]]]:
+    """
+    Narrow `fields` to the ones named in `tree`. Returns the selected fields
+    and the selected relations mapped to their sub-tree (None = all fields).
+    """
+    if tree is None:
+        return fields, {relation: None for relation in relations}
+
+    names = {name for name, _, _ in fields}
+    unknown = sorted(
+        key for key, sub in tree.items()
+        if not (key in relations or (key in names and not sub))
+    )
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    selected = [field for field in fields if field[0] in tree]
+    chosen = {relation: (tree[relation] or None) for relation in relations if relation in tree}
+    return selected, chosen
+
+def serialize_rows(query: Query, fields: Fields) -> List[Dict[str, Any]]:
+    """Run `query` (filters / order / limit already applied) projected onto `fields`."""
+    return [_row_dict(fields, row) for row in query.with_entities(*_columns(fields))]
+
+def serialize_object(obj: Any, fields: Fields) -> Dict[str, Any]:
+    """Same shape as `serialize_rows`, from an already loaded ORM object."""
+    return {
+        name: _float(getattr(obj, column.key)) if is_float else getattr(obj, column.key)
+        for name, column, is_float in fields
+    }
+
+def fetch_users(
+    db: Session,
+    user_ids: Iterable[str],
+    fields: Fields = USER_FIELDS
+) -> Dict[str, Dict[str, Any]]:
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+    rows = db.query(User.id, *_columns(fields)).filter(User.id.in_(user_ids))
+    return {row[0]: _row_dict(fields, row, offset=1) for row in rows}
+
+def serialize_orders(
+    db: Session,
+    query: Query,
+    users: Optional[Dict[str, Dict[str, Any]]] = None,
+    fields: Optional[FieldTree] = None
+) -> List[Dict[str, Any]]:
+    """
+    `OrderResponse`-shaped dicts for an Order query (filters / order / limit
+    already applied) in at most three flat queries: orders, items + products,
+    users. `users` may pre-supply full user dicts (e.g. the current user) to
+    skip a lookup; `fields` is a parsed sparse fieldset.
+    """
+    order_fields, relations = select_fields(ORDER_FIELDS, fields, ("items", "user"))
+    order_rows = query.with_entities(Order.id, Order.user_id, Order.order_date, *_columns(order_fields)).all()
+    if not order_rows:
+        return []
+
+    orders = []
+    by_id = {}
+    user_ids = {}
+    order_dates = set()
+    for row in order_rows:
+        order = _row_dict(order_fields, row, offset=3)
+        orders.append(order)
+        by_id[row[0]] = order
+        user_ids[row[0]] = row[1]
+        order_dates.add(row[2])
+
+    if "items" in relations:
+        item_fields, item_relations = select_fields(ORDER_ITEM_FIELDS, relations["items"], ("product",))
+        product_fields = []
+        if "product" in item_relations:
+            product_fields, _ = select_fields(PRODUCT_FIELDS, item_relations["product"])
+
+        item_query = db.query(OrderItem.order_id, *_columns(item_fields), *_columns(product_fields))
+        if "product" in item_relations:
+            item_query = item_query.join(Product, Product.id == OrderItem.product_id)
+        # The order dates restrict the lookup to those months' partitions
+        item_query = item_query.filter(
+            OrderItem.order_id.in_(list(by_id)),
+            OrderItem.order_date.in_(list(order_dates))
+        )
+
+        for order in orders:
+            order["items"] = []
+        product_offset = 1 + len(item_fields)
+        for row in item_query:
+            item = _row_dict(item_fields, row, offset=1)
+            if "product" in item_relations:
+                item["product"] = _row_dict(product_fields, row, offset=product_offset)
+            by_id[row[0]]["items"].append(item)
+
+    if "user" in relations:
+        _attach_users(db, by_id, user_ids, users, relations["user"])
+
+    return orders
+
+def _attach_users(
+    db: Session,
+    by_id: Dict[str, Dict[str, Any]],
+    user_ids: Dict[str, str],
+    users: Optional[Dict[str, Dict[str, Any]]],
+    tree: Optional[FieldTree]
+):
+    user_fields, _ = select_fields(USER_FIELDS, tree)
+    names = [name for name, _, _ in user_fields]
+    known = {
+        user_id: {name: user[name] for name in names}
+        for user_id, user in (users or {}).items()
+    }
+    missing = set(user_ids.values()) - set(known)
+    known.update(fetch_users(db, missing, user_fields))
+    for order_id, order in by_id.items():
+        order["user"] = known.get(user_ids[order_id])
+
+def serialize_archived_orders(
+    db: Session,
+    query: Query,
+    users: Optional[Dict[str, Dict[str, Any]]] = None,
+    fields: Optional[FieldTree] = None
+) -> List[Dict[str, Any]]:
+    """
+    `serialize_orders` for an ArchivedOrder query: the same shape, with the
+    items read from the archive row and their products in one lookup.
+    """
+    order_fields, relations = select_fields(ARCHIVED_ORDER_FIELDS, fields, ("items", "user"))
+    order_rows = query.with_entities(
+        ArchivedOrder.id, ArchivedOrder.user_id, ArchivedOrder.items, *_columns(order_fields)
+    ).all()
+
+    orders = []
+    by_id = {}
+    user_ids = {}
+    for row in order_rows:
+        order = _row_dict(order_fields, row, offset=3)
+        orders.append(order)
+        by_id[row[0]] = order
+        user_ids[row[0]] = row[1]
+
+    if "items" in relations and order_rows:
+        item_fields, item_relations = select_fields(ORDER_ITEM_FIELDS, relations["items"], ("product",))
+        products = {}
+        if "product" in item_relations:
+            product_fields, _ = select_fields(PRODUCT_FIELDS, item_relations["product"])
+            product_ids = {item["product_id"] for row in order_rows for item in row[2]}
+            rows = db.query(Product.id, *_columns(product_fields)).filter(Product.id.in_(list(product_ids)))
+            products = {row[0]: _row_dict(product_fields, row, offset=1) for row in rows}
+        for row, order in zip(order_rows, orders):
+            order["items"] = []
+            for stored in row[2]:
+                item = {
+                    name: _float(stored[name]) if is_float else stored[name]
+                    for name, _, is_float in item_fields
+                }
+                if "product" in item_relations:
+                    item["product"] = products.get(stored["product_id"])
+                order["items"].append(item)
+
+    if "user" in relations and order_rows:
+        _attach_users(db, by_id, user_ids, users, relations["user"])
+
+    return orders
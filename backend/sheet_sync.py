@@ -0,0 +1,447 @@
+"""
+Two-way delta sync between the database and a Google Sheets spreadsheet.
+
+Three sheets are kept in sync: products (商品), stock (庫存) and customers
+(客戶), one row per record, keyed by the ``id`` column.
+
+Change tracking
+    Database side: rows whose ``updated_at`` is newer than the table's
+    watermark from the previous run (minus ``WATERMARK_OVERLAP``, see below),
+    found through the ``updated_at`` indexes.
+    Sheet side: the Sheets API has no change feed, so every synced sheet is
+    read in one ``values_batch_get`` call. The last column (``_sync``) holds a
+    fingerprint of the row's editable values as of the last sync; a row whose
+    current values no longer match it was edited in the sheet.
+
+    Database queries, database writes and sheet writes therefore scale with
+    the number of changed rows; only the single sheet read scales with sheet
+    size. All sheet writes go out as one ``values_batch_update`` call.
+
+Conflict policy
+    A row is in conflict when it was edited in the sheet *and* its editable
+    values in the database differ from the fingerprint the sheet last saw
+    (i.e. both sides changed since the last sync). Conflicts are resolved per
+    row by ``policy``:
+
+    - ``"db"`` (default): the database wins and the sheet row is overwritten.
+      Stock in particular keeps moving with orders, so a stale sheet value
+      never replaces it.
+    - ``"sheet"``: the sheet values are written to the database.
+
+    Every conflict is listed in the report either way. Rows are locked while
+    sheet edits are applied, so an order placed concurrently is either seen
+    (and counted as a conflict) or waits.
+
+Inserts and deletes
+    A product or customer row with a blank ``id`` is inserted and its new id
+    written back; the stock sheet cannot create products. Deleting a sheet row
+    does not delete anything (deactivate products via 上架 instead); database
+    rows missing from the sheet are appended on their next change.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from backend.catalog_cache import catalog_cache
+from backend.models import Customer, Product
+from backend.product_import import PRICE_CENT, PRICE_LIMIT, STOCK_MAX, _parse_bool
+from backend.report_sinks import a1_range, column_letter
+
+# updated_at is the writing transaction's start time, so a slow transaction can
+# commit a change that sorts before the watermark; re-read this window behind it
+WATERMARK_OVERLAP = timedelta(minutes=5)
+SYNC_COLUMN = "_sync"
+MAX_REPORTED_ERRORS = 100
+CONFLICT_POLICIES = ("db", "sheet")
+
+class SyncTable:
+    """
+    A synced sheet. `columns` are (header, attribute, kind, editable) with the
+    key column first; kinds: key, str, decimal, int, bool, datetime.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        title: str,
+        model,
+        columns: Sequence[Tuple[str, str, str, bool]],
+        required: Sequence[str] = (),
+        insertable: bool = True
+    ):
+        self.name = name
+        self.title = title
+        self.model = model
+        self.columns = list(columns)
+        self.required = required
+        self.insertable = insertable
+        self.headers = [header for header, _, _, _ in self.columns] + [SYNC_COLUMN]
+        self.editable = [attr for _, attr, _, editable in self.columns if editable]
+        self.labels = {attr: header for header, attr, _, _ in self.columns}
+
+SYNC_TABLES = [
+    SyncTable("products", "商品", Product, [
+        ("id", "id", "key", False),
+        ("名稱", "name", "str", True),
+        ("描述", "description", "str", True),
+        ("價格", "price", "decimal", True),
+        ("分類", "category", "str", True),
+        ("上架", "is_active", "bool", True),
+        ("更新時間", "updated_at", "datetime", False),
+    ], required=("name", "price")),
+    SyncTable("stock", "庫存", Product, [
+        ("id", "id", "key", False),
+        ("名稱", "name", "str", False),
+        ("庫存", "stock", "int", True),
+        ("更新時間", "updated_at", "datetime", False),
+    ], required=("stock",), insertable=False),
+    SyncTable("customers", "客戶", Customer, [
+        ("id", "id", "key", False),
+        ("公司名稱", "company_name", "str", True),
+        ("聯絡人", "contact_person", "str", True),
+        ("電話", "phone", "str", True),
+        ("Email", "email", "str", True),
+        ("地址", "address", "str", True),
+        ("產業", "industry", "str", True),
+        ("來源", "source", "str", True),
+        ("等級", "grade", "str", False),
+        ("更新時間", "updated_at", "datetime", False),
+    ], required=("company_name",)),
+]
+
+def normalize(kind: str, value: Any) -> Any:
+    """Canonical value of a sheet cell or DB attribute (None = empty)."""
+    if value is None or (isinstance(value, str) and value.strip() == ""):
+        return None
+    if kind in ("key", "str"):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+    if kind == "decimal":
+        try:
+            number = Decimal(str(value)).quantize(PRICE_CENT)
+        except InvalidOperation:
+            raise ValueError(f"invalid number {value!r}")
+        if not number.is_finite():
+            raise ValueError(f"invalid number {value!r}")
+        if number < 0:
+            raise ValueError("must not be negative")
+        # Decimal columns are NUMERIC(10, 2)
+        if number >= PRICE_LIMIT:
+            raise ValueError(f"must be less than {PRICE_LIMIT}")
+        return number
+    if kind == "int":
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(f"invalid integer {value!r}")
+        if not number.is_finite() or number != number.to_integral_value():
+            raise ValueError(f"invalid integer {value!r}")
+        if number < 0:
+            raise ValueError("must not be negative")
+        if number > STOCK_MAX:
+            raise ValueError(f"must not exceed {STOCK_MAX}")
+        return int(number)
+    if kind == "bool":
+        return _parse_bool(value)
+    if kind == "datetime":
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+    raise ValueError(f"unknown kind {kind!r}")
+
+def render(kind: str, value: Any) -> Any:
+    """Cell value to write for a normalized value."""
+    if value is None:
+        return ""
+    if kind == "decimal":
+        return float(value)
+    return value
+
+def fingerprint(table: SyncTable, values: Dict[str, Any]) -> str:
+    canonical = [None if values[attr] is None else str(values[attr]) for attr in table.editable]
+    raw = json.dumps(canonical, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+def db_values(table: SyncTable, obj) -> Dict[str, Any]:
+    return {attr: normalize(kind, getattr(obj, attr)) for _, attr, kind, _ in table.columns}
+
+def render_row(table: SyncTable, values: Dict[str, Any]) -> List[Any]:
+    row = [render(kind, values[attr]) for _, attr, kind, _ in table.columns]
+    return row + [fingerprint(table, values)]
+
+class SheetRow:
+    def __init__(self, row_no: int, values: Dict[str, Any], synced: Optional[str], edited: bool):
+        self.row_no = row_no
+        self.values = values
+        self.synced = synced
+        self.edited = edited
+
+class TableReport:
+    def __init__(self):
+        self.pushed = 0  # DB -> sheet rows written
+        self.pulled = 0  # sheet -> DB rows updated
+        self.inserted = 0  # sheet rows inserted into the DB
+        self.conflicts: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+
+    def error(self, row_no: int, reason: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_no, "reason": reason})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pushed": self.pushed,
+            "pulled": self.pulled,
+            "inserted": self.inserted,
+            "conflicts": self.conflicts,
+            "errors": self.errors
+        }
+
+class _TableSync:
+    """Per-table working state of one sync run."""
+
+    def __init__(self, table: SyncTable, raw_rows: List[List[Any]]):
+        self.table = table
+        self.report = TableReport()
+        self.header_ok = bool(raw_rows) and [str(c) for c in raw_rows[0]] == table.headers
+        self.next_row = max(len(raw_rows), 1) + 1
+        self.by_id: Dict[str, SheetRow] = {}
+        self.new_rows: List[SheetRow] = []
+        self.invalid_ids = set()
+        self._parse(raw_rows[1:] if raw_rows else [])
+
+    def _parse(self, rows: List[List[Any]]):
+        table = self.table
+        width = len(table.headers)
+        for offset, raw in enumerate(rows):
+            row_no = offset + 2
+            cells = list(raw) + [""] * (width - len(raw))
+            if all(cell in ("", None) for cell in cells):
+                continue
+            try:
+                values = {
+                    attr: normalize(kind, cells[i])
+                    for i, (_, attr, kind, _) in enumerate(table.columns)
+                }
+            except ValueError as e:
+                self.report.error(row_no, str(e))
+                key = normalize("key", cells[0])
+                if key:
+                    self.invalid_ids.add(key)
+                continue
+
+            synced = normalize("str", cells[width - 1])
+            row = SheetRow(row_no, values, synced, edited=fingerprint(table, values) != synced)
+            key = values["id"]
+            if key is None:
+                self.new_rows.append(row)
+            elif key in self.by_id:
+                self.report.error(row_no, f"duplicate id {key}")
+            else:
+                self.by_id[key] = row
+
+    def check_required(self, row: SheetRow) -> Optional[str]:
+        missing = [self.table.labels[attr] for attr in self.table.required if row.values[attr] is None]
+        return f"required: {', '.join(missing)}" if missing else None
+
+def _read_sheets(spreadsheet, tables: Sequence[SyncTable]) -> Tuple[Dict[str, List[List[Any]]], Dict[str, Any]]:
+    """(raw values, worksheet) per sheet title, creating missing sheets; one values read."""
+    existing = {worksheet.title: worksheet for worksheet in spreadsheet.worksheets()}
+    for table in tables:
+        if table.title not in existing:
+            existing[table.title] = spreadsheet.add_worksheet(
+                title=table.title, rows=100, cols=len(table.headers)
+            )
+    ranges = [
+        a1_range(table.title, f"A1:{column_letter(len(table.headers))}")
+        for table in tables
+    ]
+    result = spreadsheet.values_batch_get(ranges, params={"valueRenderOption": "UNFORMATTED_VALUE"})
+    values = {
+        table.title: value_range.get("values", [])
+        for table, value_range in zip(tables, result["valueRanges"])
+    }
+    return values, existing
+
+def sync_sheets(
+    db: Session,
+    spreadsheet,
+    state: Optional[Dict[str, Any]] = None,
+    policy: str = "db",
+    tables: Sequence[SyncTable] = SYNC_TABLES
+) -> Tuple[Dict[str, Any], Dict[str, TableReport]]:
+    """
+    Run one sync. `state` is the result of the previous run for this
+    spreadsheet (None for a first, full sync). Commits the database side.
+    Returns (new state, report per table name).
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown conflict policy: {policy}")
+    state = state or {}
+    watermarks = state.get("watermarks", {}) if state.get("spreadsheet_id") == spreadsheet.id else {}
+
+    # Changes committed after this point are picked up by the next run
+    started_at = db.execute(select(func.now())).scalar()
+
+    raw, worksheets = _read_sheets(spreadsheet, tables)
+    syncs = [_TableSync(table, raw[table.title]) for table in tables]
+
+    # 1. DB rows changed since the watermark, and DB rows behind sheet edits
+    changed: Dict[str, Dict[str, Any]] = {}
+    for sync in syncs:
+        model = sync.table.model
+        query = db.query(model)
+        watermark = watermarks.get(sync.table.name)
+        if watermark:
+            query = query.filter(model.updated_at > datetime.fromisoformat(watermark) - WATERMARK_OVERLAP)
+        changed[sync.table.name] = {obj.id: obj for obj in query}
+
+    # Lock rows edited in the sheet (per model, in id order like order placement)
+    edited_ids: Dict[Any, set] = {}
+    for sync in syncs:
+        ids = {key for key, row in sync.by_id.items() if row.edited}
+        edited_ids.setdefault(sync.table.model, set()).update(ids)
+    locked: Dict[Any, Dict[str, Any]] = {}
+    for model, ids in edited_ids.items():
+        locked[model] = {}
+        if ids:
+            rows = db.query(model).filter(model.id.in_(sorted(ids))).order_by(model.id).with_for_update()
+            locked[model] = {obj.id: obj for obj in rows}
+
+    # 2. Apply sheet edits and inserts
+    to_write: Dict[str, Dict[str, Any]] = {sync.table.name: {} for sync in syncs}
+    inserted_rows: Dict[str, List[Tuple[SheetRow, Any]]] = {sync.table.name: [] for sync in syncs}
+    catalog_changed = False
+    for sync in syncs:
+        table, report = sync.table, sync.report
+        for key, row in sync.by_id.items():
+            if not row.edited:
+                continue
+            obj = locked[table.model].get(key)
+            if obj is None:
+                report.error(row.row_no, f"unknown id {key}")
+                continue
+            current = db_values(table, obj)
+            if fingerprint(table, current) != row.synced:
+                report.conflicts.append({"row": row.row_no, "id": key, "winner": policy})
+                if policy == "db":
+                    to_write[table.name][key] = obj
+                    continue
+            # A rejected edit stays in the sheet (and is reported) until fixed
+            reason = sync.check_required(row)
+            if reason:
+                report.error(row.row_no, reason)
+                continue
+            if _apply(db, table, obj, row.values, started_at, report, row.row_no):
+                report.pulled += 1
+                catalog_changed = catalog_changed or table.model is Product
+                to_write[table.name][key] = obj
+
+        for row in sync.new_rows:
+            if not table.insertable:
+                report.error(row.row_no, "rows without id cannot be added here")
+                continue
+            reason = sync.check_required(row)
+            if reason:
+                report.error(row.row_no, reason)
+                continue
+            obj = table.model()
+            if _apply(db, table, obj, row.values, started_at, report, row.row_no):
+                report.inserted += 1
+                inserted_rows[table.name].append((row, obj))
+                catalog_changed = catalog_changed or table.model is Product
+
+    # 3. Render the sheet updates while the objects are still loaded
+    data: List[Dict[str, Any]] = []
+    grow: Dict[str, int] = {}
+    for sync in syncs:
+        table, report = sync.table, sync.report
+        last_column = column_letter(len(table.headers))
+        if not sync.header_ok:
+            data.append({"range": a1_range(table.title, "A1"), "values": [table.headers]})
+
+        objects = dict(changed[table.name])
+        objects.update(to_write[table.name])
+        appended = []
+        for key, obj in objects.items():
+            if key in sync.invalid_ids:
+                # Unparseable cells stay for the user to fix
+                continue
+            values = db_values(table, obj)
+            row = sync.by_id.get(key)
+            if row is not None:
+                if row.values == values and row.synced == fingerprint(table, values):
+                    continue
+                if row.edited and key not in to_write[table.name] and row.synced == fingerprint(table, values):
+                    # A rejected sheet edit is kept unless the DB values really changed
+                    continue
+                data.append({
+                    "range": a1_range(table.title, f"A{row.row_no}:{last_column}{row.row_no}"),
+                    "values": [render_row(table, values)]
+                })
+            else:
+                appended.append(render_row(table, values))
+            report.pushed += 1
+
+        for row, obj in inserted_rows[table.name]:
+            data.append({
+                "range": a1_range(table.title, f"A{row.row_no}:{last_column}{row.row_no}"),
+                "values": [render_row(table, db_values(table, obj))]
+            })
+
+        if appended:
+            first = sync.next_row
+            last = first + len(appended) - 1
+            data.append({
+                "range": a1_range(table.title, f"A{first}:{last_column}{last}"),
+                "values": appended
+            })
+            grow[table.title] = last
+
+    db.commit()
+    if catalog_changed:
+        catalog_cache.notify_changed()
+
+    # 4. One batched write for every sheet
+    for title, last_row in grow.items():
+        worksheet = worksheets[title]
+        if last_row > worksheet.row_count:
+            worksheet.add_rows(last_row - worksheet.row_count)
+    if data:
+        spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": data})
+
+    new_state = {
+        "spreadsheet_id": spreadsheet.id,
+        "watermarks": {table.name: started_at.isoformat() for table in tables}
+    }
+    return new_state, {sync.table.name: sync.report for sync in syncs}
+
+def _apply(
+    db: Session,
+    table: SyncTable,
+    obj,
+    values: Dict[str, Any],
+    updated_at: datetime,
+    report: TableReport,
+    row_no: int
+) -> bool:
+    """Write the editable sheet values onto `obj` in a savepoint; False when rejected."""
+    try:
+        with db.begin_nested():
+            for attr in table.editable:
+                setattr(obj, attr, values[attr])
+            # Set explicitly so the row renders without a refresh query
+            obj.updated_at = updated_at
+            db.add(obj)
+            db.flush()
+        return True
+    except DBAPIError as e:
+        # Constraint violations and values the column cannot hold alike:
+        # the row is reported and left in the sheet, the rest of the run goes on
+        report.error(row_no, f"rejected by database: {e.orig.__class__.__name__}")
+        return False
@@ -0,0 +1,193 @@
+"""
+Slow query log.
+
+Opt-in with ``SLOW_QUERY_MS``: every statement on the engine that takes at
+least that long is logged and aggregated by (statement shape, route), where
+the shape is the SQL with literals and ``IN (...)`` lists collapsed (see
+``query_budget.statement_shape``) and the route is the path template of the
+request that issued it (``metrics.current_route``; ``None`` for jobs).
+Bind parameters are recorded by shape only (names and types, list lengths),
+never by value.
+
+A sample (``SLOW_QUERY_EXPLAIN_RATE``) of slow ``SELECT`` statements is
+re-run as ``EXPLAIN (ANALYZE, BUFFERS)`` on a separate pooled connection in
+a background thread, inside a read-only transaction with a statement
+timeout, and the latest plan is kept per shape. Locking reads (``FOR
+UPDATE`` / ``FOR SHARE``) and writes are never explained: EXPLAIN ANALYZE
+executes the statement, and a locking read would wait for the request's
+own transaction.
+
+The top offenders by total time are served to admins at
+``GET /diagnostics/slow-queries``.
+"""
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from backend.metrics import current_route
+from backend.query_budget import statement_shape
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0") or 0)
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1") or 0)
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "5000"))
+MAX_ENTRIES = 500
+MAX_PARAM_SHAPES = 5
+
+_EXPLAINABLE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+_LOCKING = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b", re.IGNORECASE)
+
+def _value_shape(value: Any) -> str:
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """Names and types of the bind parameters, without their values."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x ({parameter_shape(rows[0]) if rows else ''})"
+    if isinstance(parameters, dict):
+        return ", ".join(f"{name}:{_value_shape(value)}" for name, value in parameters.items())
+    if isinstance(parameters, (list, tuple)):
+        return ", ".join(_value_shape(value) for value in parameters)
+    return ""
+
+class SlowQuery:
+    __slots__ = ("shape", "route", "calls", "total", "max", "last_seen", "parameter_shapes", "plan", "plan_at")
+
+    def __init__(self, shape: str, route: Optional[str]):
+        self.shape = shape
+        self.route = route
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = 0.0
+        self.parameter_shapes: List[str] = []
+        self.plan: Optional[str] = None
+        self.plan_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "statement": self.shape,
+            "route": self.route,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "last_seen": self.last_seen,
+            "parameter_shapes": list(self.parameter_shapes),
+            "plan": self.plan,
+            "plan_captured_at": self.plan_at
+        }
+
+class SlowQueryLog:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, Optional[str]], SlowQuery] = {}
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, route: Optional[str], duration: float, parameters: str):
+        key = (shape, route)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    # Drop the entry that costs least, so one-off queries cannot push out the offenders
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k].total)]
+                entry = self._entries[key] = SlowQuery(shape, route)
+            entry.calls += 1
+            entry.total += duration
+            entry.max = max(entry.max, duration)
+            entry.last_seen = time.time()
+            if parameters not in entry.parameter_shapes and len(entry.parameter_shapes) < MAX_PARAM_SHAPES:
+                entry.parameter_shapes.append(parameters)
+
+    def set_plan(self, shape: str, plan: str):
+        captured = time.time()
+        with self._lock:
+            for (entry_shape, _), entry in self._entries.items():
+                if entry_shape == shape:
+                    entry.plan = plan
+                    entry.plan_at = captured
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry.total, reverse=True)[:limit]
+            return [entry.to_dict() for entry in entries]
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+slow_query_log = SlowQueryLog()
+
+# One worker: plans are a diagnostic, never worth more than one extra connection
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_explaining = set()
+_explaining_lock = threading.Lock()
+
+def should_explain(statement: str) -> bool:
+    return bool(_EXPLAINABLE.match(statement)) and not _LOCKING.search(statement)
+
+def explain(engine, statement: str, parameters: Any) -> str:
+    """EXPLAIN (ANALYZE, BUFFERS) `statement` on its own read-only connection."""
+    connection = engine.raw_connection()  # Raw DBAPI cursor: no engine events, so not logged itself
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET TRANSACTION READ ONLY")
+        cursor.execute(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    finally:
+        connection.rollback()
+        connection.close()
+
+def _capture_plan(engine, shape: str, statement: str, parameters: Any):
+    try:
+        slow_query_log.set_plan(shape, explain(engine, statement, parameters))
+    except Exception:
+        logger.warning("EXPLAIN failed for slow query %s", shape[:300], exc_info=True)
+    finally:
+        with _explaining_lock:
+            _explaining.discard(shape)
+
+def _schedule_explain(engine, shape: str, statement: str, parameters: Any):
+    with _explaining_lock:
+        if shape in _explaining:
+            return
+        _explaining.add(shape)
+    params = dict(parameters) if isinstance(parameters, dict) else parameters
+    _explainer.submit(_capture_plan, engine, shape, statement, params)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._slow_query_started
+    if duration * 1000 < SLOW_QUERY_MS:
+        return
+    shape = statement_shape(statement)
+    route = current_route()
+    params = parameter_shape(parameters, executemany)
+    slow_query_log.record(shape, route, duration, params)
+    logger.warning(
+        "Slow query %.1f ms%s: %s [%s]",
+        duration * 1000, f" in {route}" if route else "", shape[:500], params
+    )
+    if not executemany and should_explain(statement) and random.random() < SLOW_QUERY_EXPLAIN_RATE:
+        _schedule_explain(conn.engine, shape, statement, parameters)
+
+def instrument_engine(engine):
+    """Record statements slower than SLOW_QUERY_MS on `engine` (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,358 @@
+"""
+Benchmark suite for the API hot paths.
+
+Seeds a deterministic data set (``--seed``) into a dedicated PostgreSQL
+database and drives the real app with concurrent HTTP requests: in-process
+through httpx's ASGI transport by default, or against a running server with
+``--url``. For every scenario and concurrency level it reports throughput
+and p50 / p95 / p99 latency, writes the results as JSON and, given a
+baseline file, flags regressions (exit code 1).
+
+Scenarios:
+    login              POST /auth/login (argon2 verification)
+    token_read         GET  /users/me with a bearer token
+    read_all_orders    GET  /orders/ (staff, newest 100)
+    read_my_orders     GET  /orders/my-orders (random customer)
+    dashboard_stats    GET  /dashboard/stats (admin)
+    crm_reminders      GET  /crm/reminders
+    create_order       POST /orders/ (1-4 random products)
+    recalculate_grades POST /crm/recalculate-grades
+
+The database must be a throwaway one: ``--reset`` drops and recreates every
+table before seeding. Without ``--reset`` the data of an earlier run is
+reused. No server at hand? ``--pgserver DIR`` starts an embedded PostgreSQL
+in DIR (needs ``pip install pgserver``). In-process runs grade customers
+with ``benchmarks/crm_rules.json`` (``--crm-rules``), not the deployment's
+``config/crm_rules.json``.
+
+Usage:
+    uv run benchmarks/api_hot_paths.py --database-url postgresql://localhost/orderflow_bench --reset
+    uv run benchmarks/api_hot_paths.py --pgserver .bench-pg --reset --output bench.json
+    uv run benchmarks/api_hot_paths.py --pgserver .bench-pg --reset --baseline benchmarks/baseline.json
+    cp bench.json benchmarks/baseline.json   # accept the current numbers as the new baseline
+
+Compare runs made on the same machine, data set and settings only.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BENCH_PASSWORD = "bench-password"
+ADMIN_USERNAME = "bench_admin"
+ORDER_STATUSES = ["pending", "processing", "shipped", "completed", "cancelled"]
+SCENARIOS = [
+    "login", "token_read", "read_all_orders", "read_my_orders",
+    "dashboard_stats", "crm_reminders", "create_order", "recalculate_grades",
+]
+# Heavy scenarios run fewer requests than --requests
+REQUEST_SCALE = {"login": 0.25, "recalculate_grades": 0.1}
+
+def start_pgserver(directory: str) -> str:
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("--pgserver requires the pgserver package (pip install pgserver)")
+    return pgserver.get_server(os.path.abspath(directory)).get_uri()
+
+def seed(args) -> None:
+    """Drop, recreate and fill every table; deterministic for a given --seed."""
+    from sqlalchemy import insert
+    from backend.database import engine, Base
+    from backend import partitions
+    from backend.models import User, Product, Order, OrderItem, Customer, Interaction
+    from backend.auth.utils import get_password_hash
+
+    rng = random.Random(args.seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    password_hash = get_password_hash(BENCH_PASSWORD)  # argon2 is slow: hash once
+
+    users = [{
+        "id": f"bench-user-{i:06d}", "username": f"bench_customer_{i}", "email": f"customer{i}@bench.example",
+        "password_hash": password_hash, "role": "customer", "company_name": f"Bench Company {i}"
+    } for i in range(args.customers)]
+    users.append({
+        "id": "bench-admin", "username": ADMIN_USERNAME, "email": "admin@bench.example",
+        "password_hash": password_hash, "role": "admin", "company_name": "OrderFlow"
+    })
+    products = [{
+        "id": f"bench-product-{i:06d}", "name": f"Product {i}", "category": f"Category {i % 20}",
+        "price": Decimal(rng.randint(100, 50000)) / 100, "stock": 10_000_000, "is_active": True
+    } for i in range(args.products)]
+    customers = [{
+        "id": f"bench-customer-{i:06d}", "company_name": f"Bench Company {i}", "email": f"customer{i}@bench.example",
+        "user_id": f"bench-user-{i:06d}", "grade": "C"
+    } for i in range(args.customers)]
+
+    orders, items = [], []
+    for i in range(args.orders):
+        order_id = f"bench-order-{i:08d}"
+        total = Decimal(0)
+        order_date = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        for j in range(rng.randint(1, 4)):
+            product = products[rng.randrange(len(products))]
+            quantity = rng.randint(1, 5)
+            subtotal = product["price"] * quantity
+            total += subtotal
+            items.append({
+                "id": f"{order_id}-{j}", "order_id": order_id, "order_date": order_date, "product_id": product["id"],
+                "quantity": quantity, "unit_price": product["price"], "subtotal": subtotal
+            })
+        orders.append({
+            "id": order_id, "order_number": f"BENCH-{i:08d}", "user_id": users[rng.randrange(args.customers)]["id"],
+            "order_date": order_date, "updated_at": order_date, "status": rng.choice(ORDER_STATUSES),
+            "total_amount": total, "delivery_address": "Bench Road 1"
+        })
+    interactions = [{
+        "id": f"bench-interaction-{i:07d}", "customer_id": customers[rng.randrange(args.customers)]["id"],
+        "interaction_type": rng.choice(["電話", "Email", "拜訪"]), "content": "bench",
+        "next_action": "follow up" if rng.random() < 0.3 else None, "action_completed": rng.random() < 0.5
+    } for i in range(args.customers * 5)]
+
+    with engine.begin() as conn:
+        partitions.ensure_partitions(conn, now - timedelta(days=366), now)
+        for model, rows in (
+            (User, users), (Product, products), (Customer, customers),
+            (Order, orders), (OrderItem, items), (Interaction, interactions)
+        ):
+            for start in range(0, len(rows), 5000):
+                conn.execute(insert(model), rows[start:start + 5000])
+    print(f"seeded {len(users)} users, {len(products)} products, {len(orders)} orders, "
+          f"{len(items)} items, {len(interactions)} interactions (seed {args.seed})")
+
+class Context:
+    """Ids and tokens the scenarios pick from."""
+
+    def __init__(self, rng: random.Random):
+        from sqlalchemy import func, select
+        from backend.database import SessionLocal
+        from backend.models import User, Product, Order
+        from backend.auth.utils import create_access_token
+
+        self.rng = rng
+        db = SessionLocal()
+        try:
+            customers = db.execute(select(User.username).where(User.role == "customer").order_by(User.id)).scalars().all()
+            self.product_ids = db.execute(select(Product.id).where(Product.is_active).order_by(Product.id)).scalars().all()
+            if not db.execute(select(User.id).where(User.username == ADMIN_USERNAME)).scalar():
+                raise SystemExit("No benchmark data in this database; run with --reset to seed it")
+            orders = db.execute(select(func.count(Order.id))).scalar()
+        finally:
+            db.close()
+        self.customers = customers
+        self.dataset = {"customers": len(customers), "products": len(self.product_ids), "orders": orders}
+        self.admin_headers = {"Authorization": f"Bearer {create_access_token({'sub': ADMIN_USERNAME}, timedelta(hours=2))}"}
+        self.customer_headers = [
+            {"Authorization": f"Bearer {create_access_token({'sub': name}, timedelta(hours=2))}"}
+            for name in customers
+        ]
+
+    def customer(self) -> Dict[str, str]:
+        return self.rng.choice(self.customer_headers)
+
+async def scenario_request(name: str, client, ctx: Context):
+    if name == "login":
+        response = await client.post("/auth/login", json={"username": ctx.rng.choice(ctx.customers), "password": BENCH_PASSWORD})
+        # The session cookie would take precedence over the scenarios' bearer tokens
+        client.cookies.clear()
+        return response
+    if name == "token_read":
+        return await client.get("/users/me", headers=ctx.customer())
+    if name == "read_all_orders":
+        return await client.get("/orders/", headers=ctx.admin_headers)
+    if name == "read_my_orders":
+        return await client.get("/orders/my-orders", headers=ctx.customer())
+    if name == "dashboard_stats":
+        return await client.get("/dashboard/stats", headers=ctx.admin_headers)
+    if name == "crm_reminders":
+        return await client.get("/crm/reminders", headers=ctx.admin_headers)
+    if name == "create_order":
+        products = ctx.rng.sample(ctx.product_ids, ctx.rng.randint(1, 4))
+        body = {
+            "items": [{"product_id": product_id, "quantity": ctx.rng.randint(1, 3)} for product_id in products],
+            "delivery_address": "Bench Road 1"
+        }
+        return await client.post("/orders/", json=body, headers=ctx.customer())
+    if name == "recalculate_grades":
+        return await client.post("/crm/recalculate-grades", headers=ctx.admin_headers)
+    raise ValueError(f"Unknown scenario: {name}")
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+async def run_level(name: str, client, ctx: Context, concurrency: int, requests: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        await scenario_request(name, client, ctx)
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await scenario_request(name, client, ctx)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+def make_client(url: Optional[str], crm_rules: str):
+    import httpx
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=120)
+    from backend.main import app
+    from backend import crm_engine
+    crm_engine.CONFIG_PATH = crm_rules
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+async def run_suite(args, ctx: Context) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    async with make_client(args.url, args.crm_rules) as client:
+        for name in args.scenarios:
+            results[name] = {}
+            requests = max(args.concurrency[-1], int(args.requests * REQUEST_SCALE.get(name, 1)))
+            for concurrency in args.concurrency:
+                result = await run_level(name, client, ctx, concurrency, requests, args.warmup)
+                results[name][str(concurrency)] = result
+                print(f"{name:<20} c={concurrency:<3} {result['throughput_rps']:>9.1f} req/s  "
+                      f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms"
+                      + (f"  {result['errors']} errors" if result["errors"] else ""))
+    return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Scenario / concurrency pairs whose p95 or throughput got worse than `threshold`."""
+    regressions = []
+    for name, levels in results["results"].items():
+        for concurrency, current in levels.items():
+            previous = baseline.get("results", {}).get(name, {}).get(concurrency)
+            if not previous:
+                continue
+            label = f"{name} c={concurrency}"
+            if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append(f"{label}: p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+            if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+                regressions.append(
+                    f"{label}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s"
+                )
+            if current["errors"] > previous.get("errors", 0):
+                regressions.append(f"{label}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--database-url", help="throwaway benchmark database (default: BENCH_DATABASE_URL)")
+    target.add_argument("--pgserver", metavar="DIR", help="start an embedded PostgreSQL in DIR (pip install pgserver)")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--crm-rules", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "crm_rules.json"),
+                        help="CRM rules for in-process runs (default: benchmarks/crm_rules.json)")
+    parser.add_argument("--reset", action="store_true", help="drop all tables and seed fresh data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=SCENARIOS,
+                        help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=lambda s: sorted(int(c) for c in s.split(",")), default=[1, 4, 16],
+                        help="comma-separated concurrency levels (default: 1,4,16)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this results file; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (default: 0.2)")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+def main():
+    args = parse_args()
+    database_url = start_pgserver(args.pgserver) if args.pgserver else (
+        args.database_url or os.getenv("BENCH_DATABASE_URL")
+    )
+    if not database_url:
+        raise SystemExit("Pass --database-url / --pgserver or set BENCH_DATABASE_URL (never the production database)")
+    # backend.database reads DATABASE_URL on import
+    os.environ["DATABASE_URL"] = database_url
+
+    if args.reset:
+        seed(args)
+    ctx = Context(random.Random(args.seed))
+    started_at = datetime.now(timezone.utc).isoformat()
+    results = {
+        "meta": {
+            "started_at": started_at,
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": args.url or "in-process",
+            "seed": args.seed,
+            "dataset": ctx.dataset,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": asyncio.run(run_suite(args, ctx)),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline} "
+                  f"(commit {baseline.get('meta', {}).get('git_commit')}):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nno regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+if __name__ == "__main__":
+    main()
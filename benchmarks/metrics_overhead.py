@@ -0,0 +1,95 @@
+"""
+Micro-benchmark: overhead of the request / DB instrumentation in backend.metrics.
+
+Runs without a database server or network: requests are sent straight into
+the ASGI app, statements go to in-memory SQLite. Prints the added cost per
+request and per statement.
+
+Usage:
+    uv run benchmarks/metrics_overhead.py [--requests 20000] [--queries 50000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from backend.metrics import MetricsMiddleware, MetricsRegistry, RequestStats, current_request, instrument_engine
+
+def build_app(instrumented: bool):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, metrics=MetricsRegistry())
+    return app
+
+async def run_requests(app, count: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/items/{i}", "raw_path": f"/items/{i}".encode(),
+            "root_path": "", "query_string": b"", "headers": [], "client": ("bench", 1), "server": ("bench", 80),
+        }
+
+    for i in range(200):  # warm up
+        await app(scope(i), receive, send)
+    started = time.perf_counter()
+    for i in range(count):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - started) / count
+
+def run_queries(instrumented: bool, count: int) -> float:
+    engine = create_engine("sqlite://")
+    if instrumented:
+        instrument_engine(engine)
+    token = current_request.set(RequestStats())
+    try:
+        with engine.connect() as conn:
+            statement = text("SELECT 1")
+            for _ in range(200):
+                conn.execute(statement)
+            started = time.perf_counter()
+            for _ in range(count):
+                conn.execute(statement)
+            return (time.perf_counter() - started) / count
+    finally:
+        current_request.reset(token)
+
+def best_of(runs: int, measure) -> float:
+    return min(measure() for _ in range(runs))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=5, help="best of N runs")
+    args = parser.parse_args()
+
+    plain_app, metered_app = build_app(False), build_app(True)
+    plain = best_of(args.runs, lambda: asyncio.run(run_requests(plain_app, args.requests)))
+    metered = best_of(args.runs, lambda: asyncio.run(run_requests(metered_app, args.requests)))
+    print(f"request:   {plain * 1e6:8.1f} us plain  {metered * 1e6:8.1f} us instrumented  "
+          f"+{(metered - plain) * 1e6:.1f} us ({(metered / plain - 1) * 100:+.1f}%)")
+
+    plain = best_of(args.runs, lambda: run_queries(False, args.queries))
+    metered = best_of(args.runs, lambda: run_queries(True, args.queries))
+    print(f"statement: {plain * 1e6:8.1f} us plain  {metered * 1e6:8.1f} us instrumented  "
+          f"+{(metered - plain) * 1e6:.1f} us ({(metered / plain - 1) * 100:+.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { crmService } from '@/services/crm.service';
 import type {
+  CustomerOverviewSection,
   CustomerStatus,
   CreateInteractionRequest,
   UpdateCustomerRequest,
@@ -45,9 +46,11 @@ export function useUpdateCustomer() {
 }
 
 export function useInteractions(customerId: string) {
-  return useQuery({
+  return useInfiniteQuery({
     queryKey: ['interactions', customerId],
-    queryFn: () => crmService.getInteractions(customerId),
+    queryFn: ({ pageParam }) => crmService.getInteractions(customerId, { cursor: pageParam }),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     enabled: !!customerId,
   });
 }
@@ -70,10 +73,11 @@ export function useCreateInteraction() {
   });
 }
 
-export function useOrderSummary(customerId: string) {
+export function useCustomerOverview(customerId: string, fields?: CustomerOverviewSection[]) {
   return useQuery({
-    queryKey: ['orderSummary', customerId],
-    queryFn: () => crmService.getOrderSummary(customerId),
+    // Nested under ['customer', id] so customer mutations invalidate it too
+    queryKey: ['customer', customerId, 'overview', fields],
+    queryFn: () => crmService.getCustomerOverview(customerId, fields),
     enabled: !!customerId,
   });
 }
@@ -1,4 +1,5 @@
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useEffect } from 'react';
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { ordersService } from '@/services/orders.service';
 import type { Order, CreateOrderRequest, UpdateOrderStatusRequest } from '@/services/api.types';
 import { toast } from 'sonner';
@@ -14,6 +15,20 @@ export const useMyOrders = () => {
     });
 };
 
+/**
+ * 当前用户已封存订单 Hook（较早的已完成 / 已取消订单，按需逐页加载）
+ */
+export const useMyArchivedOrders = (enabled: boolean) => {
+    return useInfiniteQuery({
+        queryKey: ['myArchivedOrders'],
+        queryFn: ({ pageParam }) => ordersService.getMyArchivedOrders({ cursor: pageParam }),
+        initialPageParam: undefined as string | undefined,
+        getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+        enabled,
+        staleTime: 5 * 60 * 1000, // 封存订单不会再变动
+    });
+};
+
 /**
  * 获取所有订单 Hook (管理员)
  */
@@ -30,6 +45,27 @@ export const useAllOrders = (params?: {
     });
 };
 
+/**
+ * 订单状态推送 Hook：收到事件时重新获取订单列表，取代轮询
+ */
+export const useOrderEvents = () => {
+    const queryClient = useQueryClient();
+
+    useEffect(() => {
+        const source = ordersService.openEventStream();
+        const refresh = () => {
+            queryClient.invalidateQueries({ queryKey: ['myOrders'] });
+            queryClient.invalidateQueries({ queryKey: ['allOrders'] });
+            queryClient.invalidateQueries({ queryKey: ['dashboardStats'] });
+        };
+        // resync：连线落后太多，事件已被丢弃，同样重新获取
+        for (const type of ['order.created', 'order.status_changed', 'resync']) {
+            source.addEventListener(type, refresh);
+        }
+        return () => source.close();
+    }, [queryClient]);
+};
+
 /**
  * 创建订单 Hook
  */
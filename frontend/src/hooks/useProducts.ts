@@ -1,6 +1,6 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { productsService } from '@/services/products.service';
-import type { Product, CreateProductRequest, UpdateProductRequest } from '@/services/api.types';
+import type { Product, ProductSearchResponse, CreateProductRequest, UpdateProductRequest } from '@/services/api.types';
 import { toast } from 'sonner';
 
 /**
@@ -19,6 +19,24 @@ export const useProducts = (params?: {
     });
 };
 
+/**
+ * 搜索产品 Hook
+ */
+export const useProductSearch = (params?: {
+    q?: string;
+    category?: string;
+    sort?: 'name' | 'price';
+    order?: 'asc' | 'desc';
+    limit?: number;
+}) => {
+    return useQuery<ProductSearchResponse>({
+        queryKey: ['products', 'search', params],
+        queryFn: () => productsService.searchProducts(params),
+        staleTime: 60 * 1000,
+        placeholderData: (previous) => previous,
+    });
+};
+
 /**
  * 获取单个产品 Hook
  */
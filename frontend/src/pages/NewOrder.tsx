@@ -22,7 +22,7 @@ import {
   SelectTrigger,
   SelectValue,
 } from "@/components/ui/select";
-import { useProducts } from "@/hooks/useProducts";
+import { useProductSearch } from "@/hooks/useProducts";
 import { useCreateOrder } from "@/hooks/useOrders";
 import type { Product } from "@/services/api.types";
 import { cn } from "@/lib/utils";
@@ -43,9 +43,17 @@ export default function NewOrder() {
   const navigate = useNavigate();
   const [cart, setCart] = useState<CartItem[]>([]);
   const [selectedProductId, setSelectedProductId] = useState<string>("");
-
-  // Fetch products using React Query
-  const { data: products = [], isLoading: productsLoading } = useProducts({ include_inactive: false });
+  const [searchTerm, setSearchTerm] = useState<string>("");
+  const [category, setCategory] = useState<string>("all");
+
+  // Search the catalog server-side instead of loading it all
+  const { data: searchResult, isLoading: productsLoading } = useProductSearch({
+    q: searchTerm.trim() || undefined,
+    category: category === "all" ? undefined : category,
+    limit: 50,
+  });
+  const products = searchResult?.items ?? [];
+  const facets = searchResult?.facets ?? [];
   const createOrder = useCreateOrder();
 
   const form = useForm<OrderFormData>({
@@ -160,6 +168,30 @@ export default function NewOrder() {
             選擇商品
           </h2>
 
+          <div className="flex gap-3">
+            <Input
+              className="flex-1"
+              placeholder="搜尋商品名稱或描述..."
+              value={searchTerm}
+              onChange={(e) => setSearchTerm(e.target.value)}
+            />
+            <Select value={category} onValueChange={setCategory}>
+              <SelectTrigger className="w-48">
+                <SelectValue placeholder="全部分類" />
+              </SelectTrigger>
+              <SelectContent>
+                <SelectItem value="all">全部分類</SelectItem>
+                {facets
+                  .filter((facet) => facet.category)
+                  .map((facet) => (
+                    <SelectItem key={facet.category} value={facet.category!}>
+                      {facet.category} ({facet.count})
+                    </SelectItem>
+                  ))}
+              </SelectContent>
+            </Select>
+          </div>
+
           <div className="flex gap-3">
             <Select value={selectedProductId} onValueChange={setSelectedProductId}>
               <SelectTrigger className="flex-1">
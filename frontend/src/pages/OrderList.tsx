@@ -19,7 +19,7 @@ import {
 import { Calendar } from "@/components/ui/calendar";
 import { StatusBadge } from "@/components/StatusBadge";
 import { OrderDetailModal } from "@/components/OrderDetailModal";
-import { useMyOrders } from "@/hooks/useOrders";
+import { useMyArchivedOrders, useMyOrders, useOrderEvents } from "@/hooks/useOrders";
 import type { Order, OrderStatus } from "@/services/api.types";
 import { cn } from "@/lib/utils";
 
@@ -36,8 +36,26 @@ export default function OrderList() {
   const [selectedOrder, setSelectedOrder] = useState<Order | null>(null);
   const [modalOpen, setModalOpen] = useState(false);
 
+  // Older closed orders are archived; they are loaded page by page on request
+  const [showArchived, setShowArchived] = useState(false);
+
   // Fetch orders using React Query
-  const { data: orders = [], isLoading } = useMyOrders();
+  const { data: liveOrders = [], isLoading } = useMyOrders();
+  const {
+    data: archivedPages,
+    fetchNextPage: fetchMoreArchived,
+    hasNextPage: hasMoreArchived,
+    isFetching: isFetchingArchived,
+  } = useMyArchivedOrders(showArchived);
+  // Refetch when an order's status changes instead of polling
+  useOrderEvents();
+
+  const orders = useMemo(() => {
+    // An order archived after the live list was loaded appears only once
+    const liveIds = new Set(liveOrders.map((order) => order.id));
+    const archived = archivedPages?.pages.flatMap((page) => page.items) ?? [];
+    return [...liveOrders, ...archived.filter((order) => !liveIds.has(order.id))];
+  }, [liveOrders, archivedPages]);
 
   const filteredOrders = useMemo(() => {
     return orders.filter((order) => {
@@ -250,6 +268,19 @@ export default function OrderList() {
             </tbody>
           </table>
         </div>
+        {(!showArchived || hasMoreArchived || isFetchingArchived) && (
+          <div className="border-t p-2">
+            <Button
+              variant="ghost"
+              size="sm"
+              className="w-full"
+              disabled={isFetchingArchived}
+              onClick={() => (showArchived ? fetchMoreArchived() : setShowArchived(true))}
+            >
+              {isFetchingArchived ? "載入中..." : "載入較早的訂單"}
+            </Button>
+          </div>
+        )}
       </div>
 
       {/* Order Detail Modal */}
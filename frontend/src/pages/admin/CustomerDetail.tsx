@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
-import { useCustomer, useUpdateCustomer, useInteractions, useCreateInteraction, useOrderSummary } from '@/hooks/useCRM';
+import { useCustomerOverview, useUpdateCustomer, useInteractions, useCreateInteraction } from '@/hooks/useCRM';
 import type { InteractionType, CustomerStatus } from '@/services/crm.types';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -96,11 +96,18 @@ const interactionSchema = z.object({
 
 export default function CustomerDetail() {
   const { id } = useParams<{ id: string }>();
-  const { data: customer, isLoading } = useCustomer(id!);
+  const { data: overview, isLoading } = useCustomerOverview(id!, ['customer', 'order_summary']);
+  const customer = overview?.customer;
+  const orderSummary = overview?.order_summary ?? [];
   const updateCustomer = useUpdateCustomer();
-  const { data: interactions = [] } = useInteractions(id!);
+  const {
+    data: interactionPages,
+    fetchNextPage: fetchMoreInteractions,
+    hasNextPage: hasMoreInteractions,
+    isFetchingNextPage: isFetchingMoreInteractions,
+  } = useInteractions(id!);
+  const interactions = interactionPages?.pages.flatMap((page) => page.items) ?? [];
   const createInteraction = useCreateInteraction();
-  const { data: orderSummary = [] } = useOrderSummary(id!);
 
   const [isEditOpen, setIsEditOpen] = useState(false);
   const [isAddInteractionOpen, setIsAddInteractionOpen] = useState(false);
@@ -411,6 +418,17 @@ export default function CustomerDetail() {
                     );
                   })
                 )}
+                {hasMoreInteractions && (
+                  <Button
+                    variant="ghost"
+                    size="sm"
+                    className="w-full"
+                    disabled={isFetchingMoreInteractions}
+                    onClick={() => fetchMoreInteractions()}
+                  >
+                    {isFetchingMoreInteractions ? '載入中...' : '載入更多'}
+                  </Button>
+                )}
               </div>
             </div>
           </CardContent>
@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { useAllOrders, useUpdateOrderStatus } from "@/hooks/useOrders";
+import { useAllOrders, useOrderEvents, useUpdateOrderStatus } from "@/hooks/useOrders";
 import type { Order, OrderStatus } from "@/services/api.types";
 import { StatusBadge } from "@/components/StatusBadge";
 import { useAuth } from "@/contexts/AuthContext";
@@ -33,6 +33,7 @@ import { format } from "date-fns";
 export default function OrderAdmin() {
   const { isAdmin } = useAuth();
   const { data: orders = [], isLoading } = useAllOrders();
+  useOrderEvents();
   const updateOrderStatus = useUpdateOrderStatus();
 
   const [searchQuery, setSearchQuery] = useState("");
@@ -61,6 +61,11 @@ export interface Order {
     user?: User;
 }
 
+export interface OrderPage {
+    items: Order[];
+    next_cursor: string | null;
+}
+
 export interface CreateOrderRequest {
     items: {
         product_id: string;
@@ -87,6 +92,18 @@ export interface Product {
     created_at?: string;
 }
 
+export interface CategoryFacet {
+    category: string | null;
+    count: number;
+}
+
+export interface ProductSearchResponse {
+    items: Product[];
+    facets: CategoryFacet[];
+    total: number;
+    next_cursor: string | null;
+}
+
 export interface CreateProductRequest {
     name: string;
     description: string;
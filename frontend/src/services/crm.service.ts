@@ -2,8 +2,10 @@ import apiClient from '@/lib/api.config';
 import type {
   Customer,
   CustomerInteraction,
+  CustomerInteractionPage,
   CustomerReminder,
-  CustomerOrderSummary,
+  CustomerOverview,
+  CustomerOverviewSection,
   CreateInteractionRequest,
   UpdateCustomerRequest,
   CustomerStatus,
@@ -82,13 +84,26 @@ export const crmService = {
   },
 
   /**
-   * 獲取客戶互動記錄
+   * 獲取客戶互動記錄（cursor 分頁，下一頁 cursor 由 X-Next-Cursor 標頭提供）
    */
-  async getInteractions(customerId: string): Promise<CustomerInteraction[]> {
+  async getInteractions(
+    customerId: string,
+    params?: { cursor?: string; limit?: number; openActionsOnly?: boolean }
+  ): Promise<CustomerInteractionPage> {
     const response = await apiClient.get<CustomerInteraction[]>(
-      `/crm/customers/${customerId}/interactions`
+      `/crm/customers/${customerId}/interactions`,
+      {
+        params: {
+          cursor: params?.cursor,
+          limit: params?.limit,
+          open_actions_only: params?.openActionsOnly || undefined,
+        },
+      }
     );
-    return response.data;
+    return {
+      items: response.data,
+      next_cursor: response.headers['x-next-cursor'] ?? null,
+    };
   },
 
   /**
@@ -106,23 +121,24 @@ export const crmService = {
   },
 
   /**
-   * 獲取客戶訂單統計 (最近6個月)
-   * Note: This is a placeholder as the backend doesn't have this endpoint yet
+   * 獲取客戶 360 概覽（單次請求，可用 fields 只取需要的區塊）
    */
-  async getOrderSummary(customerId: string): Promise<CustomerOrderSummary[]> {
-    // TODO: Implement when backend provides this endpoint
-    // For now, generate mock data client-side
-    const months = [];
-    const now = new Date();
-    for (let i = 5; i >= 0; i--) {
-      const date = new Date(now.getFullYear(), now.getMonth() - i, 1);
-      months.push({
-        month: `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`,
-        amount: Math.floor(Math.random() * 200000) + 50000,
-        count: Math.floor(Math.random() * 5) + 1,
-      });
+  async getCustomerOverview(
+    customerId: string,
+    fields?: CustomerOverviewSection[]
+  ): Promise<CustomerOverview | null> {
+    try {
+      const response = await apiClient.get<CustomerOverview>(
+        `/crm/customers/${customerId}/overview`,
+        { params: { fields: fields?.join(',') } }
+      );
+      return response.data;
+    } catch (error: any) {
+      if (error.status === 404) {
+        return null;
+      }
+      throw error;
     }
-    return months;
   },
 
   /**
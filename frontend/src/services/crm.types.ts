@@ -35,6 +35,11 @@ export interface CustomerInteraction {
   created_at: string;
 }
 
+export interface CustomerInteractionPage {
+  items: CustomerInteraction[];
+  next_cursor: string | null;
+}
+
 export interface CustomerReminder {
   id: string;
   customer_id: string;
@@ -52,6 +57,41 @@ export interface CustomerOrderSummary {
   count: number;
 }
 
+export type CustomerOverviewSection =
+  | 'customer'
+  | 'interactions'
+  | 'open_actions'
+  | 'orders'
+  | 'order_summary'
+  | 'stats';
+
+export interface CustomerOrderBrief {
+  id: string;
+  order_number: string;
+  order_date: string;
+  status: string;
+  total_amount?: number;
+}
+
+export interface CustomerLifetimeStats {
+  total_orders: number;
+  total_amount: number;
+  completed_orders: number;
+  open_orders: number;
+  cancelled_orders: number;
+  first_order_date?: string;
+  last_order_date?: string;
+}
+
+export interface CustomerOverview {
+  customer?: Customer;
+  interactions?: CustomerInteraction[];
+  open_actions?: CustomerInteraction[];
+  orders?: CustomerOrderBrief[];
+  order_summary?: CustomerOrderSummary[];
+  stats?: CustomerLifetimeStats;
+}
+
 export interface CreateInteractionRequest {
   interaction_type: InteractionType;
   content: string;
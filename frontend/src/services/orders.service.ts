@@ -1,6 +1,7 @@
 import apiClient from '@/lib/api.config';
 import type {
     Order,
+    OrderPage,
     CreateOrderRequest,
     UpdateOrderStatusRequest
 } from './api.types';
@@ -14,6 +15,17 @@ export const ordersService = {
         return response.data;
     },
 
+    /**
+     * 获取当前用户已封存的订单（cursor 分页，下一页 cursor 由 X-Next-Cursor 标头提供）
+     */
+    async getMyArchivedOrders(params?: { cursor?: string; limit?: number }): Promise<OrderPage> {
+        const response = await apiClient.get<Order[]>('/orders/my-orders/archived', { params });
+        return {
+            items: response.data,
+            next_cursor: response.headers['x-next-cursor'] ?? null,
+        };
+    },
+
     /**
      * 获取所有订单 (仅员工和管理员)
      */
@@ -50,4 +62,11 @@ export const ordersService = {
         const response = await apiClient.put(`/orders/${orderId}/status`, data);
         return response.data;
     },
+
+    /**
+     * 订单状态变更事件流 (SSE，以 cookie 认证；员工会收到所有订单)
+     */
+    openEventStream(): EventSource {
+        return new EventSource(`${apiClient.defaults.baseURL ?? ''}/orders/events`, { withCredentials: true });
+    },
 };
@@ -1,6 +1,7 @@
 import apiClient from '@/lib/api.config';
 import type {
     Product,
+    ProductSearchResponse,
     CreateProductRequest,
     UpdateProductRequest
 } from './api.types';
@@ -19,6 +20,21 @@ export const productsService = {
         return response.data;
     },
 
+    /**
+     * 搜索产品（名称 / 描述），附分类统计与 cursor 分页
+     */
+    async searchProducts(params?: {
+        q?: string;
+        category?: string;
+        sort?: 'name' | 'price';
+        order?: 'asc' | 'desc';
+        cursor?: string;
+        limit?: number;
+    }): Promise<ProductSearchResponse> {
+        const response = await apiClient.get('/products/search', { params });
+        return response.data;
+    },
+
     /**
      * 获取单个产品
      */
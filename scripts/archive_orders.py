@@ -0,0 +1,69 @@
+"""
+封存已結束的舊訂單
+將超過保存期限（預設 ARCHIVE_AFTER_DAYS 天）的已完成 / 已取消訂單連同明細，分批移到 orders_archive
+（每張訂單一列，明細以 JSON 存放），讓 orders / order_items 只保留近期與未結束的訂單。
+每批在獨立交易中完成，可隨時中斷後重新執行。客戶累計統計、期間報表與訂單匯出
+會一併讀取封存資料，客戶可由 GET /orders/my-orders/archived 分頁查詢封存訂單。建議以排程（如每日）執行。
+
+用法：
+    uv run scripts/archive_orders.py
+    uv run scripts/archive_orders.py --older-than-days 730 --batch-size 5000
+    uv run scripts/archive_orders.py --dry-run
+"""
+import sys
+import os
+import argparse
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from backend.database import SessionLocal, engine
+from backend import archive, query_budget
+
+def main():
+    parser = argparse.ArgumentParser(description="Move closed orders older than the retention window to orders_archive")
+    parser.add_argument("--older-than-days", type=int, default=archive.ARCHIVE_AFTER_DAYS,
+                        help="archive completed / cancelled orders placed more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=archive.ARCHIVE_BATCH_SIZE, help="orders per transaction")
+    parser.add_argument("--max-batches", type=int, default=None, help="stop after this many batches")
+    parser.add_argument("--dry-run", action="store_true", help="only count the orders that would be archived")
+    args = parser.parse_args()
+
+    cutoff = archive.archive_cutoff(args.older_than_days)
+    if query_budget.QUERY_BUDGET_MODE != "off":
+        query_budget.instrument_engine(engine)
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            print(f"{cutoff:%Y-%m-%d} 以前的已結束訂單：{archive.count_archivable(db, cutoff):,} 筆")
+            return
+
+        print(f"封存 {cutoff:%Y-%m-%d} 以前的已完成 / 已取消訂單...")
+        started = time.perf_counter()
+        total = batches = 0
+        while args.max_batches is None or batches < args.max_batches:
+            # 每批一條陳述式；逐批檢查，各批重複執行同一查詢不算 N+1
+            with query_budget.track_queries("archive_orders batch", budget=1):
+                moved = archive.archive_batch(db, cutoff, args.batch_size)
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            print(f"  已封存 {total:,} 筆", end="\r", flush=True)
+        print()
+    finally:
+        db.close()
+
+    if total:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in ("orders", "order_items", "orders_archive"):
+                conn.execute(text(f"ANALYZE {table}"))
+    print(f"✓ 共封存 {total:,} 筆訂單，{time.perf_counter() - started:.1f} 秒")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import sys
 import os
+import json
+import argparse
 import datetime
 import logging
-from decimal import Decimal
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import time
 from dotenv import load_dotenv
 load_dotenv()
@@ -11,61 +12,148 @@ load_dotenv()
 # Add the project root to the python path to allow imports from backend
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import gspread
-from google.oauth2.service_account import Credentials
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, tuple_, literal, select, true, union_all
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Session
 
 from backend.database import SessionLocal
-from backend.models import Order, OrderItem, User, Product
+from backend.archive import archived_items
+from backend.models import ArchivedOrder, Order, OrderItem, User, Product
+from backend.report_sinks import ReportSink, GoogleSheetsSink, LocalFileSink, open_google_sheet
+
+# Logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
 
 # Configuration
 GOOGLE_CREDENTIALS_PATH = os.path.join("config", "google-credentials.json")
-SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
-if not SPREADSHEET_ID:
-    logger.error("SPREADSHEET_ID not found in environment variables.")
-    sys.exit(1)
+EXPORT_STATE_PATH = os.path.join("config", "gsheet_export_state.json")
 SHEET_NAME_SUMMARY = "本週訂單摘要"
 SHEET_NAME_STATS = "統計資訊"
+SUMMARY_HEADERS = ["訂單編號", "訂單日期", "客戶名稱", "商品清單", "訂單金額", "訂單狀態"]
+STATS_HEADERS = ["統計項目", "數值"]
+NO_ORDERS_PLACEHOLDER = "本週無訂單"
+# updated_at is the writing transaction's start time, so a slow transaction can
+# commit a change that sorts before the watermark; re-read this window behind it
+# (delta rows are upserts, rewriting a few is harmless)
+WATERMARK_OVERLAP = datetime.timedelta(minutes=5)
 MAX_RETRIES = 3
 
-# Logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-logger = logging.getLogger(__name__)
-
-def get_weekly_orders(db: Session) -> List[Order]:
-    """Fetch orders for the current week (Monday to Sunday)."""
+def get_week_range() -> Tuple[datetime.datetime, datetime.datetime]:
+    """Start and end of the current week (Monday 00:00:00 to Sunday 23:59:59)."""
     today = datetime.date.today()
     start_of_week = today - datetime.timedelta(days=today.weekday())  # Monday
     end_of_week = start_of_week + datetime.timedelta(days=6)  # Sunday
-    
+
     # Set time to 00:00:00 for start and 23:59:59 for end
     start_dt = datetime.datetime.combine(start_of_week, datetime.time.min)
     end_dt = datetime.datetime.combine(end_of_week, datetime.time.max)
+    return start_dt, end_dt
+
+def get_weekly_orders(
+    db: Session,
+    start_dt: datetime.datetime,
+    end_dt: datetime.datetime,
+    since: Optional[Tuple[datetime.datetime, str]] = None
+) -> List[Any]:
+    """
+    Fetch the week's orders, live and archived, as flat rows in a single query
+    (customer name and product list are resolved in SQL). With `since` =
+    (updated_at, id), only orders created or changed after that watermark are
+    returned.
+    """
+    logger.info(f"Fetching orders from {start_dt} to {end_dt}" + (f" changed after {since[0]}" if since else ""))
 
-    logger.info(f"Fetching orders from {start_dt} to {end_dt}")
+    customer_name = func.coalesce(func.nullif(User.company_name, ""), User.username, "Unknown")
 
-    orders = db.query(Order).filter(
+    live = select(
+        Order.id,
+        Order.order_number,
+        Order.order_date,
+        customer_name.label("customer_name"),
+        func.coalesce(
+            func.string_agg(Product.name, aggregate_order_by(literal(", "), OrderItem.id)), ""
+        ).label("items"),
+        Order.total_amount,
+        Order.status,
+        Order.updated_at
+    ).outerjoin(
+        User, User.id == Order.user_id
+    ).outerjoin(
+        OrderItem, and_(
+            OrderItem.order_id == Order.id,
+            OrderItem.order_date == Order.order_date,
+            # Repeated for order_items so both tables read only the week's partitions
+            OrderItem.order_date >= start_dt,
+            OrderItem.order_date <= end_dt
+        )
+    ).outerjoin(
+        Product, Product.id == OrderItem.product_id
+    ).where(
         and_(Order.order_date >= start_dt, Order.order_date <= end_dt)
-    ).all()
-    
-    return orders
-
-def connect_to_gsheet() -> gspread.Client:
-    """Connect to Google Sheets API with retry logic."""
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    
+    ).group_by(
+        Order.id, Order.order_date, User.company_name, User.username
+    )
+
+    # Archived orders keep their items inline as JSON
+    item = archived_items()
+    archived = select(
+        ArchivedOrder.id,
+        ArchivedOrder.order_number,
+        ArchivedOrder.order_date,
+        customer_name,
+        func.coalesce(
+            func.string_agg(Product.name, aggregate_order_by(literal(", "), item.c.id)), ""
+        ),
+        ArchivedOrder.total_amount,
+        ArchivedOrder.status,
+        ArchivedOrder.updated_at
+    ).select_from(ArchivedOrder).outerjoin(
+        User, User.id == ArchivedOrder.user_id
+    ).outerjoin(
+        item, true()
+    ).outerjoin(
+        Product, Product.id == item.c.product_id
+    ).where(
+        and_(ArchivedOrder.order_date >= start_dt, ArchivedOrder.order_date <= end_dt)
+    ).group_by(
+        ArchivedOrder.id, User.company_name, User.username
+    )
+
+    if since:
+        live = live.where(tuple_(Order.updated_at, Order.id) > tuple_(*since))
+        archived = archived.where(tuple_(ArchivedOrder.updated_at, ArchivedOrder.id) > tuple_(*since))
+
+    rows = union_all(live, archived)
+    return db.execute(rows.order_by(rows.selected_columns.order_date, rows.selected_columns.id)).all()
+
+def get_weekly_stats(db: Session, start_dt: datetime.datetime, end_dt: datetime.datetime) -> Dict[str, Any]:
+    """Order count, total amount and per-status counts for the week (archived orders included), aggregated in SQL."""
+    orders = union_all(
+        select(Order.status, Order.total_amount).where(
+            and_(Order.order_date >= start_dt, Order.order_date <= end_dt)
+        ),
+        select(ArchivedOrder.status, ArchivedOrder.total_amount).where(
+            and_(ArchivedOrder.order_date >= start_dt, ArchivedOrder.order_date <= end_dt)
+        )
+    ).subquery()
+    rows = db.execute(select(
+        func.coalesce(orders.c.status, "Unknown"),
+        func.count(),
+        func.coalesce(func.sum(orders.c.total_amount), 0)
+    ).group_by(orders.c.status).order_by(orders.c.status)).all()
+
+    return {
+        "total_orders": sum(count for _, count, _ in rows),
+        "total_amount": float(sum(amount for _, _, amount in rows)),
+        "status_counts": [(status, count) for status, count, _ in rows]
+    }
+
+def connect_to_gsheet(spreadsheet_id: str):
+    """Open the spreadsheet with retry logic."""
     for attempt in range(MAX_RETRIES):
         try:
-            if not os.path.exists(GOOGLE_CREDENTIALS_PATH):
-                raise FileNotFoundError(f"Credentials file not found at: {GOOGLE_CREDENTIALS_PATH}")
-                
-            creds = Credentials.from_service_account_file(GOOGLE_CREDENTIALS_PATH, scopes=scope)
-            client = gspread.authorize(creds)
-            return client
+            return open_google_sheet(spreadsheet_id, GOOGLE_CREDENTIALS_PATH)
         except Exception as e:
             logger.warning(f"Connection attempt {attempt + 1} failed: {e}")
             if attempt == MAX_RETRIES - 1:
@@ -73,117 +161,147 @@ def connect_to_gsheet() -> gspread.Client:
                 raise
             time.sleep(2)  # Wait before retry
 
-def format_order_data(orders: List[Order]) -> List[List[Any]]:
-    """Format orders into a list of lists for Google Sheets."""
+def format_order_data(orders: List[Any]) -> List[List[Any]]:
+    """Format flat order rows into a list of lists for the report."""
     rows = []
     for order in orders:
-        product_names = [item.product.name for item in order.items if item.product]
-        items_str = ", ".join(product_names)
-        
-        # Ensure order_date is a datetime object before formatting
         order_date_str = ""
         if order.order_date:
             order_date_str = order.order_date.strftime("%Y-%m-%d %H:%M:%S")
 
-        # Handle customer name safely
-        customer_name = "Unknown"
-        if order.user:
-            # Prefer company name, fallback to username
-            customer_name = order.user.company_name if order.user.company_name else order.user.username
-
         rows.append([
             order.order_number,
             order_date_str,
-            customer_name,
-            items_str,
+            order.customer_name,
+            order.items,
             float(order.total_amount) if order.total_amount else 0.0,
             order.status
         ])
     return rows
 
-def update_summary_sheet(sh: gspread.Spreadsheet, data: List[List[Any]]):
-    """Update the summary sheet with new data."""
-    try:
-        worksheet = sh.worksheet(SHEET_NAME_SUMMARY)
-    except gspread.WorksheetNotFound:
-        worksheet = sh.add_worksheet(title=SHEET_NAME_SUMMARY, rows=100, cols=10)
-        # Add headers if new sheet
-        worksheet.append_row(["訂單編號", "訂單日期", "客戶名稱", "商品清單", "訂單金額", "訂單狀態"])
-
-    # Clear old data (keep headers)
-    # Assuming headers are in row 1
-    if worksheet.row_count > 1:
-        # Clear from row 2 to end
-        # gspread clear isn't row specific usually, so careful. 
-        # Easier to clear all and rewrite headers or just delete rows.
-        # Let's clear range A2:F<End>
-        worksheet.batch_clear([f"A2:F{worksheet.row_count}"])
-
-    if not data:
-        worksheet.update("A2", [["本週無訂單"]])
-    else:
-        worksheet.update(f"A2", data)
-
-def update_stats_sheet(sh: gspread.Spreadsheet, orders: List[Order]):
-    """Update the statistics sheet."""
-    try:
-        worksheet = sh.worksheet(SHEET_NAME_STATS)
-    except gspread.WorksheetNotFound:
-        worksheet = sh.add_worksheet(title=SHEET_NAME_STATS, rows=50, cols=5)
-
-    total_orders = len(orders)
-    total_amount = sum(float(o.total_amount) if o.total_amount else 0.0 for o in orders)
-    
-    # Count statuses
-    status_counts = {}
-    for order in orders:
-        s = order.status or "Unknown"
-        status_counts[s] = status_counts.get(s, 0) + 1
-
-    # Prepare data
+def format_stats_data(stats: Dict[str, Any]) -> List[List[Any]]:
     stats_data = [
-        ["統計項目", "數值"],
-        ["總訂單數", total_orders],
-        ["總金額", total_amount],
-        [], # Empty row
+        ["總訂單數", stats["total_orders"]],
+        ["總金額", stats["total_amount"]],
+        ["", ""], # Empty row
         ["狀態", "數量"]
     ]
-    
-    for status, count in status_counts.items():
+    for status, count in stats["status_counts"]:
         stats_data.append([status, count])
+    return stats_data
+
+def load_export_state() -> Dict[str, Any]:
+    try:
+        with open(EXPORT_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_export_state(state: Dict[str, Any]):
+    os.makedirs(os.path.dirname(EXPORT_STATE_PATH), exist_ok=True)
+    with open(EXPORT_STATE_PATH, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+def export_weekly_orders(
+    db: Session,
+    sink: ReportSink,
+    state: Optional[Dict[str, Any]] = None,
+    full: bool = False,
+    week: Optional[Tuple[datetime.datetime, datetime.datetime]] = None
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Write this week's orders and stats to `sink`. `state` is the result of the
+    previous run: when it is for the same sink and week, only orders changed
+    since its watermark (and not already exported) are written. Returns
+    (new state, rows exported).
+    """
+    start_dt, end_dt = week or get_week_range()
+    state = state or {}
+
+    # 1. Decide between a full rewrite and a delta since the watermark
+    full = (
+        full
+        or state.get("target") != sink.target
+        or state.get("week_start") != start_dt.isoformat()
+        or not state.get("watermark")
+    )
+    since = None
+    if not full:
+        updated_at, order_id = state["watermark"]
+        since = (datetime.datetime.fromisoformat(updated_at) - WATERMARK_OVERLAP, order_id)
+
+    # 2. Fetch changed orders and stats
+    orders = get_weekly_orders(db, start_dt, end_dt, since)
+    if not full:
+        # Rows re-read from the overlap window are resent only if they changed
+        exported = {tuple(key) for key in state.get("recent", [])}
+        orders = [o for o in orders if (o.updated_at.isoformat(), o.id) not in exported]
+    logger.info(f"Found {len(orders)} {'orders' if full else 'changed orders'} for the week.")
+    if not full and not orders:
+        return state, 0
+    stats = get_weekly_stats(db, start_dt, end_dt)
 
-    # Clear and update
-    worksheet.clear()
-    worksheet.update("A1", stats_data)
+    # 3. Write (buffered sinks send everything on flush)
+    data = format_order_data(orders)
+    if full:
+        sink.replace(SHEET_NAME_SUMMARY, SUMMARY_HEADERS, data)
+    else:
+        sink.upsert(SHEET_NAME_SUMMARY, SUMMARY_HEADERS, data)
+    sink.replace(SHEET_NAME_STATS, STATS_HEADERS, format_stats_data(stats))
+    sink.flush()
+
+    # 4. Advance the watermark to the newest exported change
+    watermark = None if full else state.get("watermark")
+    if orders:
+        newest = max(orders, key=lambda o: (o.updated_at, o.id))
+        if not watermark or newest.updated_at > datetime.datetime.fromisoformat(watermark[0]):
+            watermark = [newest.updated_at.isoformat(), newest.id]
+    # Rows inside the next run's overlap window, so it can skip them if unchanged
+    recent = [] if full else state.get("recent", [])
+    recent = recent + [[o.updated_at.isoformat(), o.id] for o in orders]
+    if watermark:
+        window_start = datetime.datetime.fromisoformat(watermark[0]) - WATERMARK_OVERLAP
+        recent = [key for key in recent if datetime.datetime.fromisoformat(key[0]) >= window_start]
+    new_state = {
+        "target": sink.target,
+        "week_start": start_dt.isoformat(),
+        "watermark": watermark,
+        "recent": recent
+    }
+    return new_state, len(orders)
 
 def main():
+    parser = argparse.ArgumentParser(description="Export this week's orders")
+    parser.add_argument("--full", action="store_true", help="rewrite the whole report instead of changed rows only")
+    parser.add_argument("--sink", choices=["gsheet", "csv", "parquet"], default="gsheet",
+                        help="gsheet (default, needs SPREADSHEET_ID) or local files")
+    parser.add_argument("--output", default=os.path.join("exports", "weekly_orders"),
+                        help="directory for the csv / parquet sink")
+    args = parser.parse_args()
+
     logger.info("Starting weekly order export...")
-    
-    db = SessionLocal()
-    try:
-        # 1. Fetch Orders
-        orders = get_weekly_orders(db)
-        logger.info(f"Found {len(orders)} orders for the week.")
 
-        # 2. Connect to Google Sheets
+    if args.sink == "gsheet":
+        spreadsheet_id = os.getenv("SPREADSHEET_ID")
+        if not spreadsheet_id:
+            logger.error("SPREADSHEET_ID not found in environment variables.")
+            sys.exit(1)
         try:
-            client = connect_to_gsheet()
-            sh = client.open_by_key(SPREADSHEET_ID)
+            sink = GoogleSheetsSink(connect_to_gsheet(spreadsheet_id), empty_placeholder=NO_ORDERS_PLACEHOLDER)
         except Exception as e:
             logger.error(f"Failed to access Google Sheet: {e}")
-            return
-
-        # 3. Format Data
-        formatted_data = format_order_data(orders)
-
-        # 4. Update Sheets
-        update_summary_sheet(sh, formatted_data)
-        update_stats_sheet(sh, orders)
-        
-        logger.info("Export completed successfully.")
+            sys.exit(1)
+    else:
+        sink = LocalFileSink(args.output, fmt=args.sink)
 
+    db = SessionLocal()
+    try:
+        state, exported = export_weekly_orders(db, sink, load_export_state(), full=args.full)
+        save_export_state(state)
+        logger.info(f"Export completed successfully ({exported} rows to {sink.target}).")
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
+        sys.exit(1)
     finally:
         db.close()
 
@@ -0,0 +1,394 @@
+"""
+大量測試資料產生器
+依可設定的分佈產生使用者、商品、CRM 客戶、訂單（含明細）與互動紀錄，以 PostgreSQL COPY 批次寫入：
+- 商品熱門度為 Zipf 分佈（--zipf）：少數商品佔大部分銷量
+- 下單日期有季節性：年底旺季、農曆年前後淡季，平日多於週末，並逐年成長（--growth）
+- 回購客戶：回購客戶的下單頻率為重尾分佈（--customer-skew），少數客戶貢獻大部分訂單；另有只下約一張單的零星客戶（--one-time-share）
+- 訂單依日期先後寫入，狀態依訂單新舊決定（舊訂單多已完成）；CRM 客戶的累計金額與已完成訂單一致
+相同的 --seed 與參數（含 --end）會產生完全相同的資料，基準測試可重現。
+
+所有帳號的密碼皆為 --password；另建立 admin（管理者）與 manager（客戶經理）兩個帳號。
+
+用法：
+    uv run scripts/generate_data.py --orders 1000000 --truncate
+    uv run scripts/generate_data.py --users 50000 --products 20000 --orders 10000000 --seed 7 --end 2026-09-30 --truncate
+"""
+import sys
+import os
+import argparse
+import itertools
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator, List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from backend.database import engine
+from backend.bulk_copy import copy_from
+from backend.catalog_cache import catalog_cache
+from backend import partitions
+from backend.auth.utils import get_password_hash
+
+# 一次 COPY 的訂單數（明細隨之寫入）；固定值，不影響產生的資料
+ORDER_BATCH = 20000
+TIMEZONE_SUFFIX = "+08"
+
+# 季節性：月份與星期權重（B2B：週末少）
+MONTH_WEIGHTS = {1: 0.9, 2: 0.65, 3: 1.0, 4: 1.0, 5: 1.0, 6: 1.05, 7: 0.95, 8: 0.95, 9: 1.05, 10: 1.1, 11: 1.3, 12: 1.45}
+WEEKDAY_WEIGHTS = [1.0, 1.05, 1.05, 1.0, 0.95, 0.35, 0.2]
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 20, 40, 45, 42, 25, 35, 42, 40, 35, 25, 15, 10, 8, 5, 3, 2]
+ITEM_COUNTS = [1, 2, 3, 4, 5, 6, 7, 8]
+ITEM_COUNT_WEIGHTS = [35, 25, 15, 10, 6, 4, 3, 2]
+QUANTITIES = [1, 2, 3, 4, 5, 6, 8, 10, 12, 20, 50]
+QUANTITY_WEIGHTS = [30, 20, 12, 8, 8, 5, 5, 5, 3, 2, 2]
+
+CATEGORIES = ["文具", "紙類", "辦公家具", "清潔用品", "飲料", "零食", "電腦周邊", "包材", "茶水間", "五金"]
+PRODUCT_WORDS = ["經濟", "標準", "加大", "環保", "專業", "精選", "商用", "輕巧", "耐用", "高級"]
+COMPANY_WORDS = ["宏", "興", "達", "昌", "泰", "豐", "盛", "聯", "新", "大", "永", "順", "億", "華", "鑫", "益"]
+COMPANY_SUFFIXES = ["股份有限公司", "有限公司", "企業社", "實業", "科技"]
+INDUSTRIES = ["製造業", "零售", "餐飲", "科技", "教育", "醫療", "物流", "營建"]
+SOURCES = ["網站", "展會", "推薦", "電話開發", "System Auto-Import"]
+INTERACTION_TYPES = ["電話", "Email", "拜訪"]
+INTERACTION_CONTENT = ["詢問報價", "確認交期", "追蹤付款", "介紹新品", "處理客訴", "年度合約洽談"]
+NEXT_ACTIONS = ["寄送報價單", "安排拜訪", "回電確認", "提供樣品", "更新合約"]
+
+def cumulative(weights: List[float]) -> List[float]:
+    return list(itertools.accumulate(weights))
+
+def money(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+def allocate(total: int, weights: List[float]) -> List[int]:
+    """把 total 依權重分配為整數（最大餘數法），總和恰為 total"""
+    scale = total / sum(weights)
+    exact = [w * scale for w in weights]
+    counts = [int(x) for x in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+class DataGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.end = args.end
+        self.start = args.end - timedelta(days=args.days)
+        # 雜湊含隨機 salt，是唯一每次不同的欄位（驗證結果相同）；含逗號，需以 CSV 引號包住
+        self.password_hash = '"' + get_password_hash(args.password) + '"'
+        self.stats = {}
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self, day: date, seconds: int) -> str:
+        return f"{day.isoformat()} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}{TIMEZONE_SUFFIX}"
+
+    def company_name(self) -> str:
+        rng = self.rng
+        return "".join(rng.choice(COMPANY_WORDS) for _ in range(2)) + rng.choice(COMPANY_SUFFIXES)
+
+    def copy(self, dbapi_connection, table: str, columns: List[str], lines: Iterator[str]):
+        started = time.perf_counter()
+        counted = self._count(table, lines)
+        copy_from(dbapi_connection, f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", counted)
+        rows, seconds = self.stats.get(table, (0, 0.0))
+        self.stats[table] = (rows, seconds + time.perf_counter() - started)
+
+    def _count(self, table: str, lines: Iterator[str]) -> Iterator[str]:
+        for line in lines:
+            rows, seconds = self.stats.get(table, (0, 0.0))
+            self.stats[table] = (rows + line.count("\n"), seconds)
+            yield line
+
+    # 使用者 -----------------------------------------------------------------
+
+    def generate_users(self):
+        rng = self.rng
+        self.user_ids = [self.uuid() for _ in range(self.args.users)]
+        self.user_companies = [self.company_name() for _ in range(self.args.users)]
+        # 下單頻率：回購客戶為 Pareto 權重（重尾，少數常客貢獻大部分訂單）；
+        # 其餘為零星客戶，權重設定為期望只下約一張訂單（部分註冊後從未下單）
+        weights = [rng.paretovariate(self.args.customer_skew) for _ in range(self.args.users)]
+        occasional = [rng.random() < self.args.one_time_share for _ in range(self.args.users)]
+        repeat_weight = sum(w for w, once in zip(weights, occasional) if not once)
+        once_weight = repeat_weight / max(1, self.args.orders - sum(occasional))
+        self.user_cum = cumulative([once_weight if once else w for w, once in zip(weights, occasional)])
+
+    def user_lines(self) -> Iterator[str]:
+        rng = self.rng
+        staff = [("admin", "admin", "OrderFlow"), ("manager", "account_manager", "OrderFlow")]
+        lines = [
+            f"{self.uuid()},{username},{username}@example.com,{self.password_hash},{role},{company},t,f,0,"
+            f"{self.timestamp(self.start - timedelta(days=365), 9 * 3600)}\n"
+            for username, role, company in staff
+        ]
+        for i, (user_id, company) in enumerate(zip(self.user_ids, self.user_companies)):
+            created = self.start - timedelta(days=rng.randrange(365))
+            lines.append(
+                f"{user_id},user{i:07d},user{i:07d}@example.com,{self.password_hash},customer,{company},"
+                f"{'t' if rng.random() < 0.98 else 'f'},f,0,{self.timestamp(created, rng.randrange(86400))}\n"
+            )
+            if len(lines) >= 10000:
+                yield "".join(lines)
+                lines = []
+        yield "".join(lines)
+
+    # 商品 -------------------------------------------------------------------
+
+    def generate_products(self):
+        rng = self.rng
+        count = self.args.products
+        self.product_ids = [self.uuid() for _ in range(count)]
+        # 價格：對數常態（多數平價、少數高單價），以「分」為單位避免浮點誤差
+        self.product_prices = [max(100, int(rng.lognormvariate(5.5, 1.0) * 100)) for _ in range(count)]
+        # 熱門度：Zipf，名次隨機打散，熱門商品不集中在前幾個 id
+        ranks = list(range(1, count + 1))
+        rng.shuffle(ranks)
+        self.product_cum = cumulative([1 / rank ** self.args.zipf for rank in ranks])
+
+    def product_lines(self) -> Iterator[str]:
+        rng = self.rng
+        lines = []
+        for i, (product_id, price) in enumerate(zip(self.product_ids, self.product_prices)):
+            category = CATEGORIES[i % len(CATEGORIES)]
+            created = self.timestamp(self.start - timedelta(days=rng.randrange(365)), rng.randrange(86400))
+            lines.append(
+                f"{product_id},{rng.choice(PRODUCT_WORDS)}{category} {i:06d},{category}商品,{money(price)},"
+                f"{rng.randrange(5000)},{category},{'t' if rng.random() < 0.97 else 'f'},{created},{created}\n"
+            )
+            if len(lines) >= 10000:
+                yield "".join(lines)
+                lines = []
+        yield "".join(lines)
+
+    # 訂單 -------------------------------------------------------------------
+
+    def day_counts(self) -> List[int]:
+        """每日訂單數：季節 × 星期 × 成長趨勢 × 隨機波動"""
+        rng = self.rng
+        days = self.args.days
+        weights = []
+        for offset in range(days):
+            day = self.start + timedelta(days=offset)
+            trend = 1 + self.args.growth * offset / 365
+            noise = rng.lognormvariate(0, 0.15)
+            weights.append(MONTH_WEIGHTS[day.month] * WEEKDAY_WEIGHTS[day.weekday()] * trend * noise)
+        return allocate(self.args.orders, weights)
+
+    def order_status(self, age: int) -> str:
+        rng = self.rng
+        if age > 30:
+            return rng.choices(("completed", "cancelled", "shipped"), (92, 6, 2))[0]
+        if age > 7:
+            return rng.choices(("completed", "shipped", "processing", "cancelled"), (50, 30, 12, 8))[0]
+        return rng.choices(("pending", "processing", "shipped", "cancelled"), (45, 30, 20, 5))[0]
+
+    def order_batches(self) -> Iterator[tuple]:
+        """依日期先後產生 (訂單列, 明細列)，每批約 ORDER_BATCH 筆訂單"""
+        rng = self.rng
+        users = range(len(self.user_ids))
+        products = range(len(self.product_ids))
+        hour_cum = cumulative(HOUR_WEIGHTS)
+        item_count_cum = cumulative(ITEM_COUNT_WEIGHTS)
+        quantity_cum = cumulative(QUANTITY_WEIGHTS)
+        # CRM 客戶的累計值（只算已完成訂單，與 recalculate_all_grades 一致）
+        self.completed_orders = [0] * len(self.user_ids)
+        self.completed_cents = [0] * len(self.user_ids)
+        self.last_completed = [None] * len(self.user_ids)
+
+        order_lines, item_lines = [], []
+        sequence = 0
+        for offset, count in enumerate(self.day_counts()):
+            if not count:
+                continue
+            day = self.start + timedelta(days=offset)
+            age = (self.end - day).days
+            day_label = day.strftime("%Y%m%d")
+            seconds = sorted(
+                hour * 3600 + rng.randrange(3600)
+                for hour in rng.choices(range(24), cum_weights=hour_cum, k=count)
+            )
+            buyers = rng.choices(users, cum_weights=self.user_cum, k=count)
+            item_counts = rng.choices(ITEM_COUNTS, cum_weights=item_count_cum, k=count)
+            picks = iter(rng.choices(products, cum_weights=self.product_cum, k=sum(item_counts)))
+            quantities = iter(rng.choices(QUANTITIES, cum_weights=quantity_cum, k=sum(item_counts)))
+
+            for second, buyer, item_count in zip(seconds, buyers, item_counts):
+                sequence += 1
+                order_id = self.uuid()
+                ordered_at = self.timestamp(day, second)
+                # 同一商品在一張訂單只出現一次（重複抽到時合併數量）
+                lines = {}
+                for _ in range(item_count):
+                    product = next(picks)
+                    lines[product] = lines.get(product, 0) + next(quantities)
+                total = 0
+                for product, quantity in lines.items():
+                    price = self.product_prices[product]
+                    subtotal = price * quantity
+                    total += subtotal
+                    item_lines.append(
+                        f"{self.uuid()},{order_id},{ordered_at},{self.product_ids[product]},{quantity},{money(price)},{money(subtotal)}\n"
+                    )
+                status = self.order_status(age)
+                if status == "completed":
+                    self.completed_orders[buyer] += 1
+                    self.completed_cents[buyer] += total
+                    self.last_completed[buyer] = ordered_at
+                order_lines.append(
+                    f"{order_id},ORD-{day_label}{second:05d}-{sequence:08d},{self.user_ids[buyer]},{ordered_at},"
+                    f"{status},{money(total)},{self.user_companies[buyer]} 收貨處,,{ordered_at}\n"
+                )
+            if len(order_lines) >= ORDER_BATCH:
+                yield order_lines, item_lines
+                order_lines, item_lines = [], []
+        if order_lines:
+            yield order_lines, item_lines
+
+    # CRM 客戶與互動紀錄 -------------------------------------------------------
+
+    def customer_lines(self) -> Iterator[str]:
+        rng = self.rng
+        self.customer_ids = []
+        lines = []
+        for i, (user_id, company) in enumerate(zip(self.user_ids, self.user_companies)):
+            if rng.random() >= self.args.crm_share:
+                continue
+            customer_id = self.uuid()
+            self.customer_ids.append(customer_id)
+            last = self.last_completed[i] or ""
+            lines.append(
+                f"{customer_id},{company},聯絡人{i:07d},02-{rng.randrange(10000000):07d},user{i:07d}@example.com,{user_id},"
+                f"{company}地址,C,{rng.choice(INDUSTRIES)},{rng.choice(SOURCES)},{self.completed_orders[i]},"
+                f"{money(self.completed_cents[i])},{last}\n"
+            )
+        # 潛在客戶：尚未註冊帳號
+        for i in range(self.args.prospects):
+            customer_id = self.uuid()
+            self.customer_ids.append(customer_id)
+            lines.append(
+                f"{customer_id},{self.company_name()},潛在客戶{i:07d},,lead{i:07d}@example.com,,,C,"
+                f"{rng.choice(INDUSTRIES)},{rng.choice(SOURCES[:4])},0,0.00,\n"
+            )
+        for start in range(0, len(lines), 10000):
+            yield "".join(lines[start:start + 10000])
+
+    def interaction_lines(self) -> Iterator[str]:
+        rng = self.rng
+        mean = self.args.interactions
+        lines = []
+        for customer_id in self.customer_ids:
+            for _ in range(int(rng.expovariate(1 / mean)) if mean > 0 else 0):
+                age = rng.randrange(self.args.days)
+                day = self.end - timedelta(days=age)
+                next_action = rng.choice(NEXT_ACTIONS) if rng.random() < 0.35 else ""
+                completed = next_action and rng.random() < (0.85 if age > 14 else 0.2)
+                lines.append(
+                    f"{self.uuid()},{customer_id},{rng.choice(INTERACTION_TYPES)},{rng.choice(INTERACTION_CONTENT)},"
+                    f"{next_action},{'t' if completed else 'f'},manager,{self.timestamp(day, rng.randrange(9 * 3600, 18 * 3600))}\n"
+                )
+                if len(lines) >= 10000:
+                    yield "".join(lines)
+                    lines = []
+        yield "".join(lines)
+
+    # ------------------------------------------------------------------------
+
+    def run(self, conn):
+        dbapi_connection = conn.connection.dbapi_connection
+        self.generate_users()
+        self.generate_products()
+        self.copy(dbapi_connection, "users", [
+            "id", "username", "email", "password_hash", "role", "company_name", "is_active",
+            "is_superuser", "failed_login_attempts", "created_at"
+        ], self.user_lines())
+        self.copy(dbapi_connection, "products", [
+            "id", "name", "description", "price", "stock", "category", "is_active", "created_at", "updated_at"
+        ], self.product_lines())
+        # 訂單依月分區：先建立期間內各月份的分區（前後各多一天，涵蓋時區差）
+        if partitions.is_partitioned(conn):
+            partitions.ensure_partitions(
+                conn,
+                datetime.combine(self.start - timedelta(days=1), datetime.min.time(), timezone.utc),
+                datetime.combine(self.end + timedelta(days=1), datetime.min.time(), timezone.utc)
+            )
+        for order_lines, item_lines in self.order_batches():
+            # 訂單編號另存於 order_numbers（全域唯一，見 backend/models.py OrderNumber）
+            self.copy(dbapi_connection, "order_numbers", ["order_number"], iter([
+                "".join(line.split(",", 2)[1] + "\n" for line in order_lines)
+            ]))
+            self.copy(dbapi_connection, "orders", [
+                "id", "order_number", "user_id", "order_date", "status", "total_amount",
+                "delivery_address", "notes", "updated_at"
+            ], iter(["".join(order_lines)]))
+            self.copy(dbapi_connection, "order_items", [
+                "id", "order_id", "order_date", "product_id", "quantity", "unit_price", "subtotal"
+            ], iter(["".join(item_lines)]))
+            print(f"  訂單 {self.stats['orders'][0]:,} / {self.args.orders:,}", end="\r", flush=True)
+        print()
+        self.copy(dbapi_connection, "customers", [
+            "id", "company_name", "contact_person", "phone", "email", "user_id", "address", "grade",
+            "industry", "source", "total_orders", "total_amount", "last_order_date"
+        ], self.customer_lines())
+        self.copy(dbapi_connection, "interactions", [
+            "id", "customer_id", "interaction_type", "content", "next_action", "action_completed",
+            "recorded_by", "created_at"
+        ], self.interaction_lines())
+
+GENERATED_TABLES = ["interactions", "customers", "order_items", "orders", "order_numbers", "products", "users"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large, realistic and reproducible data set with COPY")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=10000, help="customer accounts")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=730, help="order history length in days")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(),
+                        help="last order date (default: today; fix it to reproduce a data set later)")
+    parser.add_argument("--zipf", type=float, default=1.1, help="product popularity exponent")
+    parser.add_argument("--customer-skew", type=float, default=1.2,
+                        help="Pareto shape of customer order frequency (lower: more concentrated)")
+    parser.add_argument("--one-time-share", type=float, default=0.2,
+                        help="share of accounts that order about once (the rest are repeat customers)")
+    parser.add_argument("--growth", type=float, default=0.2, help="yearly order volume growth")
+    parser.add_argument("--crm-share", type=float, default=0.6, help="share of accounts with a CRM customer")
+    parser.add_argument("--prospects", type=int, default=None, help="CRM customers without an account (default: users / 10)")
+    parser.add_argument("--interactions", type=float, default=4, help="mean interactions per CRM customer")
+    parser.add_argument("--password", default="password", help="password of every generated account")
+    parser.add_argument("--truncate", action="store_true", help="empty the generated tables first (destroys their data)")
+    args = parser.parse_args()
+    if args.prospects is None:
+        args.prospects = args.users // 10
+
+    generator = DataGenerator(args)
+    print(f"產生資料（seed {args.seed}，{generator.start} ~ {generator.end}）...")
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if args.truncate:
+            conn.execute(text(f"TRUNCATE {', '.join(GENERATED_TABLES)} CASCADE"))
+        elif conn.execute(text("SELECT EXISTS (SELECT 1 FROM users)")).scalar():
+            print("❌ 資料庫已有資料；加上 --truncate 會先清空 " + "、".join(GENERATED_TABLES))
+            sys.exit(1)
+        generator.run(conn)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in GENERATED_TABLES:
+            conn.execute(text(f"ANALYZE {table}"))
+    catalog_cache.notify_changed()
+
+    total_rows = 0
+    for table in reversed(GENERATED_TABLES):
+        rows, seconds = generator.stats.get(table, (0, 0.0))
+        total_rows += rows
+        rate = rows / seconds * 60 if seconds else 0
+        print(f"✓ {table:<13} {rows:>12,} 筆  {seconds:7.1f} 秒  {rate:>14,.0f} 筆/分")
+    elapsed = time.perf_counter() - started
+    print(f"\n完成：共 {total_rows:,} 筆，{elapsed:.1f} 秒（{total_rows / elapsed * 60:,.0f} 筆/分，含資料產生）")
+
+if __name__ == "__main__":
+    main()
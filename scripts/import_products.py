@@ -0,0 +1,50 @@
+"""
+批次匯入 / 更新商品
+以 PostgreSQL COPY 將 CSV 或 NDJSON 寫入暫存表，再一次 upsert 到 products。
+倉庫的庫存檔只需 id 與 stock 兩個欄位。
+
+用法：
+    uv run scripts/import_products.py products.csv
+    uv run scripts/import_products.py stock_feed.ndjson --format ndjson
+"""
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.database import SessionLocal
+from backend.catalog_cache import catalog_cache
+from backend import product_import
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products from CSV or NDJSON")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: detected from the file extension")
+    args = parser.parse_args()
+
+    fmt = product_import.detect_format(None if args.path == "-" else args.path, args.format)
+    db = SessionLocal()
+    try:
+        if args.path == "-":
+            result = product_import.import_products(db, sys.stdin, fmt)
+        else:
+            with open(args.path, "r", encoding="utf-8-sig", newline="") as f:
+                result = product_import.import_products(db, f, fmt)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if result.inserted or result.updated:
+        catalog_cache.notify_changed()
+
+    print(f"新增: {result.inserted}  更新: {result.updated}  拒絕: {result.rejected}")
+    for error in result.errors:
+        print(f"  第 {error['line']} 行: {error['reason']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+資料庫結構遷移
+`Base.metadata.create_all` 只會建立不存在的資料表，既有資料表新增的欄位與索引
+需透過此腳本套用。每個步驟皆為冪等，可重複執行。
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from backend.database import engine
+
+# (名稱, SQL 清單)，依序執行
+MIGRATIONS = [
+    (
+        "customers.user_id",
+        [
+            "ALTER TABLE customers ADD COLUMN IF NOT EXISTS user_id VARCHAR REFERENCES users(id)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_customers_user_id ON customers (user_id)",
+            # Backfill: 以 email 對應既有的使用者
+            """
+            UPDATE customers AS c
+            SET user_id = u.id
+            FROM users AS u
+            WHERE c.user_id IS NULL
+              AND c.email = u.email
+              AND NOT EXISTS (SELECT 1 FROM customers c2 WHERE c2.user_id = u.id)
+            """,
+        ],
+    ),
+    (
+        "interactions (customer_id, created_at, id) index",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_interactions_customer_created ON interactions (customer_id, created_at, id)",
+        ],
+    ),
+    (
+        "orders.updated_at / orders.user_id index",
+        [
+            "ALTER TABLE orders ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now()",
+            "UPDATE orders SET updated_at = order_date WHERE updated_at IS NULL OR updated_at < order_date",
+            "CREATE INDEX IF NOT EXISTS ix_orders_user_id ON orders (user_id)",
+        ],
+    ),
+    (
+        "products search indexes",
+        [
+            # Trigram indexes back the ILIKE '%q%' search (also works for CJK text)
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_products_description_trgm ON products USING gin (description gin_trgm_ops)",
+            # Keyset pagination / facets over the active catalog
+            "CREATE INDEX IF NOT EXISTS ix_products_active_name ON products (name, id) WHERE is_active",
+            "CREATE INDEX IF NOT EXISTS ix_products_active_price ON products (price, id) WHERE is_active",
+            "CREATE INDEX IF NOT EXISTS ix_products_active_category ON products (category) WHERE is_active",
+        ],
+    ),
+    (
+        "products.updated_at / customers.updated_at index",
+        [
+            # Change tracking for the Google Sheets sync
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now()",
+            "CREATE INDEX IF NOT EXISTS ix_products_updated_at ON products (updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_customers_updated_at ON customers (updated_at)",
+        ],
+    ),
+    (
+        "order_numbers backfill",
+        [
+            # 分區後的 orders 無法保證 order_number 全域唯一，已發出的編號記錄於 order_numbers
+            # （資料表由 create_tables.py 建立）
+            """
+            INSERT INTO order_numbers (order_number)
+            SELECT order_number FROM orders
+            UNION
+            SELECT order_number FROM orders_archive
+            ON CONFLICT DO NOTHING
+            """,
+        ],
+    ),
+]
+
+def migrate():
+    """依序套用所有遷移步驟"""
+    print("開始資料庫遷移...")
+    with engine.begin() as conn:
+        for name, statements in MIGRATIONS:
+            for statement in statements:
+                conn.execute(text(statement))
+            print(f"✓ {name}")
+    print("\n資料庫遷移完成！")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,91 @@
+"""
+訂單期間報表
+依週 / 月 / 季 / 年或自訂日期區間，彙整訂單狀態、客戶營收與熱銷商品（皆由資料庫彙總計算）。
+已結算的期間會存入 report_snapshots，之後直接讀取不再重算。
+
+用法：
+    uv run scripts/order_report.py --period month --value 2026-09
+    uv run scripts/order_report.py --period custom --from 2026-01-01 --to 2026-03-15 --json
+    uv run scripts/order_report.py --period quarter --output exports/reports   # 每張表輸出一個 CSV
+"""
+import sys
+import os
+import json
+import argparse
+from datetime import date
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.database import SessionLocal
+from backend.reports import resolve_period, get_order_report, PERIOD_KINDS
+from backend.report_sinks import LocalFileSink
+
+def write_tables(report: dict, directory: str):
+    label = report["period"]["label"].replace(":", "-")
+    sink = LocalFileSink(directory)
+    sink.replace(f"orders_by_status_{label}", ["狀態", "訂單數", "金額"],
+                 [[r["status"], r["orders"], r["amount"]] for r in report["orders_by_status"]])
+    sink.replace(f"revenue_by_customer_{label}", ["user_id", "客戶名稱", "訂單數", "金額"],
+                 [[r["user_id"], r["customer_name"], r["orders"], r["amount"]] for r in report["revenue_by_customer"]])
+    for ranking in ("quantity", "amount"):
+        sink.replace(f"top_products_by_{ranking}_{label}", ["product_id", "商品名稱", "數量", "金額"],
+                     [[r["product_id"], r["name"], r["quantity"], r["amount"]]
+                      for r in report[f"top_products_by_{ranking}"]])
+    print(f"✓ 已輸出至 {directory}")
+
+def print_report(report: dict, cached: bool):
+    period = report["period"]
+    print(f"期間: {period['label']} ({period['start']} ~ {period['end']})"
+          + ("  [已結算，讀取快照]" if cached else ""))
+    print(f"訂單數: {report['total_orders']}  營收訂單: {report['revenue_orders']}  營收: {report['revenue']:.2f}")
+
+    print("\n訂單狀態")
+    for row in report["orders_by_status"]:
+        print(f"  {row['status'] or '-':<12} {row['orders']:>8} {row['amount']:>14.2f}")
+
+    print("\n客戶營收")
+    for row in report["revenue_by_customer"]:
+        print(f"  {row['customer_name'] or row['user_id']:<24} {row['orders']:>8} {row['amount']:>14.2f}")
+
+    for ranking, title in (("quantity", "熱銷商品（數量）"), ("amount", "熱銷商品（金額）")):
+        print(f"\n{title}")
+        for row in report[f"top_products_by_{ranking}"]:
+            print(f"  {row['name']:<24} {row['quantity']:>8} {row['amount']:>14.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Order report for a week, month, quarter, year or date range")
+    parser.add_argument("--period", choices=PERIOD_KINDS, default="month")
+    parser.add_argument("--value", help="2026-W42 / 2026-10 / 2026-Q4 / 2026 (default: current period)")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="custom period start (inclusive)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="custom period end (inclusive)")
+    parser.add_argument("--top", type=int, default=10, help="rows in the customer / product rankings")
+    parser.add_argument("--refresh", action="store_true", help="recompute even if a snapshot exists")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--output", help="also write each table as a CSV file into this directory")
+    args = parser.parse_args()
+
+    try:
+        period = resolve_period(args.period, args.value, args.date_from, args.date_to)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        report, cached = get_order_report(db, period, top=args.top, refresh=args.refresh)
+    finally:
+        db.close()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, cached)
+    if args.output:
+        write_tables(report, args.output)
+
+if __name__ == "__main__":
+    main()
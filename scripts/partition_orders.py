@@ -0,0 +1,129 @@
+"""
+訂單資料表按月分區
+將既有的 orders / order_items 轉換為以 order_date 按月分區的資料表（見 backend/partitions.py），
+並建立未來月份的分區。原資料表改名為 orders_legacy / order_items_legacy 保留，確認無誤後以
+--drop-legacy 刪除。轉換在單一交易中進行，期間會鎖定訂單資料表，請於維護時段執行。
+
+用法：
+    uv run scripts/partition_orders.py                     # 轉換（已分區時只補建未來分區）
+    uv run scripts/partition_orders.py --detach-before 2024-01 --drop   # 移除 2024-01 以前的月份
+    uv run scripts/partition_orders.py --drop-legacy       # 刪除轉換前的舊資料表
+"""
+import sys
+import os
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from backend.database import engine, Base
+from backend.models import Order, OrderItem, OrderNumber
+from backend import partitions
+
+LEGACY_SUFFIX = "_legacy"
+
+def legacy_exists(conn) -> bool:
+    return conn.execute(text("SELECT to_regclass('orders_legacy') IS NOT NULL")).scalar()
+
+def convert(conn, months_ahead: int):
+    """改名舊資料表、建立分區資料表並複製資料（單一交易）"""
+    if legacy_exists(conn):
+        print("❌ orders_legacy 已存在，請先確認或刪除後再轉換")
+        sys.exit(1)
+    conn.execute(text("LOCK TABLE orders, order_items IN ACCESS EXCLUSIVE MODE"))
+    for table in ("order_items", "orders"):
+        # 索引名稱在 schema 內不可重複：舊索引一併改名
+        indexes = conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"
+        ), {"table": table}).scalars().all()
+        for index in indexes:
+            conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index[:56]}{LEGACY_SUFFIX}"'))
+        conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{table}{LEGACY_SUFFIX}"'))
+
+    Base.metadata.create_all(conn, tables=[Order.__table__, OrderItem.__table__, OrderNumber.__table__])
+    now = datetime.now(timezone.utc)
+    first, last = conn.execute(text(
+        "SELECT min(COALESCE(order_date, updated_at, now())), max(COALESCE(order_date, updated_at, now())) FROM orders_legacy"
+    )).one()
+    horizon = partitions.add_months(partitions.month_start(now), months_ahead)
+    created = partitions.ensure_partitions(conn, first or now, max(last or now, horizon))
+    print(f"✓ 建立 {len(created) // 2} 個月份的分區")
+
+    legacy_columns = {
+        table: set(conn.execute(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = :table"
+        ), {"table": f"{table}{LEGACY_SUFFIX}"}).scalars())
+        for table in ("orders", "order_items")
+    }
+    # 分區鍵不可為 NULL：缺少下單時間的訂單以最後更新時間代替
+    order_columns = [c.name for c in Order.__table__.columns if c.name in legacy_columns["orders"]]
+    values = [
+        "COALESCE(order_date, updated_at, now())" if c == "order_date" and "updated_at" in order_columns
+        else "COALESCE(order_date, now())" if c == "order_date" else f'"{c}"'
+        for c in order_columns
+    ]
+    orders = conn.execute(text(
+        f"INSERT INTO orders ({', '.join(order_columns)}) SELECT {', '.join(values)} FROM orders_legacy"
+    )).rowcount
+    print(f"✓ orders: {orders:,} 筆")
+    # 分區後 orders 只能保證 (order_number, order_date) 唯一，編號的全域唯一性改由 order_numbers 維持
+    numbers = conn.execute(text(
+        "INSERT INTO order_numbers (order_number) SELECT order_number FROM orders_legacy ON CONFLICT DO NOTHING"
+    )).rowcount
+    print(f"✓ order_numbers: {numbers:,} 筆")
+
+    item_columns = [
+        c.name for c in OrderItem.__table__.columns
+        if c.name in legacy_columns["order_items"] and c.name != "order_date"
+    ]
+    items = conn.execute(text(
+        f"INSERT INTO order_items ({', '.join(item_columns)}, order_date) "
+        f"SELECT {', '.join('i.' + c for c in item_columns)}, o.order_date "
+        f"FROM order_items_legacy i JOIN orders o ON o.id = i.order_id"
+    )).rowcount
+    print(f"✓ order_items: {items:,} 筆")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert orders / order_items to monthly partitions and manage them")
+    parser.add_argument("--months-ahead", type=int, default=partitions.PARTITION_MONTHS_AHEAD,
+                        help="create partitions this many months ahead")
+    parser.add_argument("--detach-before", metavar="YYYY-MM",
+                        help="detach the partitions of months before this one (retention)")
+    parser.add_argument("--drop", action="store_true", help="with --detach-before: drop the detached partitions")
+    parser.add_argument("--drop-legacy", action="store_true", help="drop orders_legacy / order_items_legacy")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        if args.detach_before:
+            before = datetime.strptime(args.detach_before, "%Y-%m").replace(tzinfo=timezone.utc)
+            removed = partitions.detach_before(conn, before, drop=args.drop)
+            action = "刪除" if args.drop else "卸離"
+            print(f"✓ {action} {len(removed)} 個分區" + (f"：{', '.join(removed)}" if removed else ""))
+            return
+
+        if args.drop_legacy:
+            conn.execute(text("DROP TABLE IF EXISTS order_items_legacy, orders_legacy"))
+            print("✓ 已刪除 orders_legacy / order_items_legacy")
+            return
+
+        if partitions.is_partitioned(conn):
+            horizon = partitions.add_months(partitions.month_start(datetime.now(timezone.utc)), args.months_ahead)
+            created = partitions.ensure_partitions(conn, datetime.now(timezone.utc), horizon)
+            print(f"orders 已分區；新建分區 {len(created)} 個")
+            return
+
+        print("開始轉換 orders / order_items 為按月分區...")
+        convert(conn, args.months_ahead)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE orders"))
+        conn.execute(text("ANALYZE order_items"))
+    print("\n轉換完成！舊資料表保留為 orders_legacy / order_items_legacy")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,80 @@
+"""
+商品、庫存與客戶資料與 Google Sheets 雙向同步
+只處理上次同步後有變動的資料列（資料庫依 updated_at，試算表依每列的 _sync 指紋），
+所有試算表寫入合併為一次 batch update。衝突處理規則見 backend/sheet_sync.py。
+
+用法：
+    uv run scripts/sync_sheets.py
+    uv run scripts/sync_sheets.py --conflict sheet   # 兩邊都改過時以試算表為準
+    uv run scripts/sync_sheets.py --full             # 忽略上次進度，重新比對所有資料
+"""
+import sys
 import os
+import json
+import argparse
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def sync_sheets():
-    """
-    Function to sync data to/from Google Sheets.
-    Module 5 implementation to be added here.
-    """
-    print("Starting Google Sheets sync...")
-    # TODO: Implement Google Sheets API integration
-    print("Sync completed (Simulation).")
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.database import SessionLocal
+from backend.report_sinks import open_google_sheet
+from backend.sheet_sync import sync_sheets, CONFLICT_POLICIES
+
+GOOGLE_CREDENTIALS_PATH = os.path.join("config", "google-credentials.json")
+SYNC_STATE_PATH = os.path.join("config", "sheets_sync_state.json")
+
+def load_state() -> dict:
+    try:
+        with open(SYNC_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state: dict):
+    os.makedirs(os.path.dirname(SYNC_STATE_PATH), exist_ok=True)
+    with open(SYNC_STATE_PATH, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-way delta sync of products, stock and customers with Google Sheets")
+    parser.add_argument("--conflict", choices=CONFLICT_POLICIES, default="db",
+                        help="which side wins when a row changed on both sides (default: db)")
+    parser.add_argument("--full", action="store_true", help="ignore the saved watermarks")
+    args = parser.parse_args()
+
+    spreadsheet_id = os.getenv("SPREADSHEET_ID")
+    if not spreadsheet_id:
+        print("❌ 未設定 SPREADSHEET_ID")
+        sys.exit(1)
+
+    print("開始同步 Google Sheets...")
+    spreadsheet = open_google_sheet(spreadsheet_id, GOOGLE_CREDENTIALS_PATH)
+    db = SessionLocal()
+    try:
+        state, reports = sync_sheets(
+            db, spreadsheet, None if args.full else load_state(), policy=args.conflict
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    save_state(state)
+
+    for name, report in reports.items():
+        print(
+            f"{name}: 寫入試算表 {report.pushed}  更新資料庫 {report.pulled}  "
+            f"新增 {report.inserted}  衝突 {len(report.conflicts)}  錯誤 {len(report.errors)}"
+        )
+        for conflict in report.conflicts:
+            winner = "資料庫" if conflict["winner"] == "db" else "試算表"
+            print(f"  第 {conflict['row']} 列 ({conflict['id']}) 兩邊都有修改，以{winner}為準")
+        for error in report.errors:
+            print(f"  第 {error['row']} 列: {error['reason']}")
+    print("同步完成")
 
 if __name__ == "__main__":
-    sync_sheets()
+    main()
@@ -0,0 +1,122 @@
+"""
+Archiving closed orders (backend/archive.py) moves them out of the live
+tables; period reports and order exports must not change because of it.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import archive, reports
+from backend.auth import dependencies
+from backend.models import ArchivedOrder, Order, OrderItem, Product, User
+
+@pytest.fixture
+def orders(db):
+    now = datetime.now(timezone.utc)
+    buyer = User(username="buyer", email="buyer@example.com", password_hash="x", company_name="Buyer", role="customer")
+    staff = User(username="staff", email="staff@example.com", password_hash="x", company_name="", role="admin")
+    pen = Product(name="Pen", price=Decimal("10.00"), stock=100)
+    paper = Product(name="Paper", price=Decimal("3.50"), stock=100)
+    db.add_all([buyer, staff, pen, paper])
+    db.flush()
+    placed = [
+        # (user, status, items as (product, quantity))
+        (buyer, "completed", [(pen, 2), (paper, 4)]),
+        (buyer, "cancelled", [(pen, 5)]),
+        (staff, "completed", [(paper, 1)]),
+        (staff, "pending", [(pen, 1)]),
+        (buyer, "completed", []),
+    ]
+    for number, (user, status, items) in enumerate(placed):
+        order_date = now - timedelta(minutes=number + 1)
+        order = Order(
+            order_number=f"ORD-{number}", user_id=user.id, order_date=order_date, status=status,
+            total_amount=sum(product.price * quantity for product, quantity in items), delivery_address="Taipei"
+        )
+        db.add(order)
+        db.flush()
+        db.add_all([
+            OrderItem(order_id=order.id, order_date=order_date, product_id=product.id, quantity=quantity,
+                      unit_price=product.price, subtotal=product.price * quantity)
+            for product, quantity in items
+        ])
+    db.commit()
+    return {"buyer": buyer, "staff": staff}
+
+def archive_all(db) -> int:
+    # A cutoff in the future archives every closed order
+    moved = archive.archive_batch(db, datetime.now(timezone.utc) + timedelta(days=1))
+    assert db.query(ArchivedOrder).count() == moved
+    return moved
+
+def report(db):
+    today = datetime.now(reports.REPORT_TIMEZONE).date()
+    period = reports.resolve_period("custom", date_from=today - timedelta(days=1), date_to=today)
+    payload = reports.build_order_report(db, period)
+    del payload["generated_at"]
+    return payload
+
+def as_user(user, path, **params):
+    from backend.main import app
+    app.dependency_overrides[dependencies.get_current_active_user] = lambda: user
+    try:
+        response = TestClient(app).get(path, params=params)
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    return response
+
+def export(staff, **params):
+    response = as_user(staff, "/orders/export", format="ndjson", **params)
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_report_includes_archived_orders(db, orders):
+    before = report(db)
+
+    assert archive_all(db) == 4
+    after = report(db)
+
+    assert after == before
+    assert (after["total_orders"], after["revenue_orders"], after["revenue"]) == (5, 4, 47.5)
+    # The cancelled order's pen is not revenue
+    assert [(p["name"], p["quantity"], p["amount"]) for p in after["top_products_by_quantity"]] == [
+        ("Paper", 5, 17.5), ("Pen", 3, 30.0)
+    ]
+
+def test_export_includes_archived_orders(db, orders):
+    staff = orders["staff"]
+    key = lambda row: (row["order_date"], row["order_number"], row["product_id"] or "")
+    before = export(staff)
+
+    archive_all(db)
+    after = export(staff)
+
+    assert sorted(after, key=key) == sorted(before, key=key)
+    # Oldest first, live and archived rows merged
+    numbers = [row["order_number"] for row in after]
+    assert sorted(set(numbers), key=numbers.index) == ["ORD-4", "ORD-3", "ORD-2", "ORD-1", "ORD-0"]
+    # One row per item; an order without items still has its row
+    assert len(after) == 6
+    assert [row for row in after if row["order_number"] == "ORD-4"][0]["product_id"] is None
+    assert {row["order_number"] for row in export(staff, status="cancelled")} == {"ORD-1"}
+
+def test_archived_orders_are_paged(db, orders):
+    buyer = orders["buyer"]
+    archive_all(db)
+
+    pages, cursor = [], None
+    while True:
+        response = as_user(buyer, "/orders/my-orders/archived", limit=2, fields="order_number", **(
+            {"cursor": cursor} if cursor else {}
+        ))
+        pages.append([order["order_number"] for order in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Newest first; all of the buyer's orders were closed, none is left live
+    assert pages == [["ORD-0", "ORD-1"], ["ORD-4"]]
+    assert [order["order_number"] for order in as_user(buyer, "/orders/my-orders").json()] == []
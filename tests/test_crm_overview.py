@@ -0,0 +1,46 @@
+"""
+GET /crm/customers/{id}/overview returns only the selected sections, each
+shaped exactly like its own response model (null fields included).
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.auth import dependencies, schemas
+from backend.models import Customer, Interaction, User
+
+@pytest.fixture
+def customer(db):
+    staff = User(username="staff", email="staff@example.com", password_hash="x", company_name="OrderFlow", role="admin")
+    # A prospect: no account, no orders, most contact fields empty
+    customer = Customer(company_name="Lead Co", contact_person="Lin")
+    db.add_all([staff, customer])
+    db.flush()
+    db.add(Interaction(customer_id=customer.id, interaction_type="電話", content="First call", recorded_by="staff"))
+    db.commit()
+    return {"staff": staff, "customer": customer}
+
+def overview(staff, customer_id, **params):
+    from backend.main import app
+    app.dependency_overrides[dependencies.get_current_active_user] = lambda: staff
+    try:
+        response = TestClient(app).get(f"/crm/customers/{customer_id}/overview", params=params)
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    return response.json()
+
+def test_selected_sections_keep_null_fields(db, customer):
+    payload = overview(customer["staff"], customer["customer"].id, fields="customer,interactions,stats")
+
+    assert set(payload) == {"customer", "interactions", "stats"}
+    assert set(payload["customer"]) == set(schemas.CustomerResponse.model_fields)
+    assert payload["customer"]["phone"] is None and payload["customer"]["last_order_date"] is None
+    assert set(payload["interactions"][0]) == set(schemas.InteractionResponse.model_fields)
+    assert payload["interactions"][0]["next_action"] is None
+    assert payload["stats"]["first_order_date"] is None
+
+def test_all_sections_by_default(db, customer):
+    payload = overview(customer["staff"], customer["customer"].id)
+
+    assert set(payload) == set(schemas.CustomerOverviewResponse.model_fields)
+    assert payload["orders"] == [] and payload["open_actions"] == []
@@ -0,0 +1,209 @@
+"""
+Weekly order export (scripts/export_orders_to_gsheet.py) into the in-memory
+FakeSpreadsheet: a full run rewrites the report, later runs send only the
+orders changed since the previous run's watermark.
+"""
+import importlib.util
+import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from sqlalchemy import event
+
+from backend import archive
+from backend.models import Order, OrderItem, Product, User
+from backend.report_sinks import FakeSpreadsheet, GoogleSheetsSink, LocalFileSink
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "export_orders_to_gsheet.py")
+spec = importlib.util.spec_from_file_location("export_orders_to_gsheet", SCRIPT)
+export = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(export)
+
+ORDER_COUNT = 300
+
+@pytest.fixture
+def week():
+    now = datetime.now(timezone.utc)
+    return now - timedelta(days=1), now + timedelta(days=1)
+
+@pytest.fixture
+def seeded(db, week):
+    """ORDER_COUNT orders of one customer, last changed 2 minutes apart from an hour ago."""
+    now = datetime.now(timezone.utc)
+    buyer = User(username="buyer", email="buyer@example.com", password_hash="x", company_name="Buyer", role="customer")
+    pen = Product(name="Pen", price=Decimal("10.00"), stock=100)
+    paper = Product(name="Paper", price=Decimal("3.50"), stock=100)
+    db.add_all([buyer, pen, paper])
+    db.flush()
+    orders = []
+    for number in range(ORDER_COUNT):
+        order_date = now - timedelta(minutes=2 * (number + 1))
+        order = Order(
+            order_number=f"ORD-{number:04d}", user_id=buyer.id, order_date=order_date, status="pending",
+            total_amount=Decimal("13.50"), delivery_address="Taipei", updated_at=order_date - timedelta(hours=1)
+        )
+        # Item ids fix the order of the product list
+        order.items = [
+            OrderItem(id=f"item-{number:04d}-{line}", order_date=order_date, product_id=product.id,
+                      quantity=1, unit_price=product.price, subtotal=product.price)
+            for line, product in enumerate((pen, paper))
+        ]
+        orders.append(order)
+    db.add_all(orders)
+    db.commit()
+    return {"buyer": buyer, "orders": orders}
+
+def summary_rows(spreadsheet):
+    cells = spreadsheet.sheets[export.SHEET_NAME_SUMMARY].cells
+    return {values[0]: values for row_no, values in cells.items() if row_no > 1}
+
+def stats_rows(db, week):
+    return len(export.format_stats_data(export.get_weekly_stats(db, *week)))
+
+def test_full_then_delta_export_batches_writes(db, seeded, week):
+    spreadsheet = FakeSpreadsheet("report")
+    sink = GoogleSheetsSink(spreadsheet, empty_placeholder=export.NO_ORDERS_PLACEHOLDER)
+
+    state, exported = export.export_weekly_orders(db, sink, week=week)
+
+    assert exported == ORDER_COUNT
+    rows = summary_rows(spreadsheet)
+    assert len(rows) == ORDER_COUNT
+    assert rows["ORD-0000"][2:] == ["Buyer", "Pen, Paper", 13.5, "pending"]
+    # One clear and one update for both sheets, whatever the number of rows
+    assert spreadsheet.call_count("values_batch_clear") == 1
+    assert spreadsheet.call_count("values_batch_update") == 1
+    assert spreadsheet.rows_written == 1 + ORDER_COUNT + 1 + stats_rows(db, week)
+
+    # Change three orders and place two new ones
+    for order in seeded["orders"][:3]:
+        order.status = "shipped"
+    for number in range(ORDER_COUNT, ORDER_COUNT + 2):
+        db.add(Order(
+            order_number=f"ORD-{number:04d}", user_id=seeded["buyer"].id, status="pending",
+            total_amount=Decimal("0.00"), delivery_address="Taipei"
+        ))
+    db.commit()
+    spreadsheet.calls.clear()
+    spreadsheet.rows_written = 0
+
+    state, exported = export.export_weekly_orders(db, sink, state, week=week)
+
+    assert exported == 5
+    rows = summary_rows(spreadsheet)
+    assert len(rows) == ORDER_COUNT + 2
+    assert [rows[f"ORD-{n:04d}"][5] for n in range(4)] == ["shipped"] * 3 + ["pending"]
+    assert rows[f"ORD-{ORDER_COUNT + 1:04d}"][3] == ""
+    # The delta reads the key column once and still writes in one batch
+    assert spreadsheet.call_count("col_values") == 1
+    assert spreadsheet.call_count("values_batch_clear") == 1
+    assert spreadsheet.call_count("values_batch_update") == 1
+    assert spreadsheet.rows_written == 3 + 2 + 1 + stats_rows(db, week)
+
+@pytest.fixture
+def exported(db, seeded, week):
+    """A GoogleSheetsSink after a full run, and that run's state."""
+    spreadsheet = FakeSpreadsheet("report")
+    sink = GoogleSheetsSink(spreadsheet, empty_placeholder=export.NO_ORDERS_PLACEHOLDER)
+    state, _ = export.export_weekly_orders(db, sink, week=week)
+    spreadsheet.calls.clear()
+    return sink, state
+
+def watermark_of(order):
+    return [order.updated_at.isoformat(), order.id]
+
+def test_full_run_starts_the_watermark(db, seeded, exported):
+    sink, state = exported
+
+    newest = seeded["orders"][0]
+    assert state["target"] == "gsheet:report"
+    assert state["watermark"] == watermark_of(newest)
+    # The newest three orders fall in the next run's overlap window
+    assert state["recent"] == [watermark_of(order) for order in reversed(seeded["orders"][:3])]
+
+@pytest.mark.parametrize("change", ["week", "target"])
+def test_new_week_or_target_rewrites_everything(db, seeded, exported, week, tmp_path, change):
+    sink, state = exported
+    if change == "week":
+        week = (week[0] - timedelta(days=7), week[1])
+    else:
+        sink = LocalFileSink(str(tmp_path))
+
+    state, count = export.export_weekly_orders(db, sink, state, week=week)
+
+    assert count == ORDER_COUNT
+    assert state["week_start"] == week[0].isoformat() and state["target"] == sink.target
+    if change == "week":
+        assert sink.spreadsheet.call_count("col_values") == 0
+        assert sink.spreadsheet.call_count("values_batch_clear") == 1
+    else:
+        assert len(sink.read(export.SHEET_NAME_SUMMARY)[1]) == ORDER_COUNT
+
+def test_nothing_changed_returns_early(db, exported, week):
+    sink, state = exported
+
+    assert export.export_weekly_orders(db, sink, state, week=week) == (state, 0)
+    assert sink.spreadsheet.calls == []
+
+def test_late_commit_inside_overlap_is_exported(db, seeded, exported, week):
+    sink, state = exported
+    watermark = datetime.fromisoformat(state["watermark"][0])
+    # Committed after the last run but stamped before its watermark, as a slow
+    # transaction would be: inside the overlap window it is still picked up
+    late, old = seeded["orders"][10], seeded["orders"][11]
+    late.status, late.updated_at = "shipped", watermark - export.WATERMARK_OVERLAP + timedelta(minutes=1)
+    old.status, old.updated_at = "shipped", watermark - export.WATERMARK_OVERLAP - timedelta(minutes=1)
+    db.commit()
+
+    state, count = export.export_weekly_orders(db, sink, state, week=week)
+
+    assert count == 1
+    rows = summary_rows(sink.spreadsheet)
+    assert (rows[late.order_number][5], rows[old.order_number][5]) == ("shipped", "pending")
+    # Older than the watermark: it stays where it was
+    assert state["watermark"] == watermark_of(seeded["orders"][0])
+    assert watermark_of(late) in state["recent"]
+    # Exported once, then skipped until it changes again
+    assert export.export_weekly_orders(db, sink, state, week=week) == (state, 0)
+
+def test_watermark_advances_to_the_newest_change(db, seeded, exported, week):
+    sink, state = exported
+    changed = seeded["orders"][50]
+    changed.status = "shipped"
+    db.commit()
+
+    state, count = export.export_weekly_orders(db, sink, state, week=week)
+
+    assert count == 1
+    assert state["watermark"] == watermark_of(changed)
+    # The previous overlap rows are now far behind the watermark
+    assert state["recent"] == [watermark_of(changed)]
+    assert export.export_weekly_orders(db, sink, state, week=week) == (state, 0)
+
+def test_archived_orders_are_fetched_in_the_same_query(db, seeded, week, database):
+    for order in seeded["orders"][:5]:
+        order.status = "completed"
+    db.commit()
+    assert archive.archive_batch(db, datetime.now(timezone.utc)) == 5
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database, "before_cursor_execute", record)
+    try:
+        orders = export.get_weekly_orders(db, *week)
+    finally:
+        event.remove(database, "before_cursor_execute", record)
+
+    assert len(statements) == 1
+    assert len(orders) == ORDER_COUNT
+    by_number = {order.order_number: order for order in orders}
+    # Archived orders keep their customer and product list
+    assert [by_number[f"ORD-{n:04d}"].status for n in range(6)] == ["completed"] * 5 + ["pending"]
+    assert all(by_number[f"ORD-{n:04d}"].items == "Pen, Paper" for n in range(6))
+    assert by_number["ORD-0000"].customer_name == "Buyer"
+    # Sorted by order date across both tables
+    assert [order.order_date for order in orders] == sorted(order.order_date for order in orders)
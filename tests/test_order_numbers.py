@@ -0,0 +1,48 @@
+"""
+orders is partitioned by order_date, so its unique key includes the date;
+order numbers stay unique across all orders through order_numbers.
+"""
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+from backend.auth import dependencies
+from backend.models import Order, OrderNumber, Product, User
+from backend.routers import orders as orders_router
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return datetime(2026, 10, 1, 12, 0, 0)
+
+def test_order_number_is_never_issued_twice(db, monkeypatch):
+    from backend.main import app
+    buyer = User(username="buyer", email="buyer@example.com", password_hash="x", company_name="Buyer", role="customer")
+    pen = Product(name="Pen", price=Decimal("10.00"), stock=10)
+    db.add_all([buyer, pen])
+    db.commit()
+    # Same second, same random suffix: the number create_order builds repeats
+    monkeypatch.setattr(orders_router, "datetime", FrozenDatetime)
+    monkeypatch.setattr(orders_router, "uuid", SimpleNamespace(uuid4=lambda: uuid.UUID(int=0xABCD << 112)))
+    payload = {"items": [{"product_id": pen.id, "quantity": 1}], "delivery_address": "Taipei"}
+
+    app.dependency_overrides[dependencies.get_current_active_user] = lambda: buyer
+    try:
+        client = TestClient(app)
+        first = client.post("/orders/", json=payload)
+        assert first.status_code == 201
+        assert first.json()["order_number"] == "ORD-20261001120000-ABCD"
+        with pytest.raises(IntegrityError):
+            client.post("/orders/", json=payload)
+    finally:
+        app.dependency_overrides.clear()
+
+    db.expire_all()
+    assert db.query(Order).count() == 1
+    assert db.query(OrderNumber).count() == 1
+    assert db.get(Product, pen.id).stock == 9
@@ -0,0 +1,131 @@
+"""
+Queries bounded by order_date read only the monthly partitions of orders /
+order_items they need (backend/partitions.py). Every statement the code
+under test runs is captured and re-planned with EXPLAIN, with the same
+parameters, to list the partitions the executor would scan.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend import partitions, reports
+from backend.auth import dependencies
+from backend.models import Order, OrderItem, Product, User
+from backend.serialization import serialize_orders
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def scanned_partitions(engine, statement, parameters) -> set:
+    """orders / order_items partitions in the statement's plan."""
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    relations = set()
+
+    def walk(node):
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return {name for name in relations if name.startswith(("orders_p", "order_items_p"))}
+
+def month_partitions(start: datetime, end: datetime) -> set:
+    """Partitions of both tables for the months overlapping [start, end)."""
+    names = set()
+    month = partitions.month_start(start)
+    while month < end:
+        names |= {partitions.partition_name(table, month) for table in partitions.PARTITIONED_TABLES}
+        month = partitions.add_months(month, 1)
+    return names
+
+def assert_pruned(engine, statements, expected):
+    bounded = [(s, p) for s, p in statements if "order_date >=" in s or "order_date IN" in s]
+    assert bounded, "no statement bounded order_date"
+    for statement, parameters in bounded:
+        scanned = scanned_partitions(engine, statement, parameters)
+        assert scanned and scanned <= expected, f"read {sorted(scanned)} for:\n{statement}"
+    return bounded
+
+@pytest.fixture
+def orders(db, database):
+    now = datetime.now(timezone.utc)
+    this_month = partitions.month_start(now)
+    # Months on both sides, so reading them would show up in the plans
+    with database.begin() as conn:
+        partitions.ensure_partitions(conn, partitions.add_months(this_month, -3), partitions.add_months(this_month, 3))
+
+    user = User(username="buyer", email="buyer@example.com", password_hash="x", company_name="Buyer", role="admin")
+    product = Product(name="Pen", price=Decimal("10.00"), stock=100)
+    db.add_all([user, product])
+    db.flush()
+    for order_date in (partitions.add_months(this_month, -1) + timedelta(days=3), now, partitions.add_months(this_month, 1)):
+        order = Order(
+            order_number=f"ORD-{order_date:%Y%m%d}", user_id=user.id, order_date=order_date,
+            status="completed", total_amount=Decimal("20.00"), delivery_address="Taipei"
+        )
+        db.add(order)
+        db.flush()
+        db.add(OrderItem(
+            order_id=order.id, order_date=order_date, product_id=product.id,
+            quantity=2, unit_price=Decimal("10.00"), subtotal=Decimal("20.00")
+        ))
+    db.commit()
+    with database.connect() as conn:
+        conn.exec_driver_sql("ANALYZE orders, order_items")
+    return {"user": user, "month": this_month}
+
+def test_dashboard_month_reads_one_month(database, db, orders):
+    from backend.main import app
+    user = orders["user"]
+    app.dependency_overrides[dependencies.get_current_active_user] = lambda: user
+    try:
+        with captured_statements(database) as statements:
+            response = TestClient(app).get("/dashboard/stats")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["this_month_orders"] == 1
+    month = orders["month"]
+    bounded = assert_pruned(database, statements, month_partitions(month, partitions.add_months(month, 1)))
+    assert len(bounded) == 2  # count and amount
+
+def test_report_period_reads_its_months(database, db, orders):
+    period = reports.resolve_period("month")
+
+    with captured_statements(database) as statements:
+        reports.build_order_report(db, period)
+
+    # Report months are local; they can straddle two UTC partitions
+    bounded = assert_pruned(database, statements, month_partitions(period.start, period.end))
+    assert len(bounded) == 4  # by status, by customer, top products x2
+
+def test_serialization_item_lookup_reads_one_month(database, db, orders):
+    month = orders["month"]
+    end = partitions.add_months(month, 1)
+    query = db.query(Order).filter(Order.order_date >= month, Order.order_date < end)
+
+    with captured_statements(database) as statements:
+        serialized = serialize_orders(db, query)
+
+    assert len(serialized) == 1 and len(serialized[0]["items"]) == 1
+    items = [(s, p) for s, p in statements if "FROM order_items" in s]
+    assert len(items) == 1
+    assert scanned_partitions(database, *items[0]) == {partitions.partition_name("order_items", month)}
+    assert_pruned(database, statements, month_partitions(month, end))
@@ -0,0 +1,67 @@
+"""
+Bulk product import (backend/product_import.py): rows are validated while
+streaming, existing products are updated field by field and new ones inserted.
+"""
+import io
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from backend.database import SessionLocal
+from backend.models import Product
+from backend.product_import import import_products
+
+@pytest.fixture
+def pen(db):
+    product = Product(id="pen", name="Pen", description="Blue", price=Decimal("10.00"), stock=10, category="Office")
+    db.add(product)
+    db.commit()
+    return product
+
+def run_import(db, content, fmt="csv"):
+    result = import_products(db, io.StringIO(content), fmt)
+    db.commit()
+    db.expire_all()
+    return result.to_dict()
+
+def test_rows_update_and_insert(db, pen):
+    result = run_import(db, (
+        "id,name,description,price,stock,category,is_active\n"
+        "pen,,,12.5,,,\n"
+        ",Stapler,,99.90,3,Office,yes\n"
+        "ink,Ink,,,,,\n"
+        "pen,,,1e8,,,\n"
+        "pen,,,,99999999999,,\n"
+    ))
+
+    assert (result["updated"], result["inserted"], result["rejected"]) == (1, 1, 3)
+    assert [error["reason"] for error in result["errors"]] == [
+        "price must be less than 100000000",
+        "stock must not exceed 2147483647",
+        "new product requires name and price",
+    ]
+    # Blank fields keep the stored values
+    assert (pen.name, pen.description, pen.price, pen.stock) == ("Pen", "Blue", Decimal("12.50"), 10)
+    stapler = db.query(Product).filter(Product.name == "Stapler").one()
+    assert (stapler.price, stapler.stock, stapler.is_active) == (Decimal("99.90"), 3, True)
+
+def test_price_update_keeps_concurrent_stock_change(db, pen):
+    # An order decrements the stock and commits while the import waits for the row
+    order = SessionLocal()
+    order.execute(text("UPDATE products SET stock = stock - 1 WHERE id = 'pen'"))
+    results = []
+    importer = threading.Thread(target=lambda: results.append(run_import(db, "id,price\npen,11\n")))
+    importer.start()
+    try:
+        time.sleep(0.5)
+        assert importer.is_alive(), "the import did not wait for the order's row lock"
+        order.commit()
+    finally:
+        order.close()
+        importer.join(timeout=10)
+
+    assert results[0]["updated"] == 1
+    assert (pen.price, pen.stock) == (Decimal("11.00"), 9)
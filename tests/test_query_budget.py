@@ -0,0 +1,75 @@
+"""
+Query budgets (backend/query_budget.py) are enforced in tests: conftest sets
+QUERY_BUDGET_MODE=raise, so a route or job over its budget, or issuing N+1
+queries, fails instead of logging a warning.
+"""
+import os
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import crm_engine
+from backend.auth import dependencies
+from backend.models import Customer, Order, User
+from backend.query_budget import QueryBudgetExceeded, track_queries
+from backend.routers import orders
+
+CRM_RULES = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "crm_rules.json")
+
+@pytest.fixture
+def client():
+    from backend.main import app
+    yield app, TestClient(app)
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def accounts(db):
+    """An admin, and customers with completed orders: some linked, some to import."""
+    admin = User(username="admin", email="admin@example.com", password_hash="x", company_name="", role="admin")
+    db.add(admin)
+    for number in range(20):
+        user = User(username=f"buyer{number}", email=f"buyer{number}@example.com", password_hash="x",
+                    company_name=f"Buyer {number}", role="customer")
+        db.add(user)
+        db.flush()
+        db.add(Order(order_number=f"ORD-{number}", user_id=user.id, status="completed",
+                     total_amount=Decimal(1000 * number), delivery_address="Taipei"))
+        if number % 2:
+            db.add(Customer(company_name=user.company_name, email=user.email))
+    db.commit()
+    return {"admin": admin}
+
+def test_route_over_budget_fails(db, accounts, client, monkeypatch):
+    app, http = client
+    app.dependency_overrides[dependencies.get_current_active_user] = lambda: accounts["admin"]
+
+    assert http.get("/orders/my-orders/archived").status_code == 200
+
+    monkeypatch.setattr(orders.read_my_archived_orders, "__query_budget__", 1)
+    with pytest.raises(QueryBudgetExceeded, match=r"GET /orders/my-orders/archived: 2 queries, budget 1"):
+        http.get("/orders/my-orders/archived")
+
+def test_grade_recalculation_stays_within_budget(db, accounts, client, monkeypatch):
+    monkeypatch.setattr(crm_engine, "CONFIG_PATH", CRM_RULES)
+    app, http = client
+    app.dependency_overrides[dependencies.get_current_active_user] = lambda: accounts["admin"]
+
+    response = http.post("/crm/recalculate-grades")
+
+    assert response.status_code == 200
+    assert db.query(Customer).filter(Customer.user_id.isnot(None)).count() == 20
+
+def test_tracked_job_counts_toward_the_enclosing_scope(db, accounts):
+    with pytest.raises(QueryBudgetExceeded, match="outer: 4 queries, budget 3"):
+        with track_queries("outer", budget=3):
+            with track_queries("inner", budget=4) as inner:
+                for _ in range(4):
+                    db.query(User).first()
+    assert inner.count == 4
+
+def test_repeated_statement_is_reported_as_n_plus_one(db, accounts):
+    with pytest.raises(QueryBudgetExceeded, match=r"20x SELECT .* FROM orders"):
+        with track_queries("lazy loads"):
+            for user in db.query(User).filter(User.role == "customer").all():
+                assert len(user.orders) == 1
@@ -0,0 +1,130 @@
+"""
+The fast serialization path must produce exactly what the response models
+would: same fields, same order-independent values, same datetime / float
+rendering, with orjson and with the stdlib fallback.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from backend import archive, serialization
+from backend.auth import schemas
+from backend.models import ArchivedOrder, Customer, Order, OrderItem, Product, User
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        if serialization.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+def encoded(payload):
+    """What a client receives from a FastJSONResponse."""
+    return json.loads(serialization.dumps(payload))
+
+def expected(model, objects):
+    return [model.model_validate(obj).model_dump(mode="json") for obj in objects]
+
+def by_product(order):
+    return {**order, "items": sorted(order["items"], key=lambda item: item["product_id"])}
+
+@pytest.fixture
+def data(db):
+    # UTC session: datetimes come back with a zero offset and render as "Z"
+    db.execute(text("SET TIME ZONE 'UTC'"))
+    placed = datetime.now(timezone.utc).replace(microsecond=123456)
+    user = User(
+        username="buyer", email="buyer@example.com", password_hash="x",
+        company_name="Buyer Ltd", role="customer", is_active=True
+    )
+    staff = User(
+        username="staff", email="staff@example.com", password_hash="x",
+        company_name="OrderFlow", role="admin", is_active=False
+    )
+    pen = Product(name="Pen", description=None, price=Decimal("12.50"), stock=10, category=None, is_active=True)
+    paper = Product(name="Paper", description="A4", price=Decimal("3.99"), stock=0, category="Office", is_active=False)
+    db.add_all([user, staff, pen, paper])
+    db.flush()
+    order = Order(
+        order_number="ORD-1", user_id=user.id, order_date=placed, status="completed",
+        total_amount=Decimal("28.99"), delivery_address="Taipei", notes=None
+    )
+    other = Order(
+        order_number="ORD-2", user_id=staff.id, order_date=placed - timedelta(days=1), status="pending",
+        total_amount=Decimal("3.99"), delivery_address="Tainan", notes="Leave at the door"
+    )
+    db.add_all([order, other])
+    db.flush()
+    db.add_all([
+        OrderItem(order_id=order.id, order_date=order.order_date, product_id=pen.id,
+                  quantity=2, unit_price=Decimal("12.50"), subtotal=Decimal("25.00")),
+        OrderItem(order_id=order.id, order_date=order.order_date, product_id=paper.id,
+                  quantity=1, unit_price=Decimal("3.99"), subtotal=Decimal("3.99")),
+        OrderItem(order_id=other.id, order_date=other.order_date, product_id=paper.id,
+                  quantity=1, unit_price=Decimal("3.99"), subtotal=Decimal("3.99")),
+        Customer(
+            user_id=user.id, company_name="Buyer Ltd", contact_person="Lin", phone=None,
+            email=None, address=None, industry="Retail", source=None, grade="C",
+            total_orders=0, total_amount=Decimal("0"), last_order_date=None
+        ),
+        Customer(
+            user_id=staff.id, company_name="Staff Co", contact_person="Wang", phone="02-1234",
+            email="co@example.com", address="Taipei", industry=None, source="web", grade="A",
+            total_orders=3, total_amount=Decimal("1234.56"), last_order_date=placed
+        ),
+    ])
+    db.commit()
+    return {"user": user}
+
+def test_orders_match_order_response(db, data, encoder):
+    orders = db.query(Order).order_by(Order.order_number).all()
+    query = db.query(Order).order_by(Order.order_number)
+
+    actual = encoded(serialization.serialize_orders(db, query))
+
+    assert [by_product(o) for o in actual] == [by_product(o) for o in expected(schemas.OrderResponse, orders)]
+    assert actual[0]["notes"] is None
+    assert actual[0]["order_date"].endswith("Z")
+
+def test_archived_orders_match_order_response(db, data, encoder):
+    live = db.query(Order).filter(Order.status == "completed").all()
+    before = expected(schemas.OrderResponse, live)
+
+    # A cutoff in the future archives today's completed order
+    assert archive.archive_batch(db, datetime.now(timezone.utc) + timedelta(days=1)) == 1
+    db.execute(text("SET TIME ZONE 'UTC'"))
+    actual = encoded(serialization.serialize_archived_orders(db, db.query(ArchivedOrder)))
+
+    assert [by_product(o) for o in actual] == [by_product(o) for o in before]
+
+def test_users_match_user_response(db, data, encoder):
+    query = db.query(User).order_by(User.username)
+
+    actual = encoded(serialization.serialize_rows(query, serialization.USER_FIELDS))
+
+    assert actual == expected(schemas.UserResponse, query.all())
+    assert actual[0]["created_at"].endswith("Z")
+
+def test_customers_match_customer_response(db, data, encoder):
+    query = db.query(Customer).order_by(Customer.company_name)
+
+    actual = encoded(serialization.serialize_rows(query, serialization.CUSTOMER_FIELDS))
+
+    assert actual == expected(schemas.CustomerResponse, query.all())
+    assert actual[0]["phone"] is None and actual[0]["last_order_date"] is None
+    assert actual[1]["last_order_date"].endswith("Z")
+
+def test_current_user_dict_matches_query(db, data, encoder):
+    # read_my_orders passes the loaded user instead of looking it up
+    user = data["user"]
+    query = db.query(Order).filter(Order.user_id == user.id)
+    supplied = serialization.serialize_orders(
+        db, query, users={user.id: serialization.serialize_object(user, serialization.USER_FIELDS)}
+    )
+
+    assert encoded(supplied) == encoded(serialization.serialize_orders(db, query))
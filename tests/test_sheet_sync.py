@@ -0,0 +1,167 @@
+"""
+Two-way sheet sync (backend/sheet_sync.py) against the in-memory
+FakeSpreadsheet: one batched read and at most one batched write per run.
+"""
+from decimal import Decimal
+
+import pytest
+
+from backend.models import Customer, Product
+from backend.report_sinks import FakeSpreadsheet
+from backend.sheet_sync import SYNC_COLUMN, SYNC_TABLES, sync_sheets
+
+TABLES = {table.name: table for table in SYNC_TABLES}
+
+def sheet_rows(spreadsheet, name):
+    """Data rows of a synced sheet as {row_no: {header: value}}."""
+    table = TABLES[name]
+    cells = spreadsheet.sheets[table.title].cells
+    return {
+        row_no: dict(zip(table.headers, values))
+        for row_no, values in cells.items() if row_no > 1
+    }
+
+def row_of(spreadsheet, name, key):
+    for row_no, row in sheet_rows(spreadsheet, name).items():
+        if row["id"] == key:
+            return row_no, row
+    raise AssertionError(f"{key} not in sheet {name}")
+
+def edit(spreadsheet, name, key, header, value):
+    table = TABLES[name]
+    row_no, _ = row_of(spreadsheet, name, key)
+    spreadsheet.sheets[table.title].cells[row_no][table.headers.index(header)] = value
+
+def append(spreadsheet, name, values):
+    table = TABLES[name]
+    cells = spreadsheet.sheets[table.title].cells
+    cells[max(cells) + 1] = [values.get(header, "") for header in table.headers]
+
+class Sync:
+    """Runs sync_sheets, carrying the state between runs and counting API calls per run."""
+
+    def __init__(self, db, spreadsheet):
+        self.db = db
+        self.spreadsheet = spreadsheet
+        self.state = None
+
+    def __call__(self, policy="db"):
+        self.spreadsheet.calls.clear()
+        self.state, reports = sync_sheets(self.db, self.spreadsheet, self.state, policy=policy)
+        self.db.expire_all()
+        return {name: report.to_dict() for name, report in reports.items()}
+
+    def calls(self, method):
+        return self.spreadsheet.call_count(method)
+
+@pytest.fixture
+def products(db):
+    pen = Product(name="Pen", description=None, price=Decimal("12.50"), stock=10, category="Office", is_active=True)
+    paper = Product(name="Paper", description="A4", price=Decimal("3.99"), stock=0, category="Office", is_active=False)
+    customer = Customer(company_name="Buyer Ltd", contact_person="Lin", email="buyer@example.com")
+    db.add_all([pen, paper, customer])
+    db.commit()
+    return {"pen": pen, "paper": paper, "customer": customer}
+
+@pytest.fixture
+def sync(db, products):
+    run = Sync(db, FakeSpreadsheet("sheet"))
+    run()
+    return run
+
+def test_first_sync_writes_every_row(db, products):
+    spreadsheet = FakeSpreadsheet("sheet")
+    reports = Sync(db, spreadsheet)()
+
+    assert [reports[name]["pushed"] for name in ("products", "stock", "customers")] == [2, 2, 1]
+    for name, table in TABLES.items():
+        assert spreadsheet.sheets[table.title].cells[1] == table.headers
+    _, pen = row_of(spreadsheet, "products", products["pen"].id)
+    assert pen["名稱"] == "Pen" and pen["價格"] == 12.5 and pen["描述"] == "" and pen[SYNC_COLUMN]
+    _, stock = row_of(spreadsheet, "stock", products["paper"].id)
+    assert stock["庫存"] == 0
+    assert spreadsheet.call_count("values_batch_get") == 1
+    assert spreadsheet.call_count("values_batch_update") == 1
+
+def test_idle_rerun_pushes_nothing(sync):
+    reports = sync()
+
+    assert all(r["pushed"] == r["pulled"] == r["inserted"] == 0 for r in reports.values())
+    assert all(not r["conflicts"] and not r["errors"] for r in reports.values())
+    assert sync.calls("values_batch_get") == 1
+    assert sync.calls("values_batch_update") == 0
+
+def test_sheet_edit_is_pulled(db, products, sync):
+    pen = products["pen"]
+    edit(sync.spreadsheet, "products", pen.id, "價格", 15)
+    edit(sync.spreadsheet, "stock", pen.id, "庫存", 42)
+
+    reports = sync()
+
+    assert reports["products"]["pulled"] == 1 and reports["stock"]["pulled"] == 1
+    assert (pen.price, pen.stock) == (Decimal("15.00"), 42)
+    assert sync.calls("values_batch_get") == 1
+    assert sync.calls("values_batch_update") == 1
+    # The rows' fingerprints now match: the next run has nothing to do
+    assert all(r["pulled"] == r["pushed"] == 0 for r in sync().values())
+
+@pytest.mark.parametrize("policy, winner", [("db", "Pen (DB)"), ("sheet", "Pen (sheet)")])
+def test_conflict_is_resolved_by_policy(db, products, sync, policy, winner):
+    pen = products["pen"]
+    edit(sync.spreadsheet, "products", pen.id, "名稱", "Pen (sheet)")
+    pen.name = "Pen (DB)"
+    db.commit()
+
+    reports = sync(policy)
+
+    assert reports["products"]["conflicts"] == [
+        {"row": row_of(sync.spreadsheet, "products", pen.id)[0], "id": pen.id, "winner": policy}
+    ]
+    assert pen.name == winner
+    assert row_of(sync.spreadsheet, "products", pen.id)[1]["名稱"] == winner
+    assert sync.calls("values_batch_get") == 1
+    assert sync.calls("values_batch_update") == 1
+
+def test_row_without_id_is_inserted(db, products, sync):
+    append(sync.spreadsheet, "products", {"名稱": "Stapler", "價格": 99.5, "分類": "Office", "上架": True})
+
+    reports = sync()
+
+    assert reports["products"]["inserted"] == 1
+    stapler = db.query(Product).filter(Product.name == "Stapler").one()
+    assert stapler.price == Decimal("99.50") and stapler.stock == 0
+    # The new id is written back in place
+    row_no, row = row_of(sync.spreadsheet, "products", stapler.id)
+    assert (row_no, row["名稱"]) == (4, "Stapler")
+    assert sync.calls("values_batch_get") == 1
+    assert sync.calls("values_batch_update") == 1
+
+    # The stock sheet gets the new product on the next run
+    assert sync()["stock"]["pushed"] == 1
+    assert row_of(sync.spreadsheet, "stock", stapler.id)[1]["庫存"] == 0
+
+def test_invalid_cells_are_reported_and_kept(db, products, sync):
+    pen, paper, customer = products["pen"], products["paper"], products["customer"]
+    edit(sync.spreadsheet, "products", pen.id, "價格", "twelve")
+    edit(sync.spreadsheet, "products", paper.id, "價格", 1e12)
+    edit(sync.spreadsheet, "stock", pen.id, "庫存", 99999999999)
+    # Passes validation, rejected by PostgreSQL
+    edit(sync.spreadsheet, "customers", customer.id, "聯絡人", "Li\x00n")
+    # A valid edit in the same run still goes through
+    edit(sync.spreadsheet, "stock", paper.id, "庫存", 7)
+
+    reports = sync()
+
+    errors = {name: [e["reason"] for e in reports[name]["errors"]] for name in reports}
+    assert errors["products"] == ["invalid number 'twelve'", "must be less than 100000000"]
+    assert errors["stock"] == ["must not exceed 2147483647"]
+    assert errors["customers"] == ["rejected by database: DataError"]
+    assert reports["stock"]["pulled"] == 1
+    assert (pen.price, paper.price, pen.stock, paper.stock) == (Decimal("12.50"), Decimal("3.99"), 10, 7)
+    assert customer.contact_person == "Lin"
+    # The bad cells stay in the sheet for the user to fix
+    assert row_of(sync.spreadsheet, "products", pen.id)[1]["價格"] == "twelve"
+    assert row_of(sync.spreadsheet, "stock", pen.id)[1]["庫存"] == 99999999999
+    assert row_of(sync.spreadsheet, "customers", customer.id)[1]["聯絡人"] == "Li\x00n"
+    assert sync.calls("values_batch_get") == 1
+    assert sync.calls("values_batch_update") == 1